@@ -30,6 +30,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_browser_reload.middleware.BrowserReloadMiddleware',
+    'website.middleware.QueryMetricsMiddleware',
+    'website.middleware.ReplicaStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'project.urls'
@@ -45,6 +47,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'website.performance.render_timer',
             ],
         },
     },
@@ -52,13 +55,137 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'project.wsgi.application'
 
-DATABASES = {
+SQLITE_DATABASE = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    # Point SQLITE_PATH at a scratch file to seed and benchmark without touching db.sqlite3
+    'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+    # Keep connections across requests; pragmas are applied once per connection (website.database)
+    'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        # Take the write lock at BEGIN so a read transaction never has to upgrade and fail
+        'transaction_mode': 'IMMEDIATE',
+    },
+}
+
+# DB_ENGINE=postgresql switches to PostgreSQL (pip install -r requirements-postgres.txt)
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'stage_province'),
+            'USER': os.environ.get('POSTGRES_USER', 'stage_province'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Pooled connections are returned after each request; persistent ones are not allowed with a pool
+            'CONN_MAX_AGE': 0,
+            # .iterator() streams exports and archives through server-side cursors
+            'DISABLE_SERVER_SIDE_CURSORS': False,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('POSTGRES_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('POSTGRES_POOL_MAX', 20)),
+                    'timeout': int(os.environ.get('POSTGRES_POOL_TIMEOUT', 10)),
+                },
+            },
+            'TEST': {
+                'NAME': os.environ.get('POSTGRES_TEST_DB', 'test_stage_province'),
+            },
+        },
+        # Source of the one-off copy: manage.py copy_database --source sqlite
+        'sqlite': SQLITE_DATABASE,
+    }
+else:
+    DATABASES = {
+        'default': SQLITE_DATABASE,
+    }
+
+# Read replica for the staff reporting views (website.routers). Set POSTGRES_REPLICA_HOST,
+# or REPLICA_SQLITE_PATH for a copy of the SQLite file kept in sync outside Django.
+READ_REPLICA = None
+if DB_ENGINE == 'postgresql' and os.environ.get('POSTGRES_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['POSTGRES_REPLICA_HOST'],
+        'PORT': os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+        'OPTIONS': {'pool': dict(DATABASES['default']['OPTIONS']['pool'])},
+        'TEST': {'MIRROR': 'default'},
+    }
+    READ_REPLICA = 'replica'
+elif DB_ENGINE != 'postgresql' and os.environ.get('REPLICA_SQLITE_PATH'):
+    DATABASES['replica'] = {
+        **SQLITE_DATABASE,
+        'NAME': os.environ['REPLICA_SQLITE_PATH'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    READ_REPLICA = 'replica'
+DATABASE_ROUTERS = ['website.routers.ReplicaRouter']
+# Seconds a session keeps reading from the primary after it wrote something
+READ_REPLICA_STICKY_SECONDS = 15
+
+# The default locmem cache is private to each process, so the version bumps that invalidate
+# thresholds, dashboards and the catalogue reach only the process that made the write; the
+# others catch up when their entries expire (see the TTLs below). CACHE_BACKEND=file, database
+# or redis shares one cache between runserver/gunicorn workers, run_jobs and commands, with
+# CACHE_LOCATION a directory, a table made by createcachetable, or a redis:// URL.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'stage-province'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', BASE_DIR / 'cache'),
+    'database': ('django.core.cache.backends.db.DatabaseCache', 'cache_table'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://localhost:6379'),
+}
+cache_backend, cache_location = CACHE_BACKENDS[os.environ.get('CACHE_BACKEND', 'locmem')]
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': cache_backend,
+        'LOCATION': os.environ.get('CACHE_LOCATION', cache_location),
     }
 }
 
+# Seconds a process trusts its local threshold schedule before refetching it from the cache
+THRESHOLD_CACHE_LOCAL_TTL = 5
+# Seconds a cached schedule lives; with a per-process cache, a threshold change reaches the
+# other processes within THRESHOLD_CACHE_TTL + THRESHOLD_CACHE_LOCAL_TTL
+THRESHOLD_CACHE_TTL = 60
+
+# Upper bound on how long a citizen dashboard snapshot can outlive a missed invalidation
+DASHBOARD_SNAPSHOT_TTL = 600
+
+# Seconds browsers may reuse the possession catalogue before revalidating its ETag
+CATALOGUE_MAX_AGE = 60
+
+# Hours an investigator holds a claimed reclamation without opening it before it returns to the queue
+RECLAMATION_LEASE_HOURS = 48
+
+# Application rules engine (website.adjudication): scores within this fraction of the
+# threshold are left to a supervisor; ADJUDICATION_RULES may replace the default rules
+ADJUDICATION_MARGIN = '0.10'
+
+# Background jobs (website.jobs, run by manage.py run_jobs)
+JOB_HEARTBEAT_SECONDS = 10
+JOB_STALE_SECONDS = 60  # A running job not heartbeating for this long counts as a failed attempt
+JOB_RETRY_BASE_SECONDS = 30  # Doubled after each failed attempt
+JOB_RETRY_MAX_SECONDS = 3600
+JOB_OUTPUT_DIR = BASE_DIR / 'job_output'  # Files written by jobs queued from the admin jobs page
+
+# Audit trail writer: 'batched' queues entries for a background bulk writer, 'sync' writes inline
+AUDIT_SINK = os.environ.get('AUDIT_SINK', 'batched')
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 1.0  # seconds
+AUDIT_SPOOL_DIR = BASE_DIR / 'audit_spool'
+AUDIT_ARCHIVE_DIR = BASE_DIR / 'audit_archive'
+AUDIT_HOT_MONTHS = 6  # Months kept in the AuditLog table before archive_audit_logs moves them out
+
+# Request instrumentation (website.middleware.QueryMetricsMiddleware)
+PERF_RING_SIZE = 2000  # Requests kept in memory for the metrics endpoint
+PERF_SLOW_QUERY_RING_SIZE = 200
+PERF_SLOW_QUERY_MS = 100
+PERF_BUDGET_MS = 500  # Requests slower than this, or running more queries than
+PERF_QUERY_BUDGET = 50  # this, are logged to performance.log
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -91,17 +218,27 @@ AUTH_USER_MODEL = 'website.User'
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'bare': {'format': '%(message)s'},
+    },
     'handlers': {
         'file': {
-            'level': 'DEBUG',
+            'level': 'INFO',
             'class': 'logging.FileHandler',
             'filename': 'django.log',
         },
+        'performance': {
+            'level': 'WARNING',
+            'class': 'logging.FileHandler',
+            'filename': 'performance.log',
+            'formatter': 'bare',
+        },
     },
     'loggers': {
-        'django.db.backends': {
-            'handlers': ['file'],
-            'level': 'DEBUG',
+        # One JSON object per line, only for requests over budget
+        'website.performance': {
+            'handlers': ['performance'],
+            'level': 'WARNING',
             'propagate': False,
         },
         '': {
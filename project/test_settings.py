@@ -0,0 +1,19 @@
+"""Settings for the test suite: the project settings plus the test-only databases and sinks.
+
+Select them explicitly: python manage.py test website --settings=project.test_settings
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, DB_ENGINE, SQLITE_DATABASE, BASE_DIR
+
+# Tests assert on audit rows right after the request; the batched sink has its own tests
+AUDIT_SINK = 'sync'
+
+# A file-backed SQLite replica the routing tests copy the test database into; they
+# enable READ_REPLICA themselves, so other tests keep reading from the primary.
+if DB_ENGINE != 'postgresql':
+    DATABASES['replica'] = {
+        **SQLITE_DATABASE,
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'TEST': {'NAME': BASE_DIR / 'test_replica.sqlite3'},
+    }
+    READ_REPLICA = None
@@ -0,0 +1,27 @@
+#!/usr/bin/env bash
+# Seed the same synthetic population into SQLite and PostgreSQL and benchmark the main views on both.
+# Usage: scripts/benchmark_backends.sh [citizens] [iterations]
+set -euo pipefail
+cd "$(dirname "$0")/.."
+
+citizens=${1:-50000}
+iterations=${2:-20}
+export citizens
+out_dir=${BENCHMARK_DIR:-benchmarks}
+mkdir -p "$out_dir"
+export AUDIT_SINK=sync
+
+seed() {
+    python manage.py migrate -v0
+    python manage.py seed_population --citizens "$citizens" --seed 1
+}
+
+sqlite_path=$(mktemp --suffix=.sqlite3)
+trap 'rm -f "$sqlite_path" "$sqlite_path"-wal "$sqlite_path"-shm' EXIT
+SQLITE_PATH="$sqlite_path" bash -c "$(declare -f seed); seed"
+SQLITE_PATH="$sqlite_path" python manage.py benchmark_views --database "$sqlite_path" --iterations "$iterations" \
+    --save "$out_dir/sqlite.json"
+
+scripts/with_postgres.sh bash -c "$(declare -f seed); citizens=$citizens; seed
+    python manage.py benchmark_views --database \$POSTGRES_DB --iterations $iterations \
+        --save $out_dir/postgresql.json --compare $out_dir/sqlite.json"
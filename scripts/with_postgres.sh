@@ -0,0 +1,44 @@
+#!/usr/bin/env bash
+# Run a command against a throwaway PostgreSQL server with DB_ENGINE=postgresql set,
+# e.g. scripts/with_postgres.sh python manage.py test website --settings=project.test_settings
+#
+# Uses a postgres:16 container when docker is available (set USE_PG_CTL=1 to skip it),
+# otherwise a temporary cluster from the local initdb/pg_ctl (PG_BIN, default pg_config --bindir).
+# The unaccent and pg_trgm extensions must be available (postgresql-contrib).
+# initdb refuses to run as root, so under root the cluster is owned by PG_OS_USER (default nobody).
+set -euo pipefail
+cd "$(dirname "$0")/.."
+
+export DB_ENGINE=postgresql
+export POSTGRES_HOST=127.0.0.1
+export POSTGRES_PORT=${POSTGRES_PORT:-55432}
+export POSTGRES_USER=${POSTGRES_USER:-stage_province}
+export POSTGRES_PASSWORD=${POSTGRES_PASSWORD:-stage_province}
+export POSTGRES_DB=${POSTGRES_DB:-stage_province}
+
+if command -v docker >/dev/null 2>&1 && [ -z "${USE_PG_CTL:-}" ]; then
+    name="stage-province-pg-$$"
+    docker run -d --rm --name "$name" \
+        -e POSTGRES_USER="$POSTGRES_USER" -e POSTGRES_PASSWORD="$POSTGRES_PASSWORD" -e POSTGRES_DB="$POSTGRES_DB" \
+        -p "127.0.0.1:$POSTGRES_PORT:5432" postgres:16 >/dev/null
+    trap 'docker stop "$name" >/dev/null' EXIT
+    # The entrypoint restarts the server after init; wait for the one listening on TCP
+    until docker exec "$name" pg_isready -h 127.0.0.1 -U "$POSTGRES_USER" >/dev/null 2>&1; do
+        sleep 0.5
+    done
+else
+    PG_BIN=${PG_BIN:-$(pg_config --bindir)}
+    data_dir=$(mktemp -d)
+    as_owner=()
+    if [ "$(id -u)" -eq 0 ]; then
+        chown "${PG_OS_USER:-nobody}" "$data_dir"
+        as_owner=(runuser -u "${PG_OS_USER:-nobody}" --)
+    fi
+    trap '"${as_owner[@]}" "$PG_BIN/pg_ctl" -D "$data_dir" -m fast stop >/dev/null 2>&1 || true; rm -rf "$data_dir"' EXIT
+    "${as_owner[@]}" "$PG_BIN/initdb" -D "$data_dir" -U "$POSTGRES_USER" --auth=trust -E UTF8 --locale=C >/dev/null
+    "${as_owner[@]}" "$PG_BIN/pg_ctl" -D "$data_dir" -l "$data_dir/server.log" -w \
+        -o "-p $POSTGRES_PORT -k $data_dir -c listen_addresses=127.0.0.1" start >/dev/null
+    "$PG_BIN/createdb" -h 127.0.0.1 -p "$POSTGRES_PORT" -U "$POSTGRES_USER" "$POSTGRES_DB"
+fi
+
+"$@"
@@ -0,0 +1,185 @@
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .audit import build_entry, log_actions
+from .models import Application, CitizenProfile, Fine, Reclamation, User
+from .reviews import BatchReview
+
+# Rules engine for submitted applications. A rule takes a chunk of application
+# rows (dicts from values(), see ROW_FIELDS) and yields (application_id,
+# verdict, reason) for the rows it has an opinion on, fetching whatever it
+# needs for the whole chunk in one query. Any REVIEW verdict holds the
+# application for a supervisor; otherwise any REJECT rejects it, and an
+# APPROVE with no objection approves it. Rows no rule decides are held too.
+# ADJUDICATION_RULES lists the rules as dotted paths.
+
+APPROVE, REJECT, REVIEW = 'approve', 'reject', 'review'
+ROW_FIELDS = ('id', 'citizen_id', 'program_type', 'social_indicator_at_submission', 'threshold_at_submission')
+DEFAULT_RULES = [
+    'website.adjudication.score_margin',
+    'website.adjudication.other_insurance',
+    'website.adjudication.open_reclamations',
+    'website.adjudication.unpaid_fines',
+]
+OPEN_RECLAMATION_STATUSES = ['pending', 'under_investigation']
+
+
+def margin():
+    return Decimal(str(getattr(settings, 'ADJUDICATION_MARGIN', '0.10')))
+
+
+def rules():
+    return [import_string(path) for path in getattr(settings, 'ADJUDICATION_RULES', DEFAULT_RULES)]
+
+
+def score_margin(rows):
+    """Scores well clear of the threshold decide; those within the margin of it go to a supervisor"""
+    fraction = margin()
+    for row in rows:
+        score, threshold = row['social_indicator_at_submission'], row['threshold_at_submission']
+        band = abs(threshold) * fraction
+        if score <= threshold - band:
+            yield row['id'], APPROVE, 'Indicateur nettement sous le seuil'
+        elif score > threshold + band:
+            yield row['id'], REJECT, 'Indicateur au-dessus du seuil'
+        else:
+            yield row['id'], REVIEW, 'Indicateur proche du seuil'
+
+
+def other_insurance(rows):
+    """AMO is for citizens without other health insurance"""
+    amo = [row for row in rows if row['program_type'] == 'amo']
+    insured = set(CitizenProfile.objects.filter(
+        user_id__in={row['citizen_id'] for row in amo}, has_other_insurance=True
+    ).values_list('user_id', flat=True)) if amo else set()
+    for row in amo:
+        if row['citizen_id'] in insured:
+            yield row['id'], REJECT, 'Dispose déjà d\'une autre assurance maladie'
+
+
+def open_reclamations(rows):
+    """A reclamation still under way may change the citizen's score"""
+    disputed = set(Reclamation.objects.filter(
+        citizen_id__in={row['citizen_id'] for row in rows}, status__in=OPEN_RECLAMATION_STATUSES
+    ).values_list('citizen_id', flat=True))
+    for row in rows:
+        if row['citizen_id'] in disputed:
+            yield row['id'], REVIEW, 'Réclamation en cours'
+
+
+def unpaid_fines(rows):
+    fined = set(Fine.objects.filter(
+        reclamation__citizen_id__in={row['citizen_id'] for row in rows}, is_paid=False
+    ).values_list('reclamation__citizen_id', flat=True))
+    for row in rows:
+        if row['citizen_id'] in fined:
+            yield row['id'], REVIEW, 'Amende impayée'
+
+
+def decide(rows, rule_functions):
+    """Return {application_id: (verdict, reasons)} for a chunk of rows"""
+    verdicts = {row['id']: set() for row in rows}
+    reasons = {row['id']: [] for row in rows}
+    for rule in rule_functions:
+        for application_id, verdict, reason in rule(rows):
+            verdicts[application_id].add(verdict)
+            reasons[application_id].append(reason)
+    decisions = {}
+    for application_id, found in verdicts.items():
+        if REVIEW in found or not found:
+            verdict = REVIEW
+        else:
+            verdict = REJECT if REJECT in found else APPROVE
+        decisions[application_id] = (verdict, reasons[application_id] or ['Aucune règle applicable'])
+    return decisions
+
+
+def untriaged():
+    return Application.objects.filter(status='submitted', triaged_at__isnull=True).order_by('submitted_at', 'id')
+
+
+class Adjudicator:
+    """Runs the rules over submitted applications not evaluated yet, a chunk at a time.
+
+    Clear-cut applications are approved or rejected through BatchReview under
+    ``reviewer``; the others keep their submitted status with their reasons in
+    ``triage_flags``, for a supervisor. Every evaluated application gets
+    ``triaged_at``, so each is evaluated once.
+    """
+
+    def __init__(self, reviewer, chunk_size=1000, dry_run=False):
+        self.reviewer = reviewer
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.rules = rules()
+        notes = 'Décision automatique'
+        self.approvals = BatchReview(reviewer, APPROVE, notes)
+        self.rejections = BatchReview(reviewer, REJECT, notes)
+        self.counts = {APPROVE: 0, REJECT: 0, REVIEW: 0}
+        self.chunks = 0
+        self.elapsed = 0.0
+
+    @property
+    def evaluated(self):
+        return sum(self.counts.values())
+
+    @property
+    def rows_per_second(self):
+        return self.evaluated / self.elapsed if self.elapsed else 0.0
+
+    def run(self, progress=None):
+        """Evaluate every untriaged application; ``progress(adjudicator)`` is called after each chunk"""
+        started = time.perf_counter()
+        after = None
+        while True:
+            applications = untriaged()
+            if self.dry_run:
+                # Nothing is marked triaged, so walk the queue by id instead
+                applications = applications.order_by('id')
+                if after:
+                    applications = applications.filter(id__gt=after)
+            rows = list(applications.values(*ROW_FIELDS)[:self.chunk_size])
+            if not rows:
+                break
+            self.adjudicate_chunk(rows)
+            after = rows[-1]['id']
+            self.elapsed = time.perf_counter() - started
+            if progress:
+                progress(self)
+        self.elapsed = time.perf_counter() - started
+        return self
+
+    def adjudicate_chunk(self, rows):
+        decisions = decide(rows, self.rules)
+        self.chunks += 1
+        if self.dry_run:
+            for verdict, _ in decisions.values():
+                self.counts[verdict] += 1
+            return
+        now = timezone.now()
+        by_verdict = {APPROVE: [], REJECT: [], REVIEW: []}
+        by_reasons = {}
+        for application_id, (verdict, reasons) in decisions.items():
+            by_verdict[verdict].append(application_id)
+            by_reasons.setdefault(tuple(reasons), []).append(application_id)
+        metadata = {
+            application_id: {'auto': True, 'reasons': reasons} for application_id, (_, reasons) in decisions.items()
+        }
+        with transaction.atomic():
+            # Few distinct reason lists occur, so one UPDATE each beats a per-row CASE
+            for reasons, ids in by_reasons.items():
+                Application.objects.filter(id__in=ids).update(triaged_at=now, triage_flags=list(reasons))
+            self.counts[APPROVE] += len(self.approvals.review_chunk(by_verdict[APPROVE], metadata))
+            self.counts[REJECT] += len(self.rejections.review_chunk(by_verdict[REJECT], metadata))
+            held_ids = set(by_verdict[REVIEW])
+            held = [row for row in rows if row['id'] in held_ids]
+            log_actions([build_entry(
+                None, self.reviewer, 'application_triaged',
+                f"Demande {row['id']} transmise à un superviseur",
+                related_citizen=User(pk=row['citizen_id']),
+                metadata={'application_id': str(row['id']), **metadata[row['id']]},
+            ) for row in held])
+            self.counts[REVIEW] += len(held)
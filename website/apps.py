@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class WebsiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'website'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from django.db import connections
+        from .database import configure_connection
+        from .performance import install_query_timer
+        # Connections opened before this point missed connection_created
+        for connection in connections.all(initialized_only=True):
+            if connection.connection is not None:
+                configure_connection(sender=None, connection=connection)
+            install_query_timer(sender=None, connection=connection)
@@ -0,0 +1,198 @@
+import gzip
+import heapq
+import json
+import os
+from datetime import date, datetime, time
+from itertools import groupby
+from types import SimpleNamespace
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import AuditLog, AuditArchive
+from .pagination import decode_cursor, encode_cursor, keyset_page
+
+ARCHIVE_FIELDS = ['id', 'timestamp', 'user_id', 'user__username', 'action_type', 'description',
+                  'ip_address', 'user_agent', 'related_citizen_id', 'metadata']
+BLOCK_ROWS = 1000  # Rows per gzip member; the read path seeks to the member a page starts in
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def archive_dir():
+    return str(settings.AUDIT_ARCHIVE_DIR)
+
+
+def archive_cutoff(hot_months, today=None):
+    """First day of the oldest month that stays in the hot table"""
+    today = today or timezone.localdate()
+    return add_months(month_start(today), -hot_months)
+
+
+def archive_month(month, chunk_size=5000):
+    """Move one calendar month of audit rows into a gzip JSON-lines file.
+
+    Rows are written newest first so the read path can stop as soon as it has
+    a page. The file is complete on disk and registered before any row is
+    deleted; rows recorded into the month afterwards stay hot until the next run.
+    Returns the AuditArchive, or None when the month has no rows.
+    """
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    end = timezone.make_aware(datetime.combine(add_months(month, 1), time.min))
+    rows = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    if not rows.exists():
+        return None
+
+    os.makedirs(archive_dir(), exist_ok=True)
+    part = AuditArchive.objects.filter(month=month).count() + 1
+    name = f'auditlog-{month:%Y-%m}-{part}.jsonl.gz'
+    path = os.path.join(archive_dir(), name)
+    count = 0
+    first = last = None
+    min_id = max_id = None
+    blocks = []
+    block = []
+    with open(path + '.tmp', 'wb') as archive:
+        def write_block():
+            # One gzip member per block: a reader can seek to it and decompress from there
+            blocks.append([block[0]['timestamp'].isoformat(), block[0]['id'], archive.tell()])
+            archive.write(gzip.compress(''.join(json.dumps(row, default=str) + '\n' for row in block).encode()))
+            block.clear()
+
+        for row in rows.order_by('-timestamp', '-id').values(*ARCHIVE_FIELDS).iterator(chunk_size=chunk_size):
+            row['username'] = row.pop('user__username')
+            block.append(row)
+            if len(block) >= BLOCK_ROWS:
+                write_block()
+            count += 1
+            last = last or row['timestamp']
+            first = row['timestamp']
+            min_id = row['id'] if min_id is None else min(min_id, row['id'])
+            max_id = row['id'] if max_id is None else max(max_id, row['id'])
+        if block:
+            write_block()
+    os.replace(path + '.tmp', path)
+
+    with transaction.atomic():
+        entry = AuditArchive.objects.create(
+            month=month, path=name, row_count=count,
+            first_timestamp=first, last_timestamp=last, min_id=min_id, max_id=max_id, blocks=blocks
+        )
+        # Delete in id chunks to keep each statement and the write lock short
+        archived = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end, id__lte=max_id)
+        while True:
+            ids = list(archived.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            AuditLog.objects.filter(id__in=ids).delete()
+    return entry
+
+
+def _read(archive, before=None):
+    """Yield an archive's rows newest first, from the block holding the first row older than ``before``"""
+    offset = 0
+    if before:
+        for timestamp, pk, block_offset in archive.blocks:
+            if (parse_datetime(timestamp), pk) < before:
+                break
+            offset = block_offset
+    with open(os.path.join(archive_dir(), archive.path), 'rb') as raw:
+        raw.seek(offset)
+        with gzip.open(raw, 'rt', encoding='utf-8') as lines:
+            for line in lines:
+                row = json.loads(line)
+                row['timestamp'] = parse_datetime(row['timestamp'])
+                yield row
+
+
+def _matches(row, filters):
+    if filters.get('action_type') and row['action_type'] != filters['action_type']:
+        return False
+    if filters.get('user_id') and row['user_id'] != filters['user_id']:
+        return False
+    if filters.get('related_citizen_id') and row['related_citizen_id'] != filters['related_citizen_id']:
+        return False
+    if filters.get('start') and row['timestamp'] < filters['start']:
+        return False
+    if filters.get('end') and row['timestamp'] >= filters['end']:
+        return False
+    return True
+
+
+def archived_page(filters, position, limit):
+    """Return up to ``limit`` archived rows older than ``position``, newest first.
+
+    ``filters`` may hold action_type, user_id, related_citizen_id and an aware
+    start/end range; ``position`` is a (timestamp, id) cursor or None. Only
+    archives overlapping the range are opened, each from the block where the
+    page starts, and parts of the same month are merged in order.
+    """
+    archives = _overlapping(filters, position).order_by('-month', 'path')
+    # Rows at or after the end of the range are skipped like rows before the cursor
+    before = position
+    if filters.get('end') and (before is None or (filters['end'], 0) < before):
+        before = (filters['end'], 0)
+
+    rows = []
+    for _, parts in groupby(archives, key=lambda archive: archive.month):
+        merged = heapq.merge(*[_read(part, before) for part in parts],
+                             key=lambda row: (row['timestamp'], row['id']), reverse=True)
+        for row in merged:
+            if before and (row['timestamp'], row['id']) >= before:
+                continue
+            if filters.get('start') and row['timestamp'] < filters['start']:
+                # Everything after this row, in this month and older ones, is out of range
+                return rows
+            if _matches(row, filters):
+                rows.append(as_log(row))
+                if len(rows) >= limit:
+                    return rows
+    return rows
+
+
+def _overlapping(filters, position):
+    archives = AuditArchive.objects.all()
+    if filters.get('start'):
+        archives = archives.filter(last_timestamp__gte=filters['start'])
+    if filters.get('end'):
+        archives = archives.filter(first_timestamp__lt=filters['end'])
+    if position:
+        archives = archives.filter(first_timestamp__lte=position[0])
+    return archives
+
+
+def audit_page(logs, filters, cursor, page_size):
+    """Return one page of hot rows (``logs``) and archived rows merged newest first, and the next cursor.
+
+    Rows recorded into a month after it was archived stay in the hot table
+    and interleave with that month's files, so the archives are read whenever
+    the hot page reaches back past the newest archived row.
+    """
+    position = decode_cursor(cursor)
+    hot, _ = keyset_page(logs, cursor, page_size + 1)
+    newest_archived = _overlapping(filters, position).aggregate(newest=Max('last_timestamp'))['newest']
+    rows = hot
+    if newest_archived and (len(hot) <= page_size or hot[-1].timestamp <= newest_archived):
+        archived = archived_page(filters, position, page_size + 1)
+        rows = list(heapq.merge(hot, archived, key=lambda row: (row.timestamp, row.pk), reverse=True))
+    page = rows[:page_size]
+    next_cursor = encode_cursor(page[-1].timestamp, page[-1].pk) if len(rows) > page_size else None
+    return page, next_cursor
+
+
+def as_log(row):
+    """Wrap an archived row so templates can treat it like an AuditLog instance"""
+    return SimpleNamespace(
+        id=row['id'], pk=row['id'], timestamp=row['timestamp'], action_type=row['action_type'],
+        description=row['description'], metadata=row['metadata'], archived=True,
+        user=SimpleNamespace(id=row['user_id'], username=row['username']),
+        related_citizen_id=row['related_citizen_id'],
+    )
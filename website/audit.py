@@ -0,0 +1,284 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+ENTRY_FIELDS = ['user_id', 'action_type', 'description', 'ip_address', 'user_agent', 'related_citizen_id', 'metadata']
+
+
+def get_client_ip(request):
+    """Get client IP address from request"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0]
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return ip
+
+
+def build_entry(request, user, action_type, description, related_citizen=None, metadata=None):
+    """Return the plain-dict form of an audit entry, timestamped now.
+
+    ``request`` is None for work done from a management command.
+    """
+    return {
+        'user_id': user.pk,
+        'action_type': action_type,
+        'description': description,
+        'ip_address': get_client_ip(request) if request else '127.0.0.1',
+        'user_agent': request.META.get('HTTP_USER_AGENT', '') if request else 'manage.py',
+        'related_citizen_id': related_citizen.pk if related_citizen else None,
+        'metadata': metadata or {},
+        'timestamp': timezone.now(),
+    }
+
+
+def to_model(entry):
+    return AuditLog(**entry)
+
+
+class SyncAuditSink:
+    """Writes each entry immediately, inside the caller's transaction"""
+    name = 'sync'
+
+    def record(self, entry):
+        AuditLog.objects.create(**entry)
+
+    def record_many(self, entries):
+        AuditLog.objects.bulk_create([to_model(entry) for entry in entries])
+
+    def flush(self):
+        pass
+
+    def metrics(self):
+        return {'sink': self.name, 'queue_depth': 0}
+
+
+class BatchingAuditSink:
+    """Queues entries in memory and writes them from a background thread with bulk_create.
+
+    Entries recorded inside a transaction are queued only when it commits, so
+    work that is rolled back leaves no audit row, as with the sync sink.
+    Each entry is appended to a per-process spool file before it is queued.
+    A flush seals the spool together with the entries it holds, so the file
+    is deleted only once those rows are committed. Spools left behind by a
+    crashed process are replayed the next time a sink starts. Delivery is
+    at-least-once: a crash between the INSERT and the delete replays a batch.
+    """
+    name = 'batched'
+
+    def __init__(self, batch_size, flush_interval, spool_dir):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_dir = str(spool_dir)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.spool_path = os.path.join(self.spool_dir, f'audit-{os.getpid()}.jsonl')
+        self._pending = deque()
+        self._failed = []  # (sealed spool path, entries) awaiting retry
+        self._condition = threading.Condition()
+        self._spool = None
+        self._sequence = 0
+        self._stopped = False
+        self._stats = {'written': 0, 'flushes': 0, 'failed_flushes': 0,
+                       'last_batch_size': 0, 'last_flush_ms': 0.0, 'max_flush_ms': 0.0, 'total_flush_ms': 0.0}
+        try:
+            self.recover()
+        except Exception:
+            # Never let someone else's leftovers fail the request that created the sink
+            logger.exception("Audit spool recovery failed")
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    # Producer side
+    def record(self, entry):
+        self.record_many([entry])
+
+    def record_many(self, entries):
+        entries = list(entries)
+        # Runs at once outside a transaction
+        transaction.on_commit(lambda: self._enqueue(entries))
+
+    def _enqueue(self, entries):
+        with self._condition:
+            self._append_to_spool(entries)
+            self._pending.extend(entries)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def _append_to_spool(self, entries):
+        if self._spool is None:
+            self._spool = open(self.spool_path, 'a', encoding='utf-8')
+        for entry in entries:
+            self._spool.write(json.dumps(entry, default=str) + '\n')
+        self._spool.flush()
+
+    # Consumer side
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._stopped or len(self._pending) >= self.batch_size,
+                    timeout=self.flush_interval
+                )
+                stopped = self._stopped
+            self.flush()
+            if stopped:
+                return
+
+    def _seal(self):
+        """Detach the current spool and pending entries as one batch; caller holds the lock"""
+        batch = list(self._pending)
+        self._pending.clear()
+        sealed = None
+        if self._spool is not None:
+            # Recovery replays what reached the disk; make sure the sealed batch did
+            os.fsync(self._spool.fileno())
+            self._spool.close()
+            self._spool = None
+            self._sequence += 1
+            sealed = f'{self.spool_path}.{self._sequence}.flushing'
+            os.replace(self.spool_path, sealed)
+        return sealed, batch
+
+    def flush(self):
+        with self._condition:
+            batches = self._failed
+            self._failed = []
+            if self._pending:
+                batches.append(self._seal())
+        for sealed, batch in batches:
+            self._write(sealed, batch)
+
+    def _write(self, sealed, batch):
+        started = time.perf_counter()
+        try:
+            AuditLog.objects.bulk_create([to_model(entry) for entry in batch])
+        except Exception:
+            logger.exception("Audit flush of %d entries failed; will retry", len(batch))
+            connection.close()
+            with self._condition:
+                self._failed.append((sealed, batch))
+                self._stats['failed_flushes'] += 1
+            return
+        if sealed:
+            os.remove(sealed)
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._condition:
+            stats = self._stats
+            stats['written'] += len(batch)
+            stats['flushes'] += 1
+            stats['last_batch_size'] = len(batch)
+            stats['last_flush_ms'] = elapsed
+            stats['max_flush_ms'] = max(stats['max_flush_ms'], elapsed)
+            stats['total_flush_ms'] += elapsed
+
+    def recover(self):
+        """Replay spool files left behind by processes that are no longer running.
+
+        Every new process runs this, so each file is first claimed by renaming
+        it to a spool name of this process: only the process whose rename
+        succeeded replays it, and a claim whose process dies is itself a
+        dead spool for the next one.
+        """
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, 'audit-*.jsonl*'))):
+            pid = os.path.basename(path).split('.')[0].split('-', 1)[1]
+            if pid.isdigit() and int(pid) != os.getpid() and _pid_alive(int(pid)):
+                continue
+            if pid.isdigit() and int(pid) == os.getpid() and '.replay.' in path:
+                continue  # Claimed by this process a moment ago
+            claimed = os.path.join(self.spool_dir, f'audit-{os.getpid()}.jsonl.replay.{os.path.basename(path)}')
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # Another process claimed it first
+            try:
+                self._replay(claimed)
+            except Exception:
+                logger.exception("Replaying audit spool %s failed; it is kept for a later process", claimed)
+
+    def _replay(self, path):
+        entries = []
+        with open(path, encoding='utf-8') as spool:
+            for line in spool:
+                if line.strip():
+                    entry = json.loads(line)
+                    entry['timestamp'] = parse_datetime(entry['timestamp'])
+                    entries.append(entry)
+        if entries:
+            AuditLog.objects.bulk_create([to_model(entry) for entry in entries])
+            logger.warning("Replayed %d audit entries from %s", len(entries), path)
+        os.remove(path)
+
+    def stop(self):
+        with self._condition:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join(timeout=self.flush_interval * 5)
+
+    def metrics(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._pending) + sum(len(batch) for _, batch in self._failed)
+        total_ms = stats.pop('total_flush_ms')
+        stats['avg_flush_ms'] = total_ms / stats['flushes'] if stats['flushes'] else 0.0
+        stats['sink'] = self.name
+        return stats
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_sink():
+    """Return the sink selected by ``settings.AUDIT_SINK``, creating it on first use"""
+    global _sink
+    name = getattr(settings, 'AUDIT_SINK', 'sync')
+    if _sink is not None and _sink.name == name:
+        return _sink
+    with _sink_lock:
+        if _sink is None or _sink.name != name:
+            if _sink is not None:
+                _sink.flush()
+            if name == 'batched':
+                _sink = BatchingAuditSink(
+                    batch_size=settings.AUDIT_BATCH_SIZE,
+                    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+                    spool_dir=settings.AUDIT_SPOOL_DIR,
+                )
+            else:
+                _sink = SyncAuditSink()
+        return _sink
+
+
+def log_action(request, user, action_type, description, related_citizen=None, metadata=None):
+    """Record an audit entry for the current request through the configured sink"""
+    get_sink().record(build_entry(request, user, action_type, description, related_citizen, metadata))
+
+
+def log_actions(entries):
+    """Record several pre-built entries (see ``build_entry``) in one batch"""
+    get_sink().record_many(entries)
@@ -0,0 +1,458 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import cycle, islice
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import AsyncClient, Client
+from django.conf import settings
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from . import counters, urls, workqueue
+from .performance import percentile
+from .database import apply_pragmas, current_pragmas, sqlite_pragmas
+from .models import User, CitizenPossession, Reclamation, Application, PossessionCategory, PossessionType
+from .management.commands.seed_population import SYNTHETIC_PREFIX
+
+# URL names that are not application pages
+SKIPPED_URLS = {'logout'}
+# Async JSON endpoints compared under WSGI and ASGI by ``concurrent_benchmark``
+API_URLS = ['get_possession_types_by_category', 'get_possession_types', 'calculate_score_ajax']
+
+
+def check_scratch_database(name):
+    """Refuse to run unless ``name`` is the configured database and it holds a seeded population.
+
+    The benchmarks log in and add rows through the views, so they only run
+    against the scratch database seed_population filled, named explicitly.
+    """
+    configured = str(connection.settings_dict['NAME'])
+    if connection.vendor == 'sqlite':
+        matches = name is not None and os.path.realpath(name) == os.path.realpath(configured)
+    else:
+        matches = name == configured
+    if not matches:
+        raise ValueError(
+            f"Pass --database {configured} to write benchmark rows to it; "
+            "point SQLITE_PATH or POSTGRES_DB at a scratch database first"
+        )
+    if not User.objects.filter(user_type='citizen', national_id__startswith=SYNTHETIC_PREFIX).exists():
+        raise ValueError(f"{configured} has no seed_population citizens; seed a scratch database first")
+
+
+def sample_objects():
+    """Pick representative rows to build URL arguments from"""
+    citizen = (User.objects.filter(user_type='citizen', citizenpossession__isnull=False)
+               .order_by('id').first())
+    possession = CitizenPossession.objects.filter(citizen=citizen).order_by('id').first()
+    staff = {
+        role: User.objects.filter(user_type=role).order_by('id').first()
+        for role in ['data_entry_staff', 'investigator', 'supervisor', 'admin']
+    }
+    investigation = (Reclamation.objects.filter(status='under_investigation', assigned_investigator__isnull=False)
+                     .order_by('created_at').first())
+    if investigation:
+        staff['investigator'] = investigation.assigned_investigator
+    return {
+        'citizen': citizen,
+        'possession': possession,
+        'staff': staff,
+        'pending_reclamation': Reclamation.objects.filter(status='pending').order_by('created_at').first(),
+        'investigation': investigation,
+        'application': Application.objects.filter(status='submitted').order_by('submitted_at').first(),
+        'category': PossessionCategory.objects.order_by('id').first(),
+    }
+
+
+def build_cases(sample):
+    """Return {url_name: (user, method, path)} for every benchmarkable URL"""
+    staff = sample['staff']
+    citizen = sample['citizen']
+    possession = sample['possession']
+    category = sample['category']
+    cases = {
+        'citizen_login': (None, 'get', reverse('citizen_login')),
+        'verify_code': (None, 'get', reverse('verify_code')),
+        'citizen_dashboard': (citizen, 'get', reverse('citizen_dashboard')),
+        'eligibility_calculator': (citizen, 'get', reverse('eligibility_calculator')),
+        'my_reclamations': (citizen, 'get', reverse('my_reclamations')),
+        'my_applications': (citizen, 'get', reverse('my_applications')),
+        'create_application': (citizen, 'get', reverse('create_application', args=['social_aid'])),
+        'staff_dashboard': (staff['supervisor'], 'get', reverse('staff_dashboard')),
+        'manage_citizens': (staff['data_entry_staff'], 'get', reverse('manage_citizens')),
+        'review_applications': (staff['supervisor'], 'get', reverse('review_applications')),
+        'admin_panel': (staff['admin'], 'get', reverse('admin_panel')),
+        'manage_possession_types': (staff['admin'], 'get', reverse('manage_possession_types')),
+        'audit_logs': (staff['admin'], 'get', reverse('audit_logs')),
+        'audit_metrics': (staff['admin'], 'get', reverse('audit_metrics')),
+        'performance_metrics': (staff['admin'], 'get', reverse('performance_metrics')),
+        'calculate_score_ajax': (citizen, 'post', reverse('calculate_score_ajax')),
+    }
+    if citizen:
+        cases['citizen_detail'] = (staff['data_entry_staff'], 'get', reverse('citizen_detail', args=[citizen.pk]))
+        cases['add_possession'] = (staff['data_entry_staff'], 'get', reverse('add_possession', args=[citizen.pk]))
+    if possession:
+        cases['create_reclamation'] = (citizen, 'get', reverse('create_reclamation', args=[possession.pk]))
+        # Both views only accept the staff member who added the possession
+        cases['edit_possession'] = (possession.added_by, 'get', reverse('edit_possession', args=[possession.pk]))
+        # GET only redirects, so the possession is left alone
+        cases['delete_possession'] = (possession.added_by, 'get', reverse('delete_possession', args=[possession.pk]))
+    if sample['pending_reclamation']:
+        cases['assign_reclamation'] = (staff['investigator'], 'get', reverse('assign_reclamation', args=[sample['pending_reclamation'].pk]))
+    if sample['investigation']:
+        cases['investigate_reclamation'] = (staff['investigator'], 'get', reverse('investigate_reclamation', args=[sample['investigation'].pk]))
+    if sample['application']:
+        cases['review_application'] = (staff['supervisor'], 'get', reverse('review_application', args=[sample['application'].pk]))
+    if category:
+        cases['get_possession_types_by_category'] = (staff['data_entry_staff'], 'get', reverse('get_possession_types_by_category', args=[category.pk]))
+        cases['get_possession_types'] = (staff['data_entry_staff'], 'get', reverse('get_possession_types', args=[category.pk]))
+    return cases
+
+
+def url_names():
+    return [pattern.name for pattern in urls.urlpatterns if getattr(pattern, 'name', None)]
+
+
+def run_benchmarks(iterations=20, warmup=2, host='localhost', only=None):
+    """Drive every named URL with the test client; returns (results, uncovered url names).
+
+    Latency is measured without query capture, then one extra request per view
+    runs under CaptureQueriesContext to count queries.
+    """
+    cases = build_cases(sample_objects())
+    clients = {}
+    results = {}
+    uncovered = []
+    for name in url_names():
+        if name in SKIPPED_URLS or (only and name not in only):
+            continue
+        if name not in cases or (cases[name][0] is None and name not in ('citizen_login', 'verify_code')):
+            uncovered.append(name)
+            continue
+        user, method, path = cases[name]
+        key = user.pk if user else None
+        if key not in clients:
+            clients[key] = Client(HTTP_HOST=host)
+            if user:
+                clients[key].force_login(user)
+        client = clients[key]
+        request = getattr(client, method)
+
+        for _ in range(warmup):
+            request(path)
+        timings = []
+        status = None
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = request(path)
+            timings.append((time.perf_counter() - started) * 1000)
+            status = response.status_code
+        with CaptureQueriesContext(connection) as queries:
+            request(path)
+
+        results[name] = {
+            'path': path,
+            'status': status,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': len(queries.captured_queries),
+        }
+    return results, uncovered
+
+
+def _logged_in(client_class, count, user, host):
+    """Build clients sharing one session, so setup does not write a session per client"""
+    first = Client(HTTP_HOST=host)
+    first.force_login(user)
+    clients = []
+    for _ in range(count):
+        client = client_class(headers={'host': host})
+        client.cookies.load({name: morsel.value for name, morsel in first.cookies.items()})
+        clients.append(client)
+    return clients
+
+
+def _summary(mode, timings, statuses, elapsed):
+    return {
+        'mode': mode,
+        'requests': len(timings),
+        'errors': sum(1 for status in statuses if status != 200),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(timings) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+    }
+
+
+def wsgi_throughput(user, method, path, clients=200, requests=10, host='localhost'):
+    """One thread per client through the WSGI handler, as a threaded WSGI server would run them"""
+    pool_clients = _logged_in(Client, clients, user, host)
+
+    def run(client):
+        timings, statuses = [], []
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                statuses.append(getattr(client, method)(path).status_code)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connections.close_all()
+        return timings, statuses
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        started = time.perf_counter()
+        runs = list(pool.map(run, pool_clients))
+        elapsed = time.perf_counter() - started
+    return _summary('wsgi', [t for timings, _ in runs for t in timings],
+                     [s for _, statuses in runs for s in statuses], elapsed)
+
+
+def asgi_throughput(user, method, path, clients=200, requests=10, host='localhost'):
+    """All clients as coroutines on one event loop through the ASGI handler"""
+    loop_clients = _logged_in(AsyncClient, clients, user, host)
+
+    async def run(client):
+        timings, statuses = [], []
+        for _ in range(requests):
+            started = time.perf_counter()
+            statuses.append((await getattr(client, method)(path)).status_code)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings, statuses
+
+    async def main():
+        return await asyncio.gather(*(run(client) for client in loop_clients))
+
+    # AsyncClient always sends "Host: testserver" ahead of any header it is given
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        started = time.perf_counter()
+        runs = asyncio.run(main())
+        elapsed = time.perf_counter() - started
+    return _summary('asgi', [t for timings, _ in runs for t in timings],
+                    [s for _, statuses in runs for s in statuses], elapsed)
+
+
+def concurrent_benchmark(clients=200, requests=10, host='localhost', only=None):
+    """Compare WSGI and ASGI throughput of the JSON endpoints; returns {url_name: [wsgi, asgi]}"""
+    cases = build_cases(sample_objects())
+    results = {}
+    for name in API_URLS:
+        if (only and name not in only) or name not in cases or cases[name][0] is None:
+            continue
+        user, method, path = cases[name]
+        results[name] = [
+            wsgi_throughput(user, method, path, clients, requests, host),
+            asgi_throughput(user, method, path, clients, requests, host),
+        ]
+    return results
+
+
+# What a stock SQLite connection runs with, for the "before" side of ``mixed_workload``
+STOCK_SQLITE = {
+    'pragmas': {'journal_mode': 'delete', 'synchronous': 'full', 'busy_timeout': 5000, 'mmap_size': 0,
+                'cache_size': -2000, 'temp_store': 'default'},
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {},
+}
+CITIZEN_READ_URLS = ['citizen_dashboard', 'my_applications', 'my_reclamations']
+BENCHMARK_DESCRIPTION = 'benchmark mixed workload'
+
+
+@contextmanager
+def database_profile(tuned):
+    """Run with the configured SQLite settings, or with stock SQLite behaviour when ``tuned`` is false"""
+    # New connections are built from this dict, so worker threads pick the profile up
+    settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+    saved = {key: settings_dict[key] for key in ('CONN_MAX_AGE', 'OPTIONS')}
+    pragmas = sqlite_pragmas() if tuned else STOCK_SQLITE['pragmas']
+    connections.close_all()
+    if not tuned:
+        settings_dict.update({key: STOCK_SQLITE[key] for key in saved})
+    override = override_settings(SQLITE_PRAGMAS=pragmas)
+    override.enable()
+    try:
+        # journal_mode is stored in the file; switching needs the only open connection
+        connection.ensure_connection()
+        apply_pragmas(connection, {'journal_mode': pragmas['journal_mode']})
+        yield current_pragmas(connection)
+    finally:
+        connections.close_all()
+        override.disable()
+        settings_dict.update(saved)
+
+
+def mixed_workload(readers=16, writers=4, seconds=10, host='localhost'):
+    """Citizens reading their pages while staff add possessions, for ``seconds``.
+
+    Each thread has its own client and database connection, as under a
+    threaded server. Possessions added here are deleted again afterwards.
+    """
+    sample = sample_objects()
+    staff = sample['staff']['data_entry_staff']
+    citizens = list(User.objects.filter(user_type='citizen', citizenprofile__isnull=False).order_by('id')[:readers + writers])
+    possession_type = PossessionType.objects.filter(is_active=True).order_by('id').first()
+    read_paths = [reverse(name) for name in CITIZEN_READ_URLS]
+    jobs = []
+    for citizen in citizens[:readers]:
+        client = _logged_in(Client, 1, citizen, host)[0]
+        jobs.append(('read', client, cycle([('get', path, None) for path in read_paths])))
+    for citizen in citizens[readers:readers + writers]:
+        client = _logged_in(Client, 1, staff, host)[0]
+        data = {'possession_type': possession_type.pk, 'description': BENCHMARK_DESCRIPTION,
+                'acquisition_date': '2020-01-01', 'estimated_value': '1000'}
+        jobs.append(('write', client, cycle([('post', reverse('add_possession', args=[citizen.pk]), data)])))
+    for _, client, _ in jobs:
+        client.raise_request_exception = False
+    connections.close_all()
+
+    def run(job):
+        kind, client, requests = job
+        timings, errors = [], 0
+        deadline = time.perf_counter() + seconds
+        try:
+            while time.perf_counter() < deadline:
+                method, path, data = next(requests)
+                started = time.perf_counter()
+                response = getattr(client, method)(path, data) if data else getattr(client, method)(path)
+                timings.append((time.perf_counter() - started) * 1000)
+                errors += response.status_code >= 400
+        finally:
+            connections.close_all()
+        return kind, timings, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        runs = list(pool.map(run, jobs))
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for kind in ('read', 'write'):
+        timings = [t for run_kind, run_timings, _ in runs if run_kind == kind for t in run_timings]
+        results[kind] = {
+            'requests': len(timings),
+            'errors': sum(errors for run_kind, _, errors in runs if run_kind == kind),
+            'requests_per_second': round(len(timings) / elapsed, 1),
+            'p50_ms': round(statistics.median(timings), 3) if timings else None,
+            'p95_ms': round(percentile(timings, 0.95), 3) if timings else None,
+        }
+    # Deleted one by one so the signals take the points back off each citizen
+    for possession in CitizenPossession.objects.filter(description=BENCHMARK_DESCRIPTION, added_by=staff):
+        possession.delete()
+    return results
+
+
+WORK_QUEUE_REASON = 'benchmark work queue'
+
+
+def work_queue_run(workers, reclamations=2000, batch=10):
+    """``workers`` investigator threads draining a queue of ``reclamations`` with ``claim(batch)``.
+
+    Each thread has its own database connection. Checks that no reclamation
+    was handed out twice and that each ended up with the thread that got it.
+    The reclamations and investigators created here are deleted afterwards.
+    """
+    possessions = list(CitizenPossession.objects.order_by('id').values_list('id', 'citizen_id')[:reclamations])
+    if not possessions:
+        raise ValueError("The work queue benchmark needs at least one possession")
+    investigators = [
+        User.objects.create_user(
+            username=f'bench-investigator-{i}', user_type='investigator',
+            national_id=f'BENCHINV{i:04d}', phone_number=f'+21299999{i:04d}',
+        )
+        for i in range(workers)
+    ]
+    Reclamation.objects.bulk_create([
+        Reclamation(possession_id=possession_id, citizen_id=citizen_id, reason=WORK_QUEUE_REASON)
+        for possession_id, citizen_id in islice(cycle(possessions), reclamations)
+    ], batch_size=1000)
+    # bulk_create skips the counter signals; the deletes below go through them
+    counters.increment('reclamations:status:pending', reclamations)
+    candidates = Reclamation.objects.filter(reason=WORK_QUEUE_REASON)
+    connections.close_all()
+
+    def run(investigator):
+        claimed, timings = [], []
+        try:
+            while True:
+                started = time.perf_counter()
+                ids = workqueue.claim(investigator, batch, candidates=candidates)
+                timings.append((time.perf_counter() - started) * 1000)
+                if not ids:
+                    return investigator.pk, claimed, timings
+                claimed.extend(ids)
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            runs = list(pool.map(run, investigators))
+        elapsed = time.perf_counter() - started
+        handed_out = [reclamation_id for _, claimed, _ in runs for reclamation_id in claimed]
+        assignees = dict(candidates.values_list('id', 'assigned_investigator_id'))
+        timings = [t for _, _, run_timings in runs for t in run_timings]
+        return {
+            'workers': workers,
+            'claimed': len(handed_out),
+            'double_claims': len(handed_out) - len(set(handed_out)),
+            'misassigned': sum(
+                assignees.get(reclamation_id) != investigator_id
+                for investigator_id, claimed, _ in runs for reclamation_id in claimed
+            ),
+            'left_in_queue': candidates.filter(status=workqueue.PENDING).count(),
+            'claims_per_second': round(len(handed_out) / elapsed, 1),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+        }
+    finally:
+        candidates.delete()
+        for investigator in investigators:
+            investigator.delete()
+
+
+def work_queue_benchmark(workers=(1, 2, 4, 8, 16), reclamations=2000, batch=10):
+    return [work_queue_run(count, reclamations, batch) for count in workers]
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def baseline(results, iterations):
+    return {
+        'created': timezone.now().isoformat(),
+        'commit': current_commit(),
+        'vendor': connection.vendor,
+        'iterations': iterations,
+        'citizens': User.objects.filter(user_type='citizen').count(),
+        'views': results,
+    }
+
+
+def load_baseline(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def compare(old, new, tolerance=0.2):
+    """Yield (view, field, before, after, regressed) for every differing metric"""
+    for name, after in new['views'].items():
+        before = old['views'].get(name)
+        if not before:
+            continue
+        for field in ('p50_ms', 'p95_ms', 'queries'):
+            if before[field] == after[field]:
+                continue
+            if field == 'queries':
+                regressed = after[field] > before[field]
+            else:
+                regressed = after[field] > before[field] * (1 + tolerance)
+            yield name, field, before[field], after[field], regressed
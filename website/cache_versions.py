@@ -0,0 +1,25 @@
+import time
+from django.core.cache import cache
+
+# Version counters for cached data: readers build their keys from the current
+# version, and a write bumps it so every older key is ignored from then on.
+
+
+def _seed():
+    # Seed from the clock so a lost key never reuses an older version number
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _seed(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _seed(), None)
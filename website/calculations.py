@@ -0,0 +1,105 @@
+import hashlib
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from .indicators import SCORING_STATUS
+from .models import CalculationItem, CitizenPossession, SocialIndicatorCalculation, User
+
+# History of social indicator calculations. Each SocialIndicatorCalculation
+# keeps a snapshot of the possessions it scored (name and point value at the
+# time) as CalculationItem rows, plus a digest of that set: a calculation whose
+# set matches the citizen's latest one is not written again, so revisiting the
+# calculator does not grow the history.
+
+POINTS = Decimal('0.0001')
+
+
+def snapshot_items(citizen_ids):
+    """Return ``{citizen_id: [(possession_id, name, point_value)]}`` for the scored possessions, in one query"""
+    items = {citizen_id: [] for citizen_id in citizen_ids}
+    if not items:
+        return items
+    # A range over the citizen index stays one cheap scan for a keyset chunk of ids
+    rows = CitizenPossession.objects.filter(
+        citizen_id__gte=min(items), citizen_id__lte=max(items), status=SCORING_STATUS
+    ).order_by('id').values_list('citizen_id', 'id', 'possession_type__name', 'possession_type__point_value')
+    for citizen_id, possession_id, name, point_value in rows:
+        if citizen_id in items:
+            items[citizen_id].append((possession_id, name, point_value))
+    return items
+
+
+def possession_hash(items):
+    """Digest of a possession snapshot; equal sets give equal digests whatever their order"""
+    lines = sorted(f'{possession_id}:{name}:{Decimal(point_value).quantize(POINTS)}'
+                   for possession_id, name, point_value in items)
+    return hashlib.sha256('\n'.join(lines).encode()).hexdigest()
+
+
+def latest_hashes(citizen_ids, lock=False):
+    """Return ``{citizen_id: digest of the latest calculation or None}``.
+
+    With ``lock``, the citizens' rows stay locked until the transaction ends.
+    """
+    latest = SocialIndicatorCalculation.objects.filter(citizen=OuterRef('pk')).order_by(
+        '-calculation_date', '-id'
+    ).values('possession_hash')[:1]
+    citizens = User.objects.filter(pk__in=citizen_ids)
+    if lock:
+        # A statement of its own: one that waited for the lock would still read the digests it saw before
+        list(citizens.select_for_update().values_list('pk', flat=True))
+    return dict(citizens.annotate(digest=Subquery(latest)).values_list('pk', 'digest'))
+
+
+def record_calculations(citizen_ids, calculated_by, notes='', force=False, items=None):
+    """Write a calculation with its snapshot for each citizen whose possession set changed.
+
+    ``items`` is a ``snapshot_items`` result when the caller already has the
+    possessions; ``force`` writes every citizen regardless, e.g. to date-stamp
+    a threshold change. Returns the calculations written.
+    """
+    items = items if items is not None else snapshot_items(citizen_ids)
+    with transaction.atomic():
+        # The digest check and the insert share the citizens' locks, so two
+        # concurrent calculations of one set cannot both pass the check
+        latest = {} if force else latest_hashes(citizen_ids, lock=True)
+        calculations = []
+        for citizen_id in citizen_ids:
+            digest = possession_hash(items[citizen_id])
+            if latest.get(citizen_id) == digest:
+                continue
+            calculations.append(SocialIndicatorCalculation(
+                citizen_id=citizen_id, calculated_by=calculated_by, notes=notes, possession_hash=digest,
+                total_score=sum((point_value for _, _, point_value in items[citizen_id]), Decimal('0')),
+            ))
+        if not calculations:
+            return []
+        SocialIndicatorCalculation.objects.bulk_create(calculations, batch_size=1000)
+        CalculationItem.objects.bulk_create([
+            CalculationItem(calculation=calculation, possession_id=possession_id, possession_name=name,
+                            point_value=point_value)
+            for calculation in calculations
+            for possession_id, name, point_value in items[calculation.citizen_id]
+        ], batch_size=1000)
+    return calculations
+
+
+def record_calculation(citizen, calculated_by, notes='', items=None):
+    """Record one citizen's calculation; returns it, or None when the possession set is unchanged"""
+    calculations = record_calculations(
+        [citizen.pk], calculated_by, notes, items={citizen.pk: items} if items is not None else None
+    )
+    return calculations[0] if calculations else None
+
+
+def snapshot_population(calculated_by, notes='', force=False, chunk_size=2000):
+    """Record calculations for every citizen, chunked by user id; yields ``(citizen_ids, written)`` per chunk"""
+    last_id = 0
+    while True:
+        citizen_ids = list(
+            User.objects.filter(user_type='citizen', id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not citizen_ids:
+            return
+        yield citizen_ids, record_calculations(citizen_ids, calculated_by, notes, force)
+        last_id = citizen_ids[-1]
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from . import cache_versions
+from .models import PossessionCategory, PossessionType
+
+# Shared through the cache so every process sees a bump; the serialized body is kept per process.
+# A process whose cache does not see the bump (the default per-process locmem cache) still
+# rebuilds every max_age() seconds, so it serves a change at most that late.
+VERSION_KEY = 'catalogue:version'
+
+_lock = threading.Lock()
+_current = None  # (version, built at, etag, body)
+
+
+def max_age():
+    return getattr(settings, 'CATALOGUE_MAX_AGE', 60)
+
+
+def version():
+    return cache_versions.get_version(VERSION_KEY)
+
+
+def bump_version():
+    """Called on every category or type write; the next request rebuilds the payload"""
+    cache_versions.bump_version(VERSION_KEY)
+
+
+def build():
+    """Serialize the active category -> type tree, returning (etag, body)"""
+    types = {}
+    for type_id, category_id, name, point_value in PossessionType.objects.filter(is_active=True).order_by(
+        'name'
+    ).values_list('id', 'category_id', 'name', 'point_value'):
+        types.setdefault(category_id, []).append({'id': type_id, 'name': name, 'point_value': point_value})
+    categories = [
+        {'id': category_id, 'name': name, 'types': types.get(category_id, [])}
+        for category_id, name in PossessionCategory.objects.filter(is_active=True).order_by('name').values_list(
+            'id', 'name'
+        )
+    ]
+    # Only the content goes in the body, so the same catalogue has the same bytes and tag in every process
+    body = json.dumps({'categories': categories}, cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"', body
+
+
+def _fresh(payload, catalogue_version):
+    return payload is not None and payload[0] == catalogue_version and time.monotonic() - payload[1] < max_age()
+
+
+def current():
+    """Return (etag, body); no query unless the catalogue changed or the build is max_age() old"""
+    global _current
+    catalogue_version = version()
+    payload = _current
+    if not _fresh(payload, catalogue_version):
+        with _lock:
+            payload = _current
+            if not _fresh(payload, catalogue_version):
+                payload = _current = (catalogue_version, time.monotonic(), *build())
+    return payload[2:]
+
+
+async def acurrent():
+    payload = _current
+    if _fresh(payload, await cache.aget(VERSION_KEY)):
+        return payload[2:]
+    return await sync_to_async(current)()
+
+
+def clear():
+    global _current
+    _current = None
@@ -0,0 +1,126 @@
+from collections import Counter
+from django.apps import apps as global_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Keys, all maintained by the signals in website.signals:
+#   users, users:<user_type>
+#   applications, applications:status:<status>, applications:program:<program_type>
+#   applications:approved:<reviewer_id>:<YYYY-MM-DD>   approvals per reviewer and local day
+#   reclamations:status:<status>
+#   reclamations:resolved:<investigator_id>:<YYYY-MM-DD>   resolutions per investigator and local day
+
+# Fields each counted model's keys depend on; saves touching none of them are skipped
+COUNTED_FIELDS = {
+    'User': ['user_type'],
+    'Application': ['status', 'program_type', 'reviewed_by_id', 'reviewed_at'],
+    'Reclamation': ['status', 'assigned_investigator_id', 'resolution_date'],
+}
+
+
+def approved_key(reviewer_id, day):
+    return f'applications:approved:{reviewer_id}:{day.isoformat()}'
+
+
+def resolved_key(investigator_id, day):
+    return f'reclamations:resolved:{investigator_id}:{day.isoformat()}'
+
+
+def user_keys(row):
+    return ['users', f"users:{row['user_type']}"]
+
+
+def application_keys(row):
+    keys = ['applications', f"applications:status:{row['status']}", f"applications:program:{row['program_type']}"]
+    if row['status'] == 'approved' and row['reviewed_by_id'] and row['reviewed_at']:
+        keys.append(approved_key(row['reviewed_by_id'], timezone.localdate(row['reviewed_at'])))
+    return keys
+
+
+def reclamation_keys(row):
+    keys = [f"reclamations:status:{row['status']}"]
+    if row['assigned_investigator_id'] and row['resolution_date']:
+        keys.append(resolved_key(row['assigned_investigator_id'], timezone.localdate(row['resolution_date'])))
+    return keys
+
+
+KEY_FUNCTIONS = {'User': user_keys, 'Application': application_keys, 'Reclamation': reclamation_keys}
+
+
+def counted_row(instance):
+    return {field: getattr(instance, field) for field in COUNTED_FIELDS[type(instance).__name__]}
+
+
+def keys_for(model_name, row):
+    return KEY_FUNCTIONS[model_name](row) if row else []
+
+
+def apply_change(old_keys, new_keys):
+    """Move a row's contribution from ``old_keys`` to ``new_keys``"""
+    deltas = Counter(new_keys)
+    deltas.subtract(old_keys)
+    for key, delta in deltas.items():
+        if delta:
+            increment(key, delta)
+
+
+def increment(key, delta=1):
+    """Add ``delta`` to a counter with a single UPDATE, creating the row on first use"""
+    StatCounter = global_apps.get_model('website', 'StatCounter')
+    if StatCounter.objects.filter(key=key).update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            StatCounter.objects.create(key=key, value=delta)
+    except IntegrityError:
+        # Another writer created it first
+        StatCounter.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def read(*keys):
+    """Return {key: value} for the requested counters in one query; missing counters are 0"""
+    StatCounter = global_apps.get_model('website', 'StatCounter')
+    values = dict.fromkeys(keys, 0)
+    values.update(StatCounter.objects.filter(key__in=keys).values_list('key', 'value'))
+    return values
+
+
+def compute(apps=global_apps):
+    """Recount every key from the source tables; ``apps`` may be a migration's registry"""
+    User = apps.get_model('website', 'User')
+    Application = apps.get_model('website', 'Application')
+    Reclamation = apps.get_model('website', 'Reclamation')
+    counts = Counter()
+    for row in User.objects.values('user_type').annotate(n=Count('id')).order_by():
+        counts.update(dict.fromkeys(user_keys(row), row['n']))
+    for row in Application.objects.values('status', 'program_type').annotate(n=Count('id')).order_by():
+        counts.update({
+            'applications': row['n'],
+            f"applications:status:{row['status']}": row['n'],
+            f"applications:program:{row['program_type']}": row['n'],
+        })
+    for row in Application.objects.filter(
+        status='approved', reviewed_by__isnull=False, reviewed_at__isnull=False
+    ).values('reviewed_by_id', day=TruncDate('reviewed_at')).annotate(n=Count('id')).order_by():
+        counts[approved_key(row['reviewed_by_id'], row['day'])] += row['n']
+    for row in Reclamation.objects.values('status').annotate(n=Count('id')).order_by():
+        counts[f"reclamations:status:{row['status']}"] += row['n']
+    for row in Reclamation.objects.filter(
+        assigned_investigator__isnull=False, resolution_date__isnull=False
+    ).values('assigned_investigator_id', day=TruncDate('resolution_date')).annotate(n=Count('id')).order_by():
+        counts[resolved_key(row['assigned_investigator_id'], row['day'])] += row['n']
+    return counts
+
+
+def rebuild(apps=global_apps):
+    """Replace every counter with a fresh count; for bulk loads that bypass the signals"""
+    StatCounter = apps.get_model('website', 'StatCounter')
+    counts = compute(apps)
+    with transaction.atomic():
+        StatCounter.objects.all().delete()
+        StatCounter.objects.bulk_create(
+            [StatCounter(key=key, value=value) for key, value in counts.items() if value], batch_size=1000
+        )
+    return counts
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .cache_versions import bump_version, get_version
+from .indicators import get_citizen_profile
+from .models import CitizenPossession, Reclamation, Application
+from .thresholds import current_threshold, NO_THRESHOLD
+
+VERSION_KEY = 'dashboard:version'
+# The date is part of the key so thresholds with a future effective_date apply on their day
+SNAPSHOT_KEY = 'dashboard:{version}:{day}:{citizen_id}'
+
+RECENT_POSSESSIONS = 5
+ACTIVE_APPLICATION_STATUSES = ['submitted', 'under_review']
+
+
+def _ttl():
+    return getattr(settings, 'DASHBOARD_SNAPSHOT_TTL', 600)
+
+
+def _key(citizen_id, version=None, day=None):
+    return SNAPSHOT_KEY.format(
+        version=version if version is not None else get_version(VERSION_KEY),
+        day=day or timezone.localdate().isoformat(),
+        citizen_id=citizen_id,
+    )
+
+
+def build_snapshot(citizen):
+    """Compute everything the citizen dashboard shows, as plain picklable values"""
+    profile = get_citizen_profile(citizen)
+    score = profile.current_social_indicator
+    amo_threshold = current_threshold('amo')
+    social_aid_threshold = current_threshold('social_aid')
+    amo_threshold = NO_THRESHOLD if amo_threshold is None else amo_threshold
+    social_aid_threshold = NO_THRESHOLD if social_aid_threshold is None else social_aid_threshold
+    possessions = CitizenPossession.objects.filter(citizen=citizen).select_related('possession_type').only(
+        'id', 'estimated_value', 'acquisition_date', 'status', 'possession_type__name'
+    ).order_by('-created_at')[:RECENT_POSSESSIONS]
+    return {
+        'current_score': score,
+        'last_calculated': profile.last_calculated,
+        'amo_threshold': amo_threshold,
+        'social_aid_threshold': social_aid_threshold,
+        'amo_eligible': score <= amo_threshold and not profile.has_other_insurance,
+        'social_aid_eligible': score <= social_aid_threshold,
+        'pending_reclamations': Reclamation.objects.filter(citizen=citizen, status='pending').count(),
+        'active_applications': Application.objects.filter(
+            citizen=citizen, status__in=ACTIVE_APPLICATION_STATUSES
+        ).count(),
+        'recent_possessions': [
+            {
+                'id': possession.id,
+                'type_name': possession.possession_type.name,
+                'estimated_value': possession.estimated_value,
+                'acquisition_date': possession.acquisition_date,
+                'status': possession.status,
+                'status_display': possession.get_status_display(),
+            }
+            for possession in possessions
+        ],
+    }
+
+
+def get_snapshot(citizen):
+    """Return the cached dashboard snapshot for a citizen, building it on a miss"""
+    key = _key(citizen.pk)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(citizen)
+        cache.set(key, snapshot, _ttl())
+    return snapshot
+
+
+def invalidate_citizen(citizen_id):
+    cache.delete(_key(citizen_id))
+
+
+def invalidate_citizens(citizen_ids):
+    version, day = get_version(VERSION_KEY), timezone.localdate().isoformat()
+    cache.delete_many([_key(citizen_id, version, day) for citizen_id in set(citizen_ids)])
+
+
+def invalidate_all():
+    """Drop every snapshot, e.g. after a threshold or point value change"""
+    bump_version(VERSION_KEY)
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+# Applied to every new SQLite connection. WAL lets readers carry on while a
+# writer holds the lock, and synchronous=NORMAL is durable under WAL except
+# for the last transactions before a power loss.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32000,  # negative means KiB: 32 MB of page cache per connection
+    'temp_store': 'memory',
+}
+
+
+def sqlite_pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+
+
+def apply_pragmas(connection, pragmas):
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection, sqlite_pragmas())
+
+
+def current_pragmas(connection):
+    """Read back the effective settings, e.g. for the benchmark report"""
+    values = {}
+    with connection.cursor() as cursor:
+        for name in DEFAULT_SQLITE_PRAGMAS:
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            # mmap_size reports nothing for an in-memory database
+            values[name] = row[0] if row else None
+    return values
+
+
+connection_created.connect(configure_connection, dispatch_uid='website.database.configure_connection')
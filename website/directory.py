@@ -0,0 +1,176 @@
+import re
+import unicodedata
+from django.db import connection, connections, router
+from django.db.models import CharField, F, Func, Q
+from django.db.models.functions import Upper
+from .models import User
+
+# FTS5 table over citizens' last_name, first_name and address, keyed by user id.
+# Created by migration 0006 on SQLite only; PostgreSQL uses the trigram indexes
+# of migration 0009 and other backends fall back to LIKE lookups.
+FTS_TABLE = 'website_citizen_fts'
+INDEXED_FIELDS = {'user_type', 'last_name', 'first_name', 'address'}
+BROAD_PREFIX_ROWS = 2000
+SEARCH_FIELDS = ['all', 'national_id', 'phone_number', 'last_name', 'address']
+
+WORD = re.compile(r'\w+')
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def read_connection():
+    """Connection user reads go to; the replica inside reporting views (see website.routers)"""
+    return connections[router.db_for_read(User)]
+
+
+def rebuild_index():
+    """Reindex every citizen in one statement; returns the number of rows indexed"""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, last_name, first_name, address) "
+            "SELECT id, last_name, first_name, address FROM website_user WHERE user_type = 'citizen'"
+        )
+        return cursor.rowcount
+
+
+def index_citizen(user):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [user.pk])
+        if user.user_type == 'citizen':
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, last_name, first_name, address) VALUES (%s, %s, %s, %s)",
+                [user.pk, user.last_name, user.first_name, user.address],
+            )
+
+
+def unindex_citizen(pk):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def starts_with(field, prefix):
+    """Prefix match written as a range, so it can use the column's unique index"""
+    if connection.vendor == 'postgresql':
+        # Range bounds depend on the collation there; LIKE 'x%' uses the pattern indexes of 0009
+        return Q(**{f'{field}__startswith': prefix})
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\uffff'})
+
+
+def fold(text):
+    """Strip accents and upper-case, as the PostgreSQL search indexes store their keys"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).upper()
+
+
+def folded(field):
+    return Upper(Func(F(field), function='website_unaccent', output_field=CharField()))
+
+
+def phone_prefix(query):
+    """Normalize a typed phone prefix to the stored +212 form, or None if it is not one"""
+    digits = re.sub(r'[\s.-]', '', query)
+    if digits.startswith('+'):
+        return digits if digits[1:].isdigit() else None
+    if not digits.isdigit():
+        return None
+    if digits.startswith('212'):
+        return '+' + digits
+    if digits.startswith('0'):
+        return '+212' + digits[1:]
+    return '+212' + digits
+
+
+def fts_expression(words, field):
+    """Build an FTS5 query: last-name prefix anchored at the column start, address words anywhere"""
+    # ^ anchors the phrase at the start of the column; * makes the last word a prefix
+    last_name = f'(last_name : ^"{" ".join(words)}"*)'
+    address = '(address : (' + ' AND '.join(f'"{word}"*' for word in words) + '))'
+    if field == 'last_name':
+        return last_name
+    if field == 'address':
+        return address
+    return f'{last_name} OR {address}'
+
+
+def text_ids(words, field, after, limit):
+    if fts_enabled():
+        # FTS5 doclists are sorted by rowid, so this stops after ``limit`` hits
+        with read_connection().cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid > %s ORDER BY rowid LIMIT %s",
+                [fts_expression(words, field), after, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+    if connection.vendor == 'postgresql':
+        # Same expressions as the trigram indexes of migration 0009
+        users = User.objects.alias(last_name_key=folded('last_name'), address_key=folded('address'))
+        last_name = Q(last_name_key__startswith=fold(' '.join(words)))
+        address = [Q(address_key__contains=fold(word)) for word in words]
+    else:
+        users = User.objects.all()
+        last_name = Q(last_name__istartswith=' '.join(words))
+        address = [Q(address__icontains=word) for word in words]
+    condition = Q()
+    if field in ('all', 'last_name'):
+        condition |= last_name
+    if field in ('all', 'address'):
+        condition |= Q(*address)
+    return citizen_ids(condition, after, limit, users)
+
+
+def citizen_ids(condition, after, limit, users=None):
+    users = User.objects.all() if users is None else users
+    return list(users.filter(condition, user_type='citizen', id__gt=after).order_by('id').values_list(
+        'id', flat=True
+    )[:limit])
+
+
+def prefix_ids(column, prefix, after, limit):
+    if connection.vendor != 'sqlite':
+        return citizen_ids(starts_with(column, prefix), after, limit)
+    # SQLite has no histogram to tell a short prefix matching half the province from
+    # a selective one, so probe the index: for a broad prefix, walking the primary
+    # key finds a page of matches sooner than sorting them all by id
+    with read_connection().cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM website_user WHERE {column} >= %s AND {column} < %s LIMIT %s)",
+            [prefix, prefix + '\uffff', BROAD_PREFIX_ROWS],
+        )
+        broad = cursor.fetchone()[0] >= BROAD_PREFIX_ROWS
+        if broad:
+            sql = (f"SELECT id FROM website_user NOT INDEXED WHERE user_type = 'citizen' "
+                   f"AND {column} >= %s AND {column} < %s AND id > %s ORDER BY id LIMIT %s")
+        else:
+            # Unary + keeps the planner off the primary key: seek the prefix, sort the few hits
+            sql = (f"SELECT id FROM website_user WHERE user_type = 'citizen' "
+                   f"AND {column} >= %s AND {column} < %s AND +id > %s ORDER BY +id LIMIT %s")
+        cursor.execute(sql, [prefix, prefix + '\uffff', after, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_ids(query, field='all', after=0, limit=50):
+    """Return up to ``limit`` ids of citizens matching a directory search, ascending and above ``after``.
+
+    Each kind of match is read separately in id order and only as far as the
+    page needs, then merged; an OR over all of them would make the database
+    collect and sort every match of a short prefix before applying the limit.
+    """
+    query = query.strip()
+    words = WORD.findall(query.lower())
+    ids = set()
+    if field in ('all', 'national_id'):
+        ids.update(prefix_ids('national_id', query.upper(), after, limit))
+    if field in ('all', 'phone_number') and (phone := phone_prefix(query)):
+        ids.update(prefix_ids('phone_number', phone, after, limit))
+    if field in ('all', 'last_name', 'address') and words:
+        ids.update(text_ids(words, field, after, limit))
+    return sorted(ids)[:limit]
@@ -0,0 +1,160 @@
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from uuid import UUID
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Application, CitizenPossession, Reclamation, Fine, AuditLog
+
+FORMATS = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson'}
+
+
+def parse_day(value):
+    """Parse a YYYY-MM-DD value, returning None when absent or invalid"""
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def start_of_day(day):
+    """Return the aware datetime at which a calendar day starts"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def period(date_from, date_to):
+    """Return the (start, end) bounds covering two inclusive days; either may be None"""
+    return (
+        start_of_day(date_from) if date_from else None,
+        start_of_day(date_to + timedelta(days=1)) if date_to else None,
+    )
+
+
+class Dataset:
+    """One exportable table: a values_list projection and who may export it"""
+
+    def __init__(self, model, columns, roles, date_field='created_at', filters=()):
+        self.model = model
+        self.headers = [header for header, _ in columns]
+        self.lookups = [lookup for _, lookup in columns]
+        self.roles = set(roles)
+        self.date_field = date_field
+        self.filters = filters  # Extra exact-match filters accepted from the query string
+
+    def rows(self, start=None, end=None, chunk_size=2000, **filters):
+        """Yield row tuples in storage order, fetched ``chunk_size`` at a time"""
+        queryset = self.model.objects.all()
+        if start:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': start})
+        if end:
+            queryset = queryset.filter(**{f'{self.date_field}__lt': end})
+        applied = {name: value for name, value in filters.items() if name in self.filters and value}
+        # No ORDER BY: rows come in table order instead of being sorted first
+        return queryset.filter(**applied).order_by().values_list(*self.lookups).iterator(chunk_size=chunk_size)
+
+
+DATASETS = {
+    'applications': Dataset(Application, [
+        ('id', 'id'),
+        ('citizen_national_id', 'citizen__national_id'),
+        ('program_type', 'program_type'),
+        ('status', 'status'),
+        ('social_indicator_at_submission', 'social_indicator_at_submission'),
+        ('threshold_at_submission', 'threshold_at_submission'),
+        ('submitted_at', 'submitted_at'),
+        ('reviewed_by', 'reviewed_by__username'),
+        ('reviewed_at', 'reviewed_at'),
+        ('review_notes', 'review_notes'),
+        ('created_at', 'created_at'),
+    ], roles=['supervisor', 'admin'], filters=('status', 'program_type')),
+    'possessions': Dataset(CitizenPossession, [
+        ('id', 'id'),
+        ('citizen_national_id', 'citizen__national_id'),
+        ('possession_type', 'possession_type__name'),
+        ('point_value', 'possession_type__point_value'),
+        ('description', 'description'),
+        ('acquisition_date', 'acquisition_date'),
+        ('estimated_value', 'estimated_value'),
+        ('status', 'status'),
+        ('added_by', 'added_by__username'),
+        ('created_at', 'created_at'),
+    ], roles=['data_entry_staff', 'supervisor', 'admin'], filters=('status',)),
+    'reclamations': Dataset(Reclamation, [
+        ('id', 'id'),
+        ('citizen_national_id', 'citizen__national_id'),
+        ('possession_id', 'possession_id'),
+        ('reason', 'reason'),
+        ('status', 'status'),
+        ('assigned_investigator', 'assigned_investigator__username'),
+        ('resolution_date', 'resolution_date'),
+        ('created_at', 'created_at'),
+    ], roles=['investigator', 'supervisor', 'admin'], filters=('status',)),
+    'fines': Dataset(Fine, [
+        ('id', 'id'),
+        ('reclamation_id', 'reclamation_id'),
+        ('citizen_national_id', 'reclamation__citizen__national_id'),
+        ('amount', 'amount'),
+        ('reason', 'reason'),
+        ('applied_by', 'applied_by__username'),
+        ('is_paid', 'is_paid'),
+        ('payment_date', 'payment_date'),
+        ('created_at', 'created_at'),
+    ], roles=['investigator', 'supervisor', 'admin'], filters=('is_paid',)),
+    'audit': Dataset(AuditLog, [
+        ('id', 'id'),
+        ('timestamp', 'timestamp'),
+        ('user', 'user__username'),
+        ('action_type', 'action_type'),
+        ('description', 'description'),
+        ('ip_address', 'ip_address'),
+        ('related_citizen_national_id', 'related_citizen__national_id'),
+        ('metadata', 'metadata'),
+    ], roles=['admin'], date_field='timestamp', filters=('action_type',)),
+}
+
+
+def plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return plain(value)
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for csv.writer in a generator"""
+
+    def write(self, value):
+        return value
+
+
+def stream(dataset, fmt, rows, lines_per_chunk=500):
+    """Yield the export as text chunks of ``lines_per_chunk`` rows, header first"""
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(dataset.headers)
+        encode = lambda row: writer.writerow([csv_value(value) for value in row])
+    else:
+        headers = dataset.headers
+        encode = lambda row: json.dumps(
+            {header: plain(value) for header, value in zip(headers, row)}, ensure_ascii=False, default=str
+        ) + '\n'
+    lines = []
+    for row in rows:
+        lines.append(encode(row))
+        if len(lines) >= lines_per_chunk:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def filename(name, fmt):
+    return f"{name}-{timezone.localdate():%Y%m%d}.{fmt}"
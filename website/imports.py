@@ -0,0 +1,179 @@
+import csv
+import io
+import json
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from .audit import build_entry, log_actions
+from .dashboard import invalidate_citizens
+from .indicators import SCORING_STATUS, apply_indicator_deltas
+from .models import CitizenPossession, PossessionType, User
+
+# Columns of a registry extract; possession_type is an id or a type name
+IMPORT_FIELDS = ['national_id', 'possession_type', 'description', 'acquisition_date', 'estimated_value']
+REQUIRED_FIELDS = ['national_id', 'possession_type', 'acquisition_date', 'estimated_value']
+MAX_KEPT_REJECTS = 1000
+
+
+def iter_rows(stream, fmt):
+    """Yield ``(line_number, row)`` from a binary stream of CSV or JSON lines.
+
+    A row is a dict, or an error message for a line that does not parse.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, f'JSON invalide: {exc}'
+            continue
+        yield line_number, row if isinstance(row, dict) else 'Un objet JSON est attendu'
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+
+
+class PossessionImporter:
+    """Validates and inserts possession rows in chunks.
+
+    Each chunk runs in its own transaction: one citizen lookup, one
+    bulk_create, set-wise indicator updates and one audit entry. Rejected rows
+    are kept with their line number and do not stop the import.
+    """
+
+    def __init__(self, added_by, request=None, chunk_size=1000, source='', dry_run=False):
+        self.added_by = added_by
+        self.request = request
+        self.chunk_size = chunk_size
+        self.source = source
+        self.dry_run = dry_run
+        self.types = self.load_types()
+        self.imported = 0
+        self.rejected = 0
+        self.rejects = []  # (line_number, reason), first MAX_KEPT_REJECTS only
+        self.batches = 0
+        self.elapsed = 0.0
+
+    @staticmethod
+    def load_types():
+        types = {}
+        for type_id, name, point_value in PossessionType.objects.filter(is_active=True).values_list(
+            'id', 'name', 'point_value'
+        ):
+            types[str(type_id)] = types[name.strip().lower()] = (type_id, point_value)
+        return types
+
+    @property
+    def rows_per_second(self):
+        return (self.imported + self.rejected) / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, line_number, reason):
+        self.rejected += 1
+        if len(self.rejects) < MAX_KEPT_REJECTS:
+            self.rejects.append((line_number, reason))
+
+    def run(self, rows, progress=None):
+        """Import ``(line_number, row)`` pairs; ``progress(importer)`` is called after each chunk"""
+        started = time.perf_counter()
+        chunk = []
+        for line_number, row in rows:
+            chunk.append((line_number, row))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+                self.elapsed = time.perf_counter() - started
+                if progress:
+                    progress(self)
+        if chunk:
+            self.import_chunk(chunk)
+        self.elapsed = time.perf_counter() - started
+        if progress and chunk:
+            progress(self)
+        return self
+
+    def clean(self, line_number, row, citizens):
+        if isinstance(row, str):
+            return self.reject(line_number, row)
+        row = {key: str(value).strip() for key, value in row.items() if key and value is not None}
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            return self.reject(line_number, f"Champs manquants: {', '.join(missing)}")
+        citizen_id = citizens.get(row['national_id'].upper())
+        if citizen_id is None:
+            return self.reject(line_number, f"Citoyen inconnu: {row['national_id']}")
+        possession_type = self.types.get(row['possession_type'].lower())
+        if possession_type is None:
+            return self.reject(line_number, f"Type de possession inconnu: {row['possession_type']}")
+        try:
+            acquisition_date = date.fromisoformat(row['acquisition_date'])
+        except ValueError:
+            return self.reject(line_number, f"Date invalide (AAAA-MM-JJ attendu): {row['acquisition_date']}")
+        try:
+            estimated_value = Decimal(row['estimated_value'])
+        except InvalidOperation:
+            return self.reject(line_number, f"Valeur invalide: {row['estimated_value']}")
+        if not estimated_value.is_finite() or estimated_value < 0 or estimated_value >= Decimal('1e10'):
+            return self.reject(line_number, f"Valeur hors limites: {row['estimated_value']}")
+        return possession_type, CitizenPossession(
+            citizen_id=citizen_id,
+            possession_type_id=possession_type[0],
+            description=row.get('description', ''),
+            acquisition_date=acquisition_date,
+            estimated_value=estimated_value.quantize(Decimal('0.01')),
+            added_by=self.added_by,
+        )
+
+    def import_chunk(self, chunk):
+        national_ids = {
+            str(row.get('national_id', '')).strip().upper() for _, row in chunk if isinstance(row, dict)
+        }
+        citizens = dict(User.objects.filter(user_type='citizen', national_id__in=national_ids).values_list(
+            'national_id', 'id'
+        ))
+        possessions = []
+        deltas = {}
+        for line_number, row in chunk:
+            cleaned = self.clean(line_number, row, citizens)
+            if cleaned is None:
+                continue
+            (_, point_value), possession = cleaned
+            possessions.append(possession)
+            if possession.status == SCORING_STATUS:
+                deltas[possession.citizen_id] = deltas.get(possession.citizen_id, Decimal('0')) + point_value
+        if not possessions or self.dry_run:
+            self.imported += len(possessions)
+            return
+
+        self.batches += 1
+        with transaction.atomic():
+            # bulk_create skips the signals, so the indicator, dashboard and audit work is done here
+            created = CitizenPossession.objects.bulk_create(possessions)
+            apply_indicator_deltas(deltas)
+            ids = [possession.pk for possession in created if possession.pk is not None]
+            log_actions([build_entry(
+                self.request, self.added_by, 'possessions_imported',
+                f'Import de {len(created)} possessions (lot {self.batches})',
+                metadata={
+                    'source': self.source,
+                    'batch': self.batches,
+                    'rows': len(created),
+                    'first_line': chunk[0][0],
+                    'last_line': chunk[-1][0],
+                    'citizens': len({possession.citizen_id for possession in possessions}),
+                    'possession_ids': [min(ids), max(ids)] if ids else None,
+                },
+            )])
+            citizen_ids = {possession.citizen_id for possession in possessions}
+            # Again once any enclosing transaction commits, as the signal handlers do
+            transaction.on_commit(lambda: invalidate_citizens(citizen_ids))
+        invalidate_citizens(citizen_ids)
+        self.imported += len(created)
@@ -0,0 +1,185 @@
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from decimal import Decimal
+from .models import CitizenPossession, CitizenProfile, PossessionType, User
+
+# Only active possessions count towards the social indicator
+SCORING_STATUS = 'active'
+
+
+def calculate_social_indicator(citizen):
+    """Calculate the current social indicator for a citizen"""
+    possessions = CitizenPossession.objects.filter(
+        citizen=citizen,
+        status=SCORING_STATUS
+    ).select_related('possession_type')
+
+    total_score = possessions.aggregate(
+        total=Sum('possession_type__point_value')
+    )['total'] or Decimal('0')
+
+    return total_score
+
+
+async def acalculate_social_indicator(citizen):
+    """Async version of ``calculate_social_indicator`` for ASGI views"""
+    total_score = (await CitizenPossession.objects.filter(
+        citizen=citizen,
+        status=SCORING_STATUS
+    ).aaggregate(total=Sum('possession_type__point_value')))['total']
+    return total_score or Decimal('0')
+
+
+def get_citizen_profile(citizen):
+    """Return the citizen's profile, seeding the stored indicator when it is first created"""
+    try:
+        return CitizenProfile.objects.get(user=citizen)
+    except CitizenProfile.DoesNotExist:
+        profile, _ = CitizenProfile.objects.get_or_create(
+            user=citizen,
+            defaults={'current_social_indicator': calculate_social_indicator(citizen)}
+        )
+        return profile
+
+
+def apply_indicator_delta(citizen_id, delta):
+    """Add ``delta`` to the stored indicator of one citizen with a single UPDATE.
+
+    ``last_calculated`` is left alone: it records the citizen's own
+    recalculation, which ``create_application`` requires after a rejection.
+    """
+    if not delta:
+        return
+    CitizenProfile.objects.filter(user_id=citizen_id).update(
+        current_social_indicator=F('current_social_indicator') + delta
+    )
+
+
+def apply_indicator_deltas(deltas):
+    """Apply ``{citizen_id: delta}`` set-wise: one UPDATE per distinct delta value.
+
+    Bulk writes only produce a handful of distinct deltas (sums of a few point
+    values), so this stays a few statements however many citizens move.
+    """
+    by_delta = {}
+    for citizen_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(citizen_id)
+    for delta, citizen_ids in by_delta.items():
+        for start in range(0, len(citizen_ids), 500):
+            CitizenProfile.objects.filter(user_id__in=citizen_ids[start:start + 500]).update(
+                current_social_indicator=F('current_social_indicator') + delta
+            )
+
+
+def possession_contribution(citizen_id, status, point_value):
+    """Return the (citizen_id, points) a possession contributes to the indicator"""
+    if status != SCORING_STATUS or citizen_id is None:
+        return citizen_id, Decimal('0')
+    return citizen_id, Decimal(str(point_value))
+
+
+def apply_possession_change(old, new):
+    """Apply the indicator deltas for a possession moving from ``old`` to ``new``.
+
+    Both arguments are ``(citizen_id, points)`` tuples as returned by
+    ``possession_contribution``; either may be ``None`` for a create or delete.
+    """
+    deltas = {}
+    if old is not None:
+        deltas[old[0]] = deltas.get(old[0], Decimal('0')) - old[1]
+    if new is not None:
+        deltas[new[0]] = deltas.get(new[0], Decimal('0')) + new[1]
+    for citizen_id, delta in deltas.items():
+        if citizen_id is not None:
+            apply_indicator_delta(citizen_id, delta)
+
+
+def remove_holdings(holdings):
+    """Take deleted possessions off their holders' indicators.
+
+    ``holdings`` maps ``(citizen_id, possession_type_id)`` to how many scoring
+    possessions went; one query reads the point values, and the profiles move
+    through ``apply_indicator_deltas``.
+    """
+    point_values = dict(PossessionType.objects.filter(
+        id__in={type_id for _, type_id in holdings}
+    ).values_list('id', 'point_value'))
+    deltas = {}
+    for (citizen_id, type_id), count in holdings.items():
+        deltas[citizen_id] = deltas.get(citizen_id, Decimal('0')) - point_values[type_id] * count
+    apply_indicator_deltas(deltas)
+
+
+def apply_point_value_change(possession_type_id, old_value, new_value):
+    """Shift every holder of a possession type by the change in its point value.
+
+    Runs as one set-based UPDATE: each profile moves by ``delta`` times the
+    number of active possessions of that type the citizen holds.
+    """
+    delta = Decimal(str(new_value)) - Decimal(str(old_value))
+    if not delta:
+        return 0
+    holdings = CitizenPossession.objects.filter(
+        citizen=OuterRef('user'),
+        possession_type_id=possession_type_id,
+        status=SCORING_STATUS
+    ).values('citizen').annotate(n=Count('id')).values('n')
+    holders = CitizenPossession.objects.filter(
+        possession_type_id=possession_type_id,
+        status=SCORING_STATUS
+    ).values('citizen')
+    return CitizenProfile.objects.filter(user__in=holders).update(
+        current_social_indicator=ExpressionWrapper(
+            F('current_social_indicator') + Subquery(holdings) * delta,
+            output_field=DecimalField(max_digits=10, decimal_places=4)
+        )
+    )
+
+
+def iter_citizen_ids(chunk_size=5000, start_id=0):
+    """Yield citizen ids in keyset pages of ``chunk_size``, by user id"""
+    last_id = start_id
+    while True:
+        citizen_ids = list(
+            User.objects.filter(user_type='citizen', id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not citizen_ids:
+            return
+        yield citizen_ids
+        last_id = citizen_ids[-1]
+
+
+def recount(citizen_ids):
+    """Return ``{citizen_id: score}`` from one grouped aggregate over their active possessions.
+
+    ``citizen_ids`` must be sorted; citizens without active possessions score zero.
+    """
+    totals = CitizenPossession.objects.filter(
+        citizen_id__gte=citizen_ids[0],
+        citizen_id__lte=citizen_ids[-1],
+        status=SCORING_STATUS
+    ).values('citizen_id').annotate(total=Sum('possession_type__point_value')).order_by()
+    scores = dict.fromkeys(citizen_ids, Decimal('0'))
+    for row in totals:
+        if row['citizen_id'] in scores:
+            scores[row['citizen_id']] = row['total'] or Decimal('0')
+    return scores
+
+
+def profiles_for(citizen_ids, *fields, lock=False):
+    """Return ``{user_id: profile}`` for ``citizen_ids``, with their indicator and ``fields`` loaded.
+
+    With ``lock``, the profiles stay locked until the transaction ends. Take
+    the lock before ``recount`` when writing absolute scores back: a
+    possession write then either lands in the count or applies its delta
+    after the overwrite, instead of being lost under it.
+    """
+    profiles = CitizenProfile.objects.filter(user_id__in=citizen_ids)
+    if lock:
+        profiles = profiles.select_for_update()
+    return {
+        profile.user_id: profile
+        for profile in profiles.only('id', 'user_id', 'current_social_indicator', *fields)
+    }
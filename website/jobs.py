@@ -0,0 +1,205 @@
+import io
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.db.models import Avg, Count, F, Max, Min
+from django.utils import timezone
+from .models import Job
+from .workqueue import take
+
+logger = logging.getLogger(__name__)
+
+# Database-backed job queue. Anything slow enough to hold a request worker for
+# long is enqueued as a Job and run by the run_jobs workers: a job is claimed
+# by one worker, heartbeats while it runs, and is retried with exponential
+# backoff on failure. A job whose worker stops heartbeating is treated as a
+# failed attempt. Delivery is at-least-once, so handlers should be idempotent.
+
+# Management commands that may be queued with the 'command' handler
+JOB_COMMANDS = [
+    'adjudicate_applications', 'archive_audit_logs', 'batch_review_applications', 'export_data',
+    'import_possessions', 'rebuild_citizen_index', 'rebuild_stat_counters', 'reconcile_indicators',
+    'release_expired_claims', 'rescore_eligibility', 'snapshot_indicators',
+]
+MAX_OUTPUT = 20000  # Characters of command output kept in Job.result
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register ``function(job)`` as the handler of jobs of ``kind``; its return value is stored as the result"""
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+@handler('command')
+def run_command(job):
+    name = job.payload['command']
+    if name not in JOB_COMMANDS:
+        raise ValueError(f"Command {name} cannot be run as a job")
+    output = io.StringIO()
+    call_command(name, *job.payload.get('args', []), stdout=output, stderr=output)
+    return {'output': output.getvalue()[-MAX_OUTPUT:]}
+
+
+def heartbeat_interval():
+    return getattr(settings, 'JOB_HEARTBEAT_SECONDS', 10)
+
+
+def stale_after():
+    return timedelta(seconds=getattr(settings, 'JOB_STALE_SECONDS', 60))
+
+
+def backoff(attempts):
+    """Delay before retrying a job that has failed ``attempts`` times"""
+    base = getattr(settings, 'JOB_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), getattr(settings, 'JOB_RETRY_MAX_SECONDS', 3600)))
+
+
+def worker_name(index=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def enqueue(kind, payload=None, user=None, max_attempts=3, run_after=None):
+    if kind not in HANDLERS:
+        raise ValueError(f"No handler for jobs of kind {kind}")
+    return Job.objects.create(
+        kind=kind, payload=payload or {}, created_by=user, max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def enqueue_command(name, args=(), user=None, max_attempts=1):
+    """Queue a management command from JOB_COMMANDS with a list of already validated arguments"""
+    if name not in JOB_COMMANDS:
+        raise ValueError(f"Command {name} cannot be run as a job")
+    return enqueue('command', {'command': name, 'args': [str(arg) for arg in args]}, user, max_attempts)
+
+
+def claim(worker):
+    """Take the next due job for ``worker``, or None; each job goes to one worker only"""
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id')
+    with transaction.atomic():
+        rows = take(due, 1, {
+            'status': 'running', 'worker': worker, 'started_at': now, 'heartbeat_at': now,
+            'attempts': F('attempts') + 1,
+        })
+    return Job.objects.get(pk=rows[0][0]) if rows else None
+
+
+def beat(job, worker):
+    return Job.objects.filter(pk=job.pk, status='running', worker=worker).update(heartbeat_at=timezone.now())
+
+
+class Heartbeat(threading.Thread):
+    """Refreshes a running job's heartbeat until stopped; uses its own database connection"""
+
+    def __init__(self, job, worker):
+        super().__init__(daemon=True)
+        self.job = job
+        self.worker = worker
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            while not self.done.wait(heartbeat_interval()):
+                try:
+                    beat(self.job, self.worker)
+                except Exception:
+                    # A missed beat is retried on the next tick; stopping here would let
+                    # requeue_stale hand the still running job to another worker
+                    logger.exception("Heartbeat of job %s failed", self.job.pk)
+                    connections.close_all()
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+
+def finish(job, worker, started, result=None, error=None):
+    """Record the outcome of an attempt, unless the job was taken away from ``worker`` meanwhile"""
+    now = timezone.now()
+    changes = {'duration': time.perf_counter() - started, 'heartbeat_at': now, 'worker': ''}
+    if error is None:
+        changes.update(status='succeeded', finished_at=now, result=result, error='')
+    elif job.attempts < job.max_attempts:
+        changes.update(status='queued', run_after=now + backoff(job.attempts), error=error)
+    else:
+        changes.update(status='failed', finished_at=now, error=error)
+    return Job.objects.filter(pk=job.pk, status='running', worker=worker).update(**changes)
+
+
+def execute(job, worker):
+    """Run a claimed job to completion, heartbeating meanwhile; returns the final status"""
+    heartbeat = Heartbeat(job, worker)
+    heartbeat.start()
+    started = time.perf_counter()
+    try:
+        result = HANDLERS[job.kind](job)
+    except Exception:
+        heartbeat.stop()
+        finish(job, worker, started, error=traceback.format_exc()[-MAX_OUTPUT:])
+    else:
+        heartbeat.stop()
+        finish(job, worker, started, result=result)
+    return Job.objects.values_list('status', flat=True).get(pk=job.pk)
+
+
+def run_next(worker):
+    """Claim and run one job; False when none was due"""
+    job = claim(worker)
+    if job is None:
+        return False
+    execute(job, worker)
+    return True
+
+
+def requeue_stale(now=None):
+    """Count running jobs whose worker stopped heartbeating as failed attempts; returns how many"""
+    now = now or timezone.now()
+    requeued = 0
+    for job in Job.objects.filter(status='running', heartbeat_at__lt=now - stale_after()):
+        error = f'Worker {job.worker} stopped responding'
+        changes = {'worker': '', 'error': error}
+        if job.attempts < job.max_attempts:
+            changes.update(status='queued', run_after=now + backoff(job.attempts))
+        else:
+            changes.update(status='failed', finished_at=now)
+        # Compare-and-set on the heartbeat: a late beat means the worker is alive after all
+        requeued += Job.objects.filter(pk=job.pk, status='running', heartbeat_at=job.heartbeat_at).update(**changes)
+    return requeued
+
+
+def stats(window=timedelta(hours=1)):
+    """Queue depth by status and recent throughput, for the admin jobs page"""
+    now = timezone.now()
+    depth = dict.fromkeys([status for status, _ in Job.STATUS_CHOICES], 0)
+    depth.update(Job.objects.values_list('status').annotate(n=Count('id')).order_by())
+    recent = Job.objects.filter(status__in=['succeeded', 'failed'], finished_at__gte=now - window)
+    finished = recent.aggregate(count=Count('id'), average=Avg('duration'), longest=Max('duration'))
+    oldest = Job.objects.filter(status='queued', run_after__lte=now).aggregate(oldest=Min('run_after'))['oldest']
+    return {
+        'depth': depth,
+        'due': Job.objects.filter(status='queued', run_after__lte=now).count(),
+        'oldest_wait': (now - oldest).total_seconds() if oldest else None,
+        'finished': finished['count'],
+        'failed': recent.filter(status='failed').count(),
+        'per_minute': round(finished['count'] / (window.total_seconds() / 60), 2),
+        'average_duration': finished['average'],
+        'longest_duration': finished['longest'],
+        'workers': sorted(Job.objects.filter(
+            status='running', heartbeat_at__gte=now - stale_after()
+        ).values_list('worker', flat=True).distinct()),
+    }
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from website.adjudication import APPROVE, REJECT, REVIEW, Adjudicator
+from website.models import User
+
+
+class Command(BaseCommand):
+    help = ("Run the adjudication rules over submitted applications not evaluated yet: decide the clear-cut "
+            "ones and leave the rest to supervisors; meant to run from cron")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviewer', required=True,
+                            help="Username of the supervisor or admin account automatic decisions are recorded under")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Evaluate only; nothing is written")
+
+    def handle(self, *args, **options):
+        try:
+            reviewer = User.objects.get(username=options['reviewer'], user_type__in=['supervisor', 'admin'])
+        except User.DoesNotExist:
+            raise CommandError(f"No supervisor or admin account named {options['reviewer']}")
+
+        def progress(adjudicator):
+            counts = adjudicator.counts
+            self.stdout.write(
+                f"{adjudicator.evaluated} evaluated: {counts[APPROVE]} approved, {counts[REJECT]} rejected, "
+                f"{counts[REVIEW]} for review, {adjudicator.rows_per_second:,.0f} rows/s"
+            )
+
+        adjudicator = Adjudicator(reviewer, chunk_size=options['chunk_size'], dry_run=options['dry_run']).run(progress)
+        counts = adjudicator.counts
+        verb = 'Would decide' if options['dry_run'] else 'Decided'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {counts[APPROVE] + counts[REJECT]} of {adjudicator.evaluated} applications "
+            f"({counts[APPROVE]} approved, {counts[REJECT]} rejected), {counts[REVIEW]} left to supervisors, "
+            f"{adjudicator.elapsed:.1f}s"
+        ))
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from website.models import AuditLog
+from website.archive import archive_cutoff, archive_month, add_months, month_start
+
+
+class Command(BaseCommand):
+    help = "Move audit log months older than the hot window into compressed archive files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=settings.AUDIT_HOT_MONTHS,
+                            help="Number of recent months kept in the hot table")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['months'])
+        oldest = AuditLog.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None or timezone.localtime(oldest).date() >= cutoff:
+            self.stdout.write("Nothing to archive")
+            return
+
+        month = month_start(timezone.localtime(oldest).date())
+        archived = 0
+        while month < cutoff:
+            if options['dry_run']:
+                self.stdout.write(f"Would archive {month:%Y-%m}")
+            else:
+                entry = archive_month(month, chunk_size=options['chunk_size'])
+                if entry:
+                    archived += entry.row_count
+                    self.stdout.write(f"{month:%Y-%m}: {entry.row_count} rows -> {entry.path}")
+            month = add_months(month, 1)
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} audit rows older than {cutoff}"))
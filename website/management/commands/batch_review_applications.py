@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from website.models import Application, User
+from website.reviews import ACTIONS, RULES, BatchReview, selection
+
+
+class Command(BaseCommand):
+    help = "Approve or reject submitted applications in bulk, picked by rule and/or by id"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=sorted(ACTIONS))
+        parser.add_argument('--reviewer', required=True, help="Username of the supervisor recorded as reviewer")
+        parser.add_argument('--rule', choices=sorted(RULES), help="Review every submitted application matching it")
+        parser.add_argument('--program', choices=[value for value, _ in Application.PROGRAM_TYPES])
+        parser.add_argument('--ids', help="File with one application id per line")
+        parser.add_argument('--notes', default='', help="Review notes stored on every application")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Applications per UPDATE")
+        parser.add_argument('--atomic', action='store_true',
+                            help="Review everything in one transaction instead of one per chunk")
+        parser.add_argument('--dry-run', action='store_true', help="Count the selection; nothing is written")
+
+    def handle(self, *args, **options):
+        try:
+            reviewer = User.objects.get(username=options['reviewer'], user_type__in=['supervisor', 'admin'])
+        except User.DoesNotExist:
+            raise CommandError(f"No supervisor or admin account named {options['reviewer']}")
+        if not (options['rule'] or options['ids']):
+            raise CommandError("Give --rule, --ids or both")
+        ids = None
+        if options['ids']:
+            with open(options['ids']) as lines:
+                ids = [line.strip() for line in lines if line.strip()]
+        applications = selection(ids=ids, rule=options['rule'], program_type=options['program'])
+        total = applications.count()
+        if options['dry_run']:
+            self.stdout.write(f"{total} submitted applications would be {ACTIONS[options['action']]}")
+            return
+
+        def progress(review):
+            self.stdout.write(
+                f"{review.reviewed}/{total} reviewed ({review.reviewed / total:.0%}), "
+                f"{review.rows_per_second:,.0f} rows/s"
+            )
+
+        review = BatchReview(reviewer, options['action'], options['notes'], chunk_size=options['chunk_size'],
+                             atomic=options['atomic']).run(applications, progress if total else None)
+        self.stdout.write(self.style.SUCCESS(
+            f"{ACTIONS[options['action']].capitalize()} {review.reviewed} applications in {review.chunks} chunks, "
+            f"{review.elapsed:.1f}s ({review.rows_per_second:,.0f} rows/s), batch {review.batch}"
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from website.benchmarks import API_URLS, check_scratch_database, concurrent_benchmark
+
+
+class Command(BaseCommand):
+    help = "Compare WSGI and ASGI throughput of the JSON endpoints under many concurrent clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help="Scratch database the run may write to; must be the configured one")
+        parser.add_argument('--clients', type=int, default=200, help="Concurrent clients")
+        parser.add_argument('--requests', type=int, default=10, help="Requests sent by each client")
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS")
+        parser.add_argument('--view', action='append', choices=API_URLS, help="Only this endpoint (repeatable)")
+
+    def handle(self, *args, **options):
+        try:
+            check_scratch_database(options['database'])
+        except ValueError as error:
+            raise CommandError(error)
+        results = concurrent_benchmark(
+            clients=options['clients'], requests=options['requests'], host=options['host'], only=options['view'],
+        )
+        self.stdout.write(f"{options['clients']} concurrent clients x {options['requests']} requests")
+        self.stdout.write(f"{'view':<36}{'mode':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        for name, runs in results.items():
+            for run in runs:
+                self.stdout.write(
+                    f"{name:<36}{run['mode']:>6}{run['requests_per_second']:>10.1f}"
+                    f"{run['p50_ms']:>10.2f}{run['p95_ms']:>10.2f}{run['errors']:>8}"
+                )
+            wsgi, asgi = runs
+            if wsgi['requests_per_second']:
+                self.stdout.write(f"{'':<36}{'':>6}  asgi/wsgi {asgi['requests_per_second'] / wsgi['requests_per_second']:.2f}x")
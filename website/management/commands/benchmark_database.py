@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from website.benchmarks import check_scratch_database, database_profile, mixed_workload
+
+
+class Command(BaseCommand):
+    help = "Measure mixed citizen-read / staff-write throughput with stock SQLite settings, then tuned ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help="Scratch database the run may write to; must be the configured one")
+        parser.add_argument('--readers', type=int, default=16, help="Concurrent citizen reader threads")
+        parser.add_argument('--writers', type=int, default=4, help="Concurrent staff writer threads")
+        parser.add_argument('--seconds', type=int, default=10, help="Duration of each run")
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS")
+        parser.add_argument('--profile', choices=['stock', 'tuned'], action='append',
+                            help="Only run this profile (repeatable); both by default")
+
+    def handle(self, *args, **options):
+        try:
+            check_scratch_database(options['database'])
+        except ValueError as error:
+            raise CommandError(error)
+        if connection.vendor != 'sqlite':
+            raise CommandError("This benchmark compares SQLite settings")
+        results = {}
+        for profile in options['profile'] or ['stock', 'tuned']:
+            with database_profile(tuned=profile == 'tuned') as pragmas:
+                self.stdout.write(f"{profile}: {', '.join(f'{name}={value}' for name, value in pragmas.items())}")
+                results[profile] = mixed_workload(
+                    readers=options['readers'], writers=options['writers'], seconds=options['seconds'],
+                    host=options['host'],
+                )
+        self.stdout.write(f"{'profile':<8}{'kind':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        for profile, kinds in results.items():
+            for kind, result in kinds.items():
+                self.stdout.write(
+                    f"{profile:<8}{kind:>6}{result['requests_per_second']:>10.1f}"
+                    f"{result['p50_ms'] or 0:>10.2f}{result['p95_ms'] or 0:>10.2f}{result['errors']:>8}"
+                )
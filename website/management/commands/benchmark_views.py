@@ -0,0 +1,56 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from website.benchmarks import check_scratch_database, run_benchmarks, baseline, load_baseline, compare
+
+
+class Command(BaseCommand):
+    help = "Request every page with the test client and report p50/p95 latency and query counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help="Scratch database the run may write to; must be the configured one")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS")
+        parser.add_argument('--view', action='append', help="Only benchmark this URL name (repeatable)")
+        parser.add_argument('--save', help="Write the results as a JSON baseline")
+        parser.add_argument('--compare', help="Diff against a previously saved baseline")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Latency increase tolerated before flagging a regression")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            check_scratch_database(options['database'])
+        except ValueError as error:
+            raise CommandError(error)
+        results, uncovered = run_benchmarks(
+            iterations=options['iterations'], warmup=options['warmup'],
+            host=options['host'], only=options['view'],
+        )
+        self.stdout.write(f"{'view':<36}{'status':>7}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}")
+        for name, result in sorted(results.items()):
+            self.stdout.write(
+                f"{name:<36}{result['status']:>7}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['queries']:>9}"
+            )
+        for name in uncovered:
+            self.stdout.write(self.style.WARNING(f"{name}: no sample data, not benchmarked"))
+
+        report = baseline(results, options['iterations'])
+        if options['save']:
+            with open(options['save'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Baseline written to {options['save']}")
+
+        if options['compare']:
+            regressions = 0
+            previous = load_baseline(options['compare'])
+            self.stdout.write(f"Compared with {options['compare']} (commit {previous.get('commit') or '?'})")
+            for name, field, before, after, regressed in compare(previous, report, options['tolerance']):
+                line = f"{name} {field}: {before} -> {after}"
+                if regressed:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(line)
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{regressions} regressions against {options['compare']}")
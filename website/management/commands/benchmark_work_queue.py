@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from website.benchmarks import check_scratch_database, work_queue_benchmark
+
+
+class Command(BaseCommand):
+    help = ("Drain a queue of reclamations with increasing numbers of concurrent investigator workers "
+            "and check that none is handed out twice")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help="Scratch database the run may write to; must be the configured one")
+        parser.add_argument('--workers', type=int, action='append',
+                            help="Concurrent workers for one run (repeatable); 1, 2, 4, 8 and 16 by default")
+        parser.add_argument('--reclamations', type=int, default=2000, help="Reclamations queued for each run")
+        parser.add_argument('--batch', type=int, default=10, help="Reclamations claimed per call")
+
+    def handle(self, *args, **options):
+        try:
+            check_scratch_database(options['database'])
+        except ValueError as error:
+            raise CommandError(error)
+        results = work_queue_benchmark(
+            workers=options['workers'] or [1, 2, 4, 8, 16],
+            reclamations=options['reclamations'], batch=options['batch'],
+        )
+        self.stdout.write(f"{'workers':<8}{'claimed':>9}{'claims/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+                          f"{'double':>8}{'wrong':>7}{'left':>6}")
+        for result in results:
+            self.stdout.write(
+                f"{result['workers']:<8}{result['claimed']:>9}{result['claims_per_second']:>10.1f}"
+                f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                f"{result['double_claims']:>8}{result['misassigned']:>7}{result['left_in_queue']:>6}"
+            )
+        if any(result['double_claims'] or result['misassigned'] or result['left_in_queue'] for result in results):
+            raise CommandError("Reclamations were handed out twice, to the wrong worker, or not at all")
@@ -0,0 +1,99 @@
+import time
+from contextlib import contextmanager
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers import sort_dependencies
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from website.models import User
+
+# Sessions are left behind: everyone signs in again on the new database
+COPIED_APPS = ['contenttypes', 'auth', 'website', 'admin']
+
+
+def copied_models():
+    """Models in an order where every foreign key target is copied first, then the m2m tables"""
+    models = sort_dependencies([(apps.get_app_config(label), None) for label in COPIED_APPS], allow_cycles=True)
+    through = [
+        field.remote_field.through
+        for model in models
+        for field in model._meta.local_many_to_many
+        if field.remote_field.through._meta.auto_created
+    ]
+    return models + through
+
+
+@contextmanager
+def keep_timestamps(model):
+    """Stop auto_now/auto_now_add from overwriting the copied created/updated times"""
+    fields = [field for field in model._meta.local_fields if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = "Copy every row from one configured database to another, e.g. db.sqlite3 into PostgreSQL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='sqlite', help="Database alias to read from")
+        parser.add_argument('--target', default=DEFAULT_DB_ALIAS, help="Migrated, empty database alias to write to")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        source, target = options['source'], options['target']
+        for alias in (source, target):
+            if alias not in connections:
+                raise CommandError(f"No database alias {alias!r}; see DB_ENGINE in settings")
+        if source == target:
+            raise CommandError("Source and target are the same database")
+        if User.objects.using(target).exists():
+            raise CommandError(f"{target} already has users; copy into a freshly migrated database")
+
+        models = copied_models()
+        started = time.perf_counter()
+        with transaction.atomic(using=target):
+            # migrate created these with its own ids; foreign keys in the copy point at the source's
+            ContentType.objects.using(target).all().delete()
+            for model in models:
+                self.copy(model, source, target, options['batch_size'])
+            with connections[target].cursor() as cursor:
+                for statement in connections[target].ops.sequence_reset_sql(no_style(), models):
+                    cursor.execute(statement)
+        ContentType.objects.clear_cache()
+
+        if connections[target].vendor == 'sqlite' and target == DEFAULT_DB_ALIAS:
+            from website.directory import rebuild_index
+            rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied {len(models)} tables in {time.perf_counter() - started:.1f}s; "
+            f"run reconcile_indicators on the new database to check it"
+        ))
+
+    def copy(self, model, source, target, batch_size):
+        started = time.perf_counter()
+        copied = 0
+        batch = []
+        # Plain rows in primary key order; on PostgreSQL sources this is a server-side cursor
+        rows = model._base_manager.using(source).order_by('pk').iterator(chunk_size=batch_size)
+        with keep_timestamps(model):
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    model._base_manager.using(target).bulk_create(batch)
+                    copied += len(batch)
+                    batch = []
+            if batch:
+                model._base_manager.using(target).bulk_create(batch)
+                copied += len(batch)
+        expected = model._base_manager.using(source).count()
+        if copied != expected:
+            raise CommandError(f"{model._meta.label}: copied {copied} of {expected} rows")
+        self.stdout.write(f"{model._meta.label}: {copied} rows in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,56 @@
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from website.exports import DATASETS, FORMATS, parse_day, period, stream
+
+
+class Command(BaseCommand):
+    help = "Stream a dataset to CSV or JSON lines without loading it into memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help="Defaults to standard output")
+        parser.add_argument('--date-from', help="YYYY-MM-DD, inclusive")
+        parser.add_argument('--date-to', help="YYYY-MM-DD, inclusive")
+        parser.add_argument('--filter', action='append', default=[], metavar='FIELD=VALUE',
+                            help="Exact-match filter supported by the dataset, e.g. status=approved")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        dataset = DATASETS[options['dataset']]
+        filters = {}
+        for item in options['filter']:
+            name, _, value = item.partition('=')
+            if name not in dataset.filters:
+                raise CommandError(f"{options['dataset']} can be filtered on: {', '.join(dataset.filters)}")
+            filters[name] = value
+        days = []
+        for value in (options['date_from'], options['date_to']):
+            day = parse_day(value)
+            if value and day is None:
+                raise CommandError(f"Invalid date (YYYY-MM-DD expected): {value}")
+            days.append(day)
+        start, end = period(*days)
+        rows = dataset.rows(start=start, end=end, chunk_size=options['chunk_size'], **filters)
+
+        count = 0
+
+        def counted(rows):
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        started = time.perf_counter()
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in stream(dataset, options['format'], counted(rows)):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {count} rows in {elapsed:.1f}s ({count / elapsed if elapsed else 0:,.0f} rows/s)"
+        ))
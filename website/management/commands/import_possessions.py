@@ -0,0 +1,48 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from website.imports import PossessionImporter, detect_format, iter_rows
+from website.models import User
+
+
+class Command(BaseCommand):
+    help = "Import possessions from a CSV or JSON-lines registry extract"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help="Username of the staff member recorded as added_by")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; nothing is written")
+        parser.add_argument('--rejects', help="Write rejected line numbers and reasons to this CSV file")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'], user_type__in=['data_entry_staff', 'admin'])
+        except User.DoesNotExist:
+            raise CommandError(f"No data entry or admin account named {options['user']}")
+        fmt = options['format'] or detect_format(options['path'])
+        importer = PossessionImporter(user, chunk_size=options['chunk_size'], source=options['path'],
+                                      dry_run=options['dry_run'])
+
+        def progress(importer):
+            self.stdout.write(
+                f"{importer.imported} imported, {importer.rejected} rejected, {importer.rows_per_second:,.0f} rows/s"
+            )
+
+        with open(options['path'], 'rb') as stream:
+            importer.run(iter_rows(stream, fmt), progress)
+
+        for line_number, reason in importer.rejects[:20]:
+            self.stdout.write(self.style.WARNING(f"line {line_number}: {reason}"))
+        if importer.rejected > 20:
+            self.stdout.write(self.style.WARNING(f"... {importer.rejected - 20} more rejected lines"))
+        if options['rejects']:
+            with open(options['rejects'], 'w', newline='') as output:
+                writer = csv.writer(output)
+                writer.writerow(['line', 'reason'])
+                writer.writerows(importer.rejects)
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {importer.imported} possessions in {importer.batches} batches, {importer.rejected} rejected, "
+            f"{importer.elapsed:.1f}s ({importer.rows_per_second:,.0f} rows/s)"
+        ))
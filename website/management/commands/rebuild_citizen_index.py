@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from website.directory import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the citizen directory search index from the user table"
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write("This database has no FTS index; the directory searches the user table directly")
+            return
+        started = time.perf_counter()
+        with transaction.atomic():
+            indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} citizens in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from decimal import Decimal
+from website.models import CitizenProfile
+from website.indicators import iter_citizen_ids, profiles_for, recount
+from website.dashboard import invalidate_citizens
+
+
+class Command(BaseCommand):
+    help = "Verify stored social indicators against the possession aggregate and report drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--tolerance', type=Decimal, default=Decimal('0.0001'),
+                            help="Largest difference treated as equal")
+        parser.add_argument('--fix', action='store_true',
+                            help="Overwrite drifted profiles with the recomputed value")
+
+    def handle(self, *args, **options):
+        tolerance = options['tolerance']
+        checked = drifted = fixed = 0
+        for citizen_ids in iter_citizen_ids(options['chunk_size']):
+            # Each chunk is counted and repaired under its profiles' locks
+            with transaction.atomic():
+                profiles = profiles_for(citizen_ids, lock=options['fix'])
+                scores = recount(citizen_ids)
+                stale = []
+                for profile in profiles.values():
+                    checked += 1
+                    expected = scores[profile.user_id]
+                    if abs(profile.current_social_indicator - expected) > tolerance:
+                        drifted += 1
+                        self.stdout.write(
+                            f"citizen {profile.user_id}: stored {profile.current_social_indicator} "
+                            f"expected {expected}"
+                        )
+                        profile.current_social_indicator = expected
+                        stale.append(profile)
+                if options['fix'] and stale:
+                    CitizenProfile.objects.bulk_update(stale, ['current_social_indicator'])
+            if options['fix'] and stale:
+                invalidate_citizens([profile.user_id for profile in stale])
+                fixed += len(stale)
+
+        summary = f"Checked {checked} profiles, {drifted} drifted"
+        if options['fix']:
+            summary += f", {fixed} fixed"
+        self.stdout.write(self.style.SUCCESS(summary) if not drifted or options['fix'] else self.style.WARNING(summary))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from website.workqueue import release_expired
+
+
+class Command(BaseCommand):
+    help = ("Put investigations whose lease expired (see RECLAMATION_LEASE_HOURS) back in the "
+            "reclamation queue; meant to run from cron every few minutes")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Reclamations released per transaction")
+
+    def handle(self, *args, **options):
+        released = release_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired claims"))
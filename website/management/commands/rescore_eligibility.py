@@ -0,0 +1,132 @@
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from decimal import Decimal
+from website.models import CitizenProfile, SocialIndicatorThreshold
+from website.dashboard import invalidate_citizens
+from website.indicators import iter_citizen_ids, profiles_for, recount
+
+PROGRAMS = [code for code, _ in SocialIndicatorThreshold.PROGRAM_TYPES]
+
+
+def threshold_pair(program_type):
+    """Return the (previous, latest) active max_score for a program, either may be None"""
+    scores = list(
+        SocialIndicatorThreshold.objects.filter(program_type=program_type, is_active=True)
+        .order_by('-effective_date')
+        .values_list('max_score', flat=True)[:2]
+    )
+    latest = scores[0] if scores else None
+    previous = scores[1] if len(scores) > 1 else None
+    return previous, latest
+
+
+def is_eligible(program_type, score, threshold, has_other_insurance):
+    if threshold is None:
+        return True
+    if program_type == 'amo' and has_other_insurance:
+        return False
+    return score <= threshold
+
+
+class Command(BaseCommand):
+    help = "Recompute every citizen's social indicator and report who flips eligibility between thresholds"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--program', choices=PROGRAMS, action='append',
+                            help="Program to compare (repeatable, defaults to all)")
+        parser.add_argument('--old-threshold', type=Decimal,
+                            help="Override the previous threshold (single program only)")
+        parser.add_argument('--new-threshold', type=Decimal,
+                            help="Override the new threshold (single program only)")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--start-after', type=int, default=0,
+                            help="Resume after this citizen id, as printed at the end of each chunk")
+        parser.add_argument('--dry-run', action='store_true', help="Do not write recomputed scores")
+        parser.add_argument('--output', help="Write flipped citizens to this CSV file")
+
+    def handle(self, *args, **options):
+        programs = options['program'] or PROGRAMS
+        overrides = options['old_threshold'] is not None or options['new_threshold'] is not None
+        if overrides and len(programs) != 1:
+            raise CommandError("--old-threshold/--new-threshold require exactly one --program")
+
+        thresholds = {}
+        for program_type in programs:
+            previous, latest = threshold_pair(program_type)
+            if options['old_threshold'] is not None:
+                previous = options['old_threshold']
+            if options['new_threshold'] is not None:
+                latest = options['new_threshold']
+            thresholds[program_type] = (previous, latest)
+            self.stdout.write(f"{program_type}: old threshold {previous}, new threshold {latest}")
+
+        writer = None
+        output = None
+        if options['output']:
+            output = open(options['output'], 'w', newline='')
+            writer = csv.writer(output)
+            writer.writerow(['citizen_id', 'program_type', 'score', 'change'])
+
+        gained = dict.fromkeys(programs, 0)
+        lost = dict.fromkeys(programs, 0)
+        total = rewritten = 0
+        started = chunk_started = time.perf_counter()
+        try:
+            for index, citizen_ids in enumerate(iter_citizen_ids(options['chunk_size'], options['start_after']), start=1):
+                # Scores are counted under the profiles' locks, so the rewrite loses no concurrent delta
+                with transaction.atomic():
+                    profiles = profiles_for(citizen_ids, 'has_other_insurance', lock=not options['dry_run'])
+                    scores = recount(citizen_ids)
+                    missing = [
+                        CitizenProfile(user_id=citizen_id, current_social_indicator=scores[citizen_id])
+                        for citizen_id in citizen_ids if citizen_id not in profiles
+                    ]
+                    changed = []
+                    for citizen_id in citizen_ids:
+                        score = scores[citizen_id]
+                        profile = profiles.get(citizen_id)
+                        has_other_insurance = profile.has_other_insurance if profile else False
+                        for program_type, (previous, latest) in thresholds.items():
+                            was = is_eligible(program_type, score, previous, has_other_insurance)
+                            eligible_now = is_eligible(program_type, score, latest, has_other_insurance)
+                            if was == eligible_now:
+                                continue
+                            if eligible_now:
+                                gained[program_type] += 1
+                            else:
+                                lost[program_type] += 1
+                            if writer:
+                                writer.writerow([citizen_id, program_type, score, 'gained' if eligible_now else 'lost'])
+                        if profile and profile.current_social_indicator != score:
+                            profile.current_social_indicator = score
+                            changed.append(profile)
+
+                    if not options['dry_run']:
+                        if missing:
+                            CitizenProfile.objects.bulk_create(missing, batch_size=1000)
+                        if changed:
+                            CitizenProfile.objects.bulk_update(changed, ['current_social_indicator'], batch_size=1000)
+                if not options['dry_run']:
+                    # bulk writes skip the signals that drop cached dashboards
+                    invalidate_citizens([profile.user_id for profile in changed + missing])
+                total += len(citizen_ids)
+                rewritten += len(changed) + len(missing)
+                elapsed = time.perf_counter() - chunk_started
+                self.stdout.write(
+                    f"chunk {index}: {len(citizen_ids)} citizens up to id {citizen_ids[-1]}, "
+                    f"{len(changed) + len(missing)} rewritten, {len(citizen_ids) / elapsed:.0f} citizens/s"
+                )
+                chunk_started = time.perf_counter()
+        finally:
+            if output:
+                output.close()
+
+        elapsed = time.perf_counter() - started
+        for program_type in programs:
+            self.stdout.write(f"{program_type}: {gained[program_type]} gained eligibility, {lost[program_type]} lost eligibility")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescored {total} citizens ({rewritten} rewritten) in {elapsed:.1f}s"
+            f"{' (dry run)' if options['dry_run'] else ''}"
+        ))
@@ -0,0 +1,87 @@
+import multiprocessing
+import signal
+import time
+from django.core.management.base import BaseCommand
+from django.db import connections
+from website import jobs
+from website.audit import get_sink
+
+
+def work(index, stop, poll, max_jobs):
+    """Body of one worker process: claim and run jobs until told to stop"""
+    # The parent catches Ctrl-C and SIGTERM and sets ``stop``, so a running job is finished first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    worker = jobs.worker_name(index)
+    done = 0
+    try:
+        while not stop.is_set() and (not max_jobs or done < max_jobs):
+            if jobs.run_next(worker):
+                done += 1
+            else:
+                stop.wait(poll)
+    finally:
+        # multiprocessing ends children without running atexit, which would flush the audit sink
+        get_sink().flush()
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ("Run queued background jobs with a pool of worker processes; each claims jobs from the "
+            "database, heartbeats while running them and retries failures with backoff")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help="Worker processes")
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds an idle worker waits between checks")
+        parser.add_argument('--max-jobs', type=int, default=0,
+                            help="Restart a worker process after this many jobs; 0 for never")
+        parser.add_argument('--once', action='store_true', help="Run the jobs due now in this process, then exit")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            requeued = jobs.requeue_stale()
+            worker, done = jobs.worker_name(), 0
+            while jobs.run_next(worker):
+                done += 1
+            self.stdout.write(self.style.SUCCESS(f"Ran {done} jobs, requeued {requeued} stale ones"))
+            return
+
+        # Fork so children inherit the configured Django; the parent closes its database
+        # connections before every fork, so each child opens its own
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        connections.close_all()
+
+        def start(index):
+            process = context.Process(target=work, args=(index, stop, options['poll'], options['max_jobs']),
+                                      name=f'job-worker-{index}', daemon=True)
+            process.start()
+            return process
+
+        stopping = []
+
+        def shutdown(signum, frame):
+            # Only note the signal here: setting ``stop`` takes a lock the main loop may hold in a wait
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        processes = [start(index) for index in range(options['concurrency'])]
+        self.stdout.write(f"Started {len(processes)} job workers")
+        last_sweep = 0.0
+        while not stopping:
+            if time.monotonic() - last_sweep >= jobs.heartbeat_interval():
+                requeued = jobs.requeue_stale()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f"Requeued {requeued} jobs whose worker stopped responding"))
+                connections.close_all()
+                last_sweep = time.monotonic()
+            for index, process in enumerate(processes):
+                if not process.is_alive() and not stopping:
+                    # Crashed, or recycled after --max-jobs
+                    processes[index] = start(index)
+            time.sleep(1)
+        stop.set()
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS("Job workers stopped"))
@@ -0,0 +1,218 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from website.counters import rebuild as rebuild_counters
+from website.directory import rebuild_index
+from website.models import (
+    User, CitizenProfile, PossessionCategory, PossessionType, CitizenPossession,
+    Reclamation, Fine, Application, AuditLog,
+)
+from website.workqueue import lease
+
+FIRST_NAMES = ['Ahmed', 'Fatima', 'Mohammed', 'Khadija', 'Youssef', 'Aicha', 'Omar', 'Salma',
+               'Hassan', 'Meryem', 'Rachid', 'Imane', 'Karim', 'Nadia', 'Said', 'Zineb']
+LAST_NAMES = ['Bensaid', 'Alaoui', 'Zahra', 'El Idrissi', 'Benali', 'Tazi', 'Berrada', 'Chraibi',
+              'Fassi', 'Amrani', 'Ouazzani', 'Bennani', 'Haddad', 'Lahlou', 'Sebti', 'Kettani']
+STREETS = ['Rue Mohammed V', 'Avenue Hassan II', 'Boulevard Allal Ben Abdallah', 'Rue de Fès',
+           'Avenue des FAR', 'Rue Ibn Khaldoun', 'Derb Sidi Ali', 'Rue Al Massira']
+CITIES = ['Midelt', 'Rabat', 'Errachidia', 'Khénifra', 'Azrou', 'Ifrane', 'Boumia', 'Zaida']
+
+# Used only when the database has no catalogue yet
+DEFAULT_CATALOGUE = {
+    'Véhicules': [('Voiture normale', '0.14'), ('Voiture de luxe', '0.45'), ('Moto', '0.05')],
+    'Immobilier': [('Appartement', '0.30'), ('Maison', '0.50'), ('Terrain agricole', '0.25')],
+    'Électronique': [('Téléviseur', '0.02'), ('Ordinateur', '0.03')],
+}
+
+SYNTHETIC_PREFIX = 'SYN'
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic citizen population with bulk_create for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citizens', type=int, default=10000)
+        parser.add_argument('--possessions', type=float, default=3.0,
+                            help="Average possessions per citizen")
+        parser.add_argument('--reclamation-rate', type=float, default=0.05)
+        parser.add_argument('--application-rate', type=float, default=0.3)
+        parser.add_argument('--audit-per-citizen', type=float, default=2.0)
+        parser.add_argument('--staff', type=int, default=10, help="Staff accounts per role")
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Citizens generated per transaction")
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        types = self.catalogue()
+        staff = self.staff_accounts(options['staff'])
+        offset = User.objects.filter(user_type='citizen', national_id__startswith=SYNTHETIC_PREFIX).count()
+
+        started = time.perf_counter()
+        total_rows = 0
+        remaining = options['citizens']
+        while remaining > 0:
+            size = min(options['chunk_size'], remaining)
+            chunk_started = time.perf_counter()
+            with transaction.atomic():
+                rows = self.generate_chunk(offset, size, types, staff, options)
+            elapsed = time.perf_counter() - chunk_started
+            total_rows += rows
+            offset += size
+            remaining -= size
+            self.stdout.write(f"{offset} citizens: {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+
+        # bulk_create skips the signals that keep the directory index current
+        index_started = time.perf_counter()
+        with transaction.atomic():
+            indexed = rebuild_index()
+        self.stdout.write(f"Search index: {indexed} citizens in {time.perf_counter() - index_started:.1f}s")
+        counters = rebuild_counters()
+        self.stdout.write(f"Dashboard counters: {len(counters)} rebuilt")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['citizens']} citizens, {total_rows} rows in {elapsed:.1f}s "
+            f"({total_rows / elapsed:,.0f} rows/s)"
+        ))
+
+    def catalogue(self):
+        types = list(PossessionType.objects.filter(is_active=True).values_list('id', 'name', 'point_value'))
+        if types:
+            return types
+        for category_name, entries in DEFAULT_CATALOGUE.items():
+            category = PossessionCategory.objects.create(name=category_name, description=category_name)
+            for name, points in entries:
+                PossessionType.objects.create(category=category, name=name, description=name, point_value=Decimal(points))
+        return list(PossessionType.objects.filter(is_active=True).values_list('id', 'name', 'point_value'))
+
+    def staff_accounts(self, per_role):
+        staff = {}
+        for index, role in enumerate(['data_entry_staff', 'investigator', 'supervisor', 'admin']):
+            existing = list(User.objects.filter(user_type=role).values_list('id', flat=True))
+            missing = per_role - len(existing)
+            if missing > 0:
+                created = User.objects.bulk_create([
+                    User(username=f'syn_{role}_{len(existing) + i}', user_type=role, password='!',
+                         national_id=f'{SYNTHETIC_PREFIX}S{index}{len(existing) + i:05d}',
+                         phone_number=f'+2129{index}{len(existing) + i:07d}', is_verified=True, is_staff=True)
+                    for i in range(missing)
+                ])
+                existing += [user.pk for user in created]
+            staff[role] = existing
+        return staff
+
+    def generate_chunk(self, offset, size, types, staff, options):
+        rng = self.rng
+        now = timezone.now()
+        users = User.objects.bulk_create([
+            User(
+                username=f'syn_citizen_{offset + i}',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password='!',  # Unusable; citizens log in by SMS code
+                user_type='citizen',
+                national_id=f'{SYNTHETIC_PREFIX}{offset + i:09d}',
+                phone_number=f'+2128{offset + i:08d}',
+                birth_date=date(1940, 1, 1) + timedelta(days=rng.randrange(25000)),
+                address=f'{rng.randrange(1, 300)} {rng.choice(STREETS)}, {rng.choice(CITIES)}',
+                is_verified=True,
+            )
+            for i in range(size)
+        ], batch_size=2000)
+        rows = len(users)
+
+        possessions = []
+        scores = {}
+        for user in users:
+            score = Decimal('0')
+            for _ in range(self.poisson(options['possessions'])):
+                type_id, _, points = rng.choice(types)
+                status = 'active' if rng.random() > 0.03 else 'removed'
+                if status == 'active':
+                    score += points
+                possessions.append(CitizenPossession(
+                    citizen_id=user.pk, possession_type_id=type_id, description='',
+                    acquisition_date=date(2000, 1, 1) + timedelta(days=rng.randrange(9000)),
+                    estimated_value=Decimal(rng.randrange(1000, 500000)), status=status,
+                    added_by_id=rng.choice(staff['data_entry_staff']),
+                ))
+            scores[user.pk] = score
+
+        CitizenProfile.objects.bulk_create([
+            CitizenProfile(
+                user_id=user.pk, family_size=rng.randint(1, 8),
+                monthly_income=Decimal(rng.randrange(0, 15000)),
+                has_other_insurance=rng.random() < 0.2,
+                current_social_indicator=scores[user.pk], last_calculated=now,
+            )
+            for user in users
+        ], batch_size=2000)
+        rows += len(users)
+        possessions = CitizenPossession.objects.bulk_create(possessions, batch_size=2000)
+        rows += len(possessions)
+
+        reclamations = []
+        for possession in possessions:
+            if rng.random() >= options['reclamation_rate']:
+                continue
+            status = rng.choice(['pending', 'under_investigation', 'approved', 'rejected', 'closed'])
+            # Claimed up to two leases ago, so about half of the open investigations have lapsed
+            claimed_at = now - rng.random() * 2 * lease() if status == 'under_investigation' else None
+            reclamations.append(Reclamation(
+                citizen_id=possession.citizen_id, possession_id=possession.pk, reason='Possession contestée',
+                status=status,
+                assigned_investigator_id=None if status == 'pending' else rng.choice(staff['investigator']),
+                resolution_date=now - timedelta(days=rng.randrange(365)) if status in ('approved', 'rejected', 'closed') else None,
+                claimed_at=claimed_at, lease_expires_at=claimed_at + lease() if claimed_at else None,
+            ))
+        reclamations = Reclamation.objects.bulk_create(reclamations, batch_size=2000)
+        rows += len(reclamations)
+        fines = Fine.objects.bulk_create([
+            Fine(reclamation_id=reclamation.pk, amount=Decimal(rng.randrange(100, 5000)),
+                 reason='Réclamation frauduleuse', applied_by_id=reclamation.assigned_investigator_id,
+                 is_paid=rng.random() < 0.5)
+            for reclamation in reclamations if reclamation.status == 'rejected'
+        ], batch_size=2000)
+        rows += len(fines)
+
+        applications = []
+        for user in users:
+            if rng.random() >= options['application_rate']:
+                continue
+            status = rng.choice(['submitted', 'submitted', 'approved', 'rejected', 'draft'])
+            reviewed = status in ('approved', 'rejected')
+            applications.append(Application(
+                citizen_id=user.pk, program_type=rng.choice(['amo', 'social_aid']), status=status,
+                social_indicator_at_submission=scores[user.pk],
+                threshold_at_submission=Decimal('1.5'),
+                submitted_at=None if status == 'draft' else now - timedelta(days=rng.randrange(365)),
+                reviewed_by_id=rng.choice(staff['supervisor']) if reviewed else None,
+                reviewed_at=now - timedelta(days=rng.randrange(180)) if reviewed else None,
+            ))
+        rows += len(Application.objects.bulk_create(applications, batch_size=2000))
+
+        audit = []
+        for user in users:
+            for _ in range(self.poisson(options['audit_per_citizen'])):
+                audit.append(AuditLog(
+                    user_id=user.pk, action_type='user_login',
+                    description=f'Connexion via vérification SMS pour {user.username}',
+                    ip_address=f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+                    user_agent='Mozilla/5.0', related_citizen_id=user.pk,
+                    timestamp=now - timedelta(seconds=rng.randrange(180 * 86400)),
+                ))
+        rows += len(AuditLog.objects.bulk_create(audit, batch_size=2000))
+        return rows
+
+    def poisson(self, mean):
+        # Knuth's method; fine for the small means used here
+        threshold = pow(2.718281828459045, -mean)
+        count, product = 0, self.rng.random()
+        while product > threshold:
+            count += 1
+            product *= self.rng.random()
+        return count
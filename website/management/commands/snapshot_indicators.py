@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from website.calculations import snapshot_population
+from website.models import User
+
+
+class Command(BaseCommand):
+    help = ("Record a social indicator calculation, with its possession snapshot, for every citizen; "
+            "run after a threshold or point value change")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calculated-by', required=True,
+                            help="Username of the supervisor or admin recorded on the calculations")
+        parser.add_argument('--notes', default='', help="Stored on every calculation, e.g. the change made")
+        parser.add_argument('--force', action='store_true',
+                            help="Also write citizens whose possession set matches their latest calculation")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            calculated_by = User.objects.get(username=options['calculated_by'], user_type__in=['supervisor', 'admin'])
+        except User.DoesNotExist:
+            raise CommandError(f"No supervisor or admin account named {options['calculated_by']}")
+        total = written = 0
+        started = chunk_started = time.perf_counter()
+        chunks = snapshot_population(calculated_by, options['notes'], options['force'], options['chunk_size'])
+        for index, (citizen_ids, calculations) in enumerate(chunks, start=1):
+            total += len(citizen_ids)
+            written += len(calculations)
+            elapsed = time.perf_counter() - chunk_started
+            self.stdout.write(
+                f"chunk {index}: {len(citizen_ids)} citizens up to id {citizen_ids[-1]}, "
+                f"{len(calculations)} calculations written, {len(citizen_ids) / elapsed:.0f} citizens/s"
+            )
+            chunk_started = time.perf_counter()
+        self.stdout.write(self.style.SUCCESS(
+            f"Recorded {written} calculations for {total} citizens in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,95 @@
+import json
+import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.deprecation import MiddlewareMixin
+from . import performance, routers
+
+logger = logging.getLogger('website.performance')
+
+
+class QueryMetricsMiddleware:
+    """Records query count, DB time, render time and latency for every request.
+
+    Records go to an in-memory ring buffer (see ``performance.buffer``); only
+    requests over ``PERF_BUDGET_MS`` or ``PERF_QUERY_BUDGET`` are logged, as
+    one JSON object per line. Works under WSGI and ASGI; under ASGI async
+    views are awaited directly instead of being pushed to a thread.
+    Streaming responses run most of their queries while the body is sent,
+    so they are measured until their last chunk instead.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = performance.RequestStats()
+        token = performance.current.set(stats)
+        status, response = 500, None
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return self.measure_stream(response, stats, request)
+        finally:
+            performance.current.reset(token)
+            if response is None or not response.streaming:
+                self.record(stats, request, status)
+
+    async def __acall__(self, request):
+        stats = performance.RequestStats()
+        # Queries run by sync_to_async copy this context, so they still reach ``stats``
+        token = performance.current.set(stats)
+        status, response = 500, None
+        try:
+            response = await self.get_response(request)
+            status = response.status_code
+            return self.measure_stream(response, stats, request)
+        finally:
+            performance.current.reset(token)
+            if response is None or not response.streaming:
+                self.record(stats, request, status)
+
+    def measure_stream(self, response, stats, request):
+        """Count the queries run while a streaming body is produced, recording once it ends"""
+        if not response.streaming:
+            return response
+        content = response.streaming_content
+
+        if response.is_async:
+            async def measured():
+                try:
+                    async for chunk in performance.measured_aiter(stats, content):
+                        yield chunk
+                finally:
+                    self.record(stats, request, response.status_code)
+        else:
+            def measured():
+                try:
+                    yield from performance.measured_iter(stats, content)
+                finally:
+                    self.record(stats, request, response.status_code)
+        response.streaming_content = measured()
+        return response
+
+    def record(self, stats, request, status):
+        record = performance.finish(stats, request, status)
+        if performance.over_budget(record):
+            slow_queries = [{'sql': sql[:1000], 'ms': round(ms, 3)} for sql, ms in stats.slow_queries]
+            logger.warning(json.dumps({**record, 'slow_queries': slow_queries}))
+
+
+class ReplicaStickinessMiddleware(MiddlewareMixin):
+    """After a successful write request, pins the session to the primary (see ``routers.reporting``)"""
+
+    def process_response(self, request, response):
+        if (routers.replica_alias() and request.method not in ('GET', 'HEAD', 'OPTIONS')
+                and response.status_code < 400 and hasattr(request, 'session')):
+            routers.stick_to_primary(request)
+        return response
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action_type',
+            field=models.CharField(choices=[('user_login', 'User Login'), ('possession_added', 'Possession Added'), ('possession_updated', 'Possession Updated'), ('reclamation_created', 'Reclamation Created'), ('reclamation_investigated', 'Reclamation Investigated'), ('fine_applied', 'Fine Applied'), ('application_submitted', 'Application Submitted'), ('application_reviewed', 'Application Reviewed'), ('calculation_performed', 'Social Indicator Calculated'), ('reclamation_assigned', 'Reclamation Assigned'), ('possession_edited', 'Possession Edited'), ('possession_deleted', 'Possession Deleted')], max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='auditlog_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['action_type', '-timestamp', '-id'], name='auditlog_action_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='auditlog_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['related_citizen', '-timestamp', '-id'], name='auditlog_citizen_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0003_auditlog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('row_count', models.IntegerField()),
+                ('first_timestamp', models.DateTimeField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('min_id', models.BigIntegerField()),
+                ('max_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-month'], name='auditarchive_month_idx')],
+            },
+        ),
+    ]
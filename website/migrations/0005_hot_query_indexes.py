@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('website', '0004_auditarchive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['citizen', 'program_type', 'status'], name='application_citizen_prog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['citizen', '-created_at'], name='application_citizen_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['status', 'submitted_at'], name='application_status_sub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['reviewed_by', 'status', 'reviewed_at'], name='application_reviewer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citizenpossession',
+            index=models.Index(fields=['citizen', 'status'], name='possession_citizen_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citizenpossession',
+            index=models.Index(fields=['citizen', '-created_at'], name='possession_citizen_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citizenpossession',
+            index=models.Index(fields=['added_by', '-created_at'], name='possession_added_by_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citizenpossession',
+            index=models.Index(fields=['possession_type', 'status'], name='possession_type_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reclamation',
+            index=models.Index(fields=['status', 'assigned_investigator', 'created_at'], name='reclamation_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reclamation',
+            index=models.Index(fields=['assigned_investigator', 'status'], name='reclamation_assignee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reclamation',
+            index=models.Index(fields=['assigned_investigator', 'resolution_date'], name='reclamation_resolved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reclamation',
+            index=models.Index(fields=['citizen', 'status'], name='reclamation_citizen_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reclamation',
+            index=models.Index(fields=['citizen', '-created_at'], name='reclamation_citizen_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='socialindicatorthreshold',
+            index=models.Index(fields=['program_type', 'is_active', 'effective_date'], name='threshold_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['user_type', 'last_name'], name='user_type_last_name_idx'),
+        ),
+    ]
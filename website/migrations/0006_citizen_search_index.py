@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS website_citizen_fts USING fts5("
+        "last_name, first_name, address, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO website_citizen_fts (rowid, last_name, first_name, address) "
+        "SELECT id, last_name, first_name, address FROM website_user WHERE user_type = 'citizen'"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS website_citizen_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0007_auditlog_possessions_imported'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action_type',
+            field=models.CharField(choices=[('user_login', 'User Login'), ('possession_added', 'Possession Added'), ('possession_updated', 'Possession Updated'), ('reclamation_created', 'Reclamation Created'), ('reclamation_investigated', 'Reclamation Investigated'), ('fine_applied', 'Fine Applied'), ('application_submitted', 'Application Submitted'), ('application_reviewed', 'Application Reviewed'), ('calculation_performed', 'Social Indicator Calculated'), ('reclamation_assigned', 'Reclamation Assigned'), ('possession_edited', 'Possession Edited'), ('possession_deleted', 'Possession Deleted'), ('possessions_imported', 'Possessions Imported'), ('data_exported', 'Data Exported')], max_length=30),
+        ),
+    ]
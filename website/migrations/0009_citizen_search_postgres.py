@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# PostgreSQL stand-in for the SQLite FTS5 table of 0006: accent- and
+# case-folded trigram indexes for name and address searches, and pattern
+# indexes so national id and phone prefixes use LIKE 'x%' on any collation.
+POSTGRES_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS website_user_last_name_trgm ON website_user "
+    "USING gin (upper(website_unaccent(last_name)) gin_trgm_ops) WHERE user_type = 'citizen'",
+    "CREATE INDEX IF NOT EXISTS website_user_address_trgm ON website_user "
+    "USING gin (upper(website_unaccent(address)) gin_trgm_ops) WHERE user_type = 'citizen'",
+    "CREATE INDEX IF NOT EXISTS website_user_national_id_prefix ON website_user (national_id varchar_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS website_user_phone_number_prefix ON website_user (phone_number varchar_pattern_ops)",
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # unaccent() is only STABLE; an index expression needs an IMMUTABLE wrapper
+    schema_editor.execute(
+        "CREATE OR REPLACE FUNCTION website_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$"
+    )
+    for statement in POSTGRES_INDEXES:
+        schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in ['last_name_trgm', 'address_trgm', 'national_id_prefix', 'phone_number_prefix']:
+        schema_editor.execute(f"DROP INDEX IF EXISTS website_user_{name}")
+    schema_editor.execute("DROP FUNCTION IF EXISTS website_unaccent(text)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0008_auditlog_data_exported'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:52
+
+from django.db import migrations, models
+
+
+def count_existing_rows(apps, schema_editor):
+    from website.counters import rebuild
+    rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0009_citizen_search_postgres'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_existing_rows, migrations.RunPython.noop),
+    ]
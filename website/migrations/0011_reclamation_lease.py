@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:54
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def lease_open_investigations(apps, schema_editor):
+    # Investigations already open get a full lease from now rather than being released at once
+    Reclamation = apps.get_model('website', 'Reclamation')
+    now = timezone.now()
+    Reclamation.objects.filter(status='under_investigation', assigned_investigator__isnull=False).update(
+        claimed_at=models.F('updated_at'),
+        lease_expires_at=now + timedelta(hours=getattr(settings, 'RECLAMATION_LEASE_HOURS', 48)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0010_statcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reclamation',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reclamation',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action_type',
+            field=models.CharField(choices=[('user_login', 'User Login'), ('possession_added', 'Possession Added'), ('possession_updated', 'Possession Updated'), ('reclamation_created', 'Reclamation Created'), ('reclamation_investigated', 'Reclamation Investigated'), ('fine_applied', 'Fine Applied'), ('application_submitted', 'Application Submitted'), ('application_reviewed', 'Application Reviewed'), ('calculation_performed', 'Social Indicator Calculated'), ('reclamation_assigned', 'Reclamation Assigned'), ('possession_edited', 'Possession Edited'), ('possession_deleted', 'Possession Deleted'), ('possessions_imported', 'Possessions Imported'), ('data_exported', 'Data Exported'), ('reclamation_released', 'Reclamation Released')], max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='reclamation',
+            index=models.Index(fields=['status', 'lease_expires_at'], name='reclamation_lease_idx'),
+        ),
+        migrations.RunPython(lease_open_investigations, migrations.RunPython.noop),
+    ]
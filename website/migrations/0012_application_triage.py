@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0011_reclamation_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='triage_flags',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='triaged_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action_type',
+            field=models.CharField(choices=[('user_login', 'User Login'), ('possession_added', 'Possession Added'), ('possession_updated', 'Possession Updated'), ('reclamation_created', 'Reclamation Created'), ('reclamation_investigated', 'Reclamation Investigated'), ('fine_applied', 'Fine Applied'), ('application_submitted', 'Application Submitted'), ('application_reviewed', 'Application Reviewed'), ('calculation_performed', 'Social Indicator Calculated'), ('reclamation_assigned', 'Reclamation Assigned'), ('possession_edited', 'Possession Edited'), ('possession_deleted', 'Possession Deleted'), ('possessions_imported', 'Possessions Imported'), ('data_exported', 'Data Exported'), ('reclamation_released', 'Reclamation Released'), ('application_triaged', 'Application Triaged')], max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['status', 'triaged_at', 'submitted_at'], name='application_triage_idx'),
+        ),
+    ]
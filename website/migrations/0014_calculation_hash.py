@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0013_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='socialindicatorcalculation',
+            name='possession_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='socialindicatorcalculation',
+            index=models.Index(fields=['citizen', '-calculation_date', '-id'], name='calculation_citizen_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0014_calculation_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditarchive',
+            name='blocks',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
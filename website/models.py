@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
+from django.utils import timezone
 from decimal import Decimal
 import uuid
 
@@ -41,6 +42,11 @@ class User(AbstractUser):
         help_text='Specific permissions for this user.',
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['user_type', 'last_name'], name='user_type_last_name_idx'),
+        ]
+
 
 class SocialIndicatorThreshold(models.Model):
     """Configuration for AMO and Social Aid thresholds"""
@@ -57,6 +63,9 @@ class SocialIndicatorThreshold(models.Model):
     
     class Meta:
         unique_together = ['program_type', 'effective_date']
+        indexes = [
+            models.Index(fields=['program_type', 'is_active', 'effective_date'], name='threshold_lookup_idx'),
+        ]
 
 class PossessionCategory(models.Model):
     """Categories of possessions that affect social indicator"""
@@ -73,6 +82,11 @@ class PossessionType(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        # Commit the point value with the holders' indicator deltas (website.signals)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class CitizenProfile(models.Model):
     """Extended profile information for citizens"""
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -102,6 +116,19 @@ class CitizenPossession(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['citizen', 'status'], name='possession_citizen_status_idx'),
+            models.Index(fields=['citizen', '-created_at'], name='possession_citizen_recent_idx'),
+            models.Index(fields=['added_by', '-created_at'], name='possession_added_by_recent_idx'),
+            models.Index(fields=['possession_type', 'status'], name='possession_type_status_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Commit the row with its indicator delta (website.signals)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class Reclamation(models.Model):
     """Citizen reclamations for possession disputes"""
     STATUS_CHOICES = [
@@ -121,9 +148,22 @@ class Reclamation(models.Model):
     assigned_investigator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='investigations')
     investigation_notes = models.TextField(blank=True)
     resolution_date = models.DateTimeField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    # An investigation not touched before this goes back to the queue (see website.workqueue)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'assigned_investigator', 'created_at'], name='reclamation_queue_idx'),
+            models.Index(fields=['status', 'lease_expires_at'], name='reclamation_lease_idx'),
+            models.Index(fields=['assigned_investigator', 'status'], name='reclamation_assignee_idx'),
+            models.Index(fields=['assigned_investigator', 'resolution_date'], name='reclamation_resolved_idx'),
+            models.Index(fields=['citizen', 'status'], name='reclamation_citizen_status_idx'),
+            models.Index(fields=['citizen', '-created_at'], name='reclamation_citizen_recent_idx'),
+        ]
+
 class Fine(models.Model):
     """Fines applied for false reclamations"""
     reclamation = models.OneToOneField(Reclamation, on_delete=models.CASCADE)
@@ -159,9 +199,21 @@ class Application(models.Model):
     review_notes = models.TextField(blank=True)
     submitted_at = models.DateTimeField(null=True, blank=True)
     reviewed_at = models.DateTimeField(null=True, blank=True)
+    # Set once the rules engine (website.adjudication) has evaluated the application
+    triaged_at = models.DateTimeField(null=True, blank=True)
+    triage_flags = models.JSONField(default=list, blank=True)  # Why the rules decided, or held it for a supervisor
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'triaged_at', 'submitted_at'], name='application_triage_idx'),
+            models.Index(fields=['citizen', 'program_type', 'status'], name='application_citizen_prog_idx'),
+            models.Index(fields=['citizen', '-created_at'], name='application_citizen_recent_idx'),
+            models.Index(fields=['status', 'submitted_at'], name='application_status_sub_idx'),
+            models.Index(fields=['reviewed_by', 'status', 'reviewed_at'], name='application_reviewer_idx'),
+        ]
+
 class SocialIndicatorCalculation(models.Model):
     """Historical record of social indicator calculations"""
     citizen = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -169,6 +221,12 @@ class SocialIndicatorCalculation(models.Model):
     calculation_date = models.DateTimeField(auto_now_add=True)
     calculated_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='calculations_made')
     notes = models.TextField(blank=True)
+    possession_hash = models.CharField(max_length=64, blank=True)  # Digest of the scored possession set
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['citizen', '-calculation_date', '-id'], name='calculation_citizen_recent_idx'),
+        ]
 
 class CalculationItem(models.Model):
     """Individual items in a social indicator calculation"""
@@ -189,6 +247,14 @@ class AuditLog(models.Model):
         ('application_submitted', 'Application Submitted'),
         ('application_reviewed', 'Application Reviewed'),
         ('calculation_performed', 'Social Indicator Calculated'),
+        ('reclamation_assigned', 'Reclamation Assigned'),
+        ('possession_edited', 'Possession Edited'),
+        ('possession_deleted', 'Possession Deleted'),
+        ('possessions_imported', 'Possessions Imported'),
+        ('data_exported', 'Data Exported'),
+        ('reclamation_released', 'Reclamation Released'),
+        ('application_triaged', 'Application Triaged'),
+        ('job_enqueued', 'Job Enqueued'),
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -198,4 +264,72 @@ class AuditLog(models.Model):
     user_agent = models.TextField()
     related_citizen = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='audit_logs_about')
     metadata = models.JSONField(default=dict)  # Store additional context
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)  # Set when recorded, not when flushed
+
+    class Meta:
+        # Every index ends in (timestamp, id) to serve the keyset-paginated viewer
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='auditlog_recent_idx'),
+            models.Index(fields=['action_type', '-timestamp', '-id'], name='auditlog_action_recent_idx'),
+            models.Index(fields=['user', '-timestamp', '-id'], name='auditlog_user_recent_idx'),
+            models.Index(fields=['related_citizen', '-timestamp', '-id'], name='auditlog_citizen_recent_idx'),
+        ]
+
+class AuditArchive(models.Model):
+    """One compressed JSON-lines file of audit entries moved out of the hot table"""
+    month = models.DateField()  # First day of the archived month
+    path = models.CharField(max_length=255, unique=True)
+    row_count = models.IntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    min_id = models.BigIntegerField()
+    max_id = models.BigIntegerField()
+    blocks = models.JSONField(default=list, blank=True)  # [first timestamp, first id, byte offset] per gzip member
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-month'], name='auditarchive_month_idx')]
+
+class StatCounter(models.Model):
+    """Denormalized dashboard count, kept current by signals (see website.counters)"""
+    key = models.CharField(max_length=100, unique=True)  # e.g. 'applications:status:submitted'
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.key} = {self.value}'
+
+
+class Job(models.Model):
+    """Background task in the database-backed queue run by the run_jobs workers (see website.jobs)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)  # Key of website.jobs.HANDLERS
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # Pushed back after a failed attempt
+    worker = models.CharField(max_length=100, blank=True)  # Holder of the current attempt
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)  # Seconds taken by the last attempt
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+            models.Index(fields=['status', 'heartbeat_at'], name='job_heartbeat_idx'),
+            models.Index(fields=['status', 'finished_at'], name='job_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
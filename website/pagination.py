@@ -0,0 +1,85 @@
+import base64
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(timestamp, pk):
+    """Encode a (timestamp, id) position as an opaque URL-safe token"""
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token from ``encode_cursor``; returns None for missing or malformed tokens"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        timestamp = parse_datetime(timestamp)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if timestamp is None:
+        return None
+    return timestamp, pk
+
+
+def keyset_page(queryset, cursor, page_size, field='timestamp'):
+    """Return one page of ``queryset`` newest first and the cursor of the next page.
+
+    Rows are ordered by (field, id) descending and the page starts strictly
+    after ``cursor``, so the cost of a page does not depend on how deep it is.
+    """
+    queryset = queryset.order_by(f'-{field}', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        timestamp, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk}))
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return rows, next_cursor
+
+
+def encode_key_cursor(value, pk):
+    """Encode a (text value, id) position as an opaque URL-safe token"""
+    raw = f"{pk}|{value}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_key_cursor(token, pk_type=int):
+    """Decode a token from ``encode_key_cursor``; returns None for missing or malformed tokens"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        pk, value = raw.split('|', 1)
+        return value, pk_type(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def ascending_page(queryset, cursor, page_size, field, pk_type=int):
+    """Return one page of ``queryset`` ordered by (field, id) ascending and the next cursor.
+
+    ``pk_type`` parses the id back out of the cursor, e.g. ``uuid.UUID``.
+    """
+    queryset = queryset.order_by(field, 'id')
+    position = decode_key_cursor(cursor, pk_type)
+    if position:
+        value, pk = position
+        # The redundant >= bound lets SQLite seek the index instead of scanning it
+        queryset = queryset.filter(Q(**{f'{field}__gte': value}) & (
+            Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+        ))
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_key_cursor(getattr(last, field), last.pk)
+    return rows, next_cursor
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+# Stats of the request being handled in this context, None outside a request.
+# A ContextVar (not a thread-local) so queries run through sync_to_async count too.
+current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'db_ms', 'render_started', 'slow_queries')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_started = None
+        self.slow_queries = []
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _query_timer(execute, sql, params, many, context):
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        stats.queries += 1
+        stats.db_ms += elapsed
+        if elapsed >= _setting('PERF_SLOW_QUERY_MS', 100):
+            stats.slow_queries.append((sql, elapsed))
+
+
+def install_query_timer(sender, connection, **kwargs):
+    if _query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_query_timer)
+
+
+connection_created.connect(install_query_timer, dispatch_uid='website.performance.query_timer')
+
+
+def measured_iter(stats, iterable):
+    """Yield from ``iterable`` with ``stats`` current while each item is produced"""
+    iterator = iter(iterable)
+    while True:
+        token = current.set(stats)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            current.reset(token)
+        yield item
+
+
+async def measured_aiter(stats, iterable):
+    """Async counterpart of ``measured_iter``"""
+    iterator = aiter(iterable)
+    while True:
+        token = current.set(stats)
+        try:
+            item = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            current.reset(token)
+        yield item
+
+
+def render_timer(request):
+    """Context processor: marks when template rendering starts for this request"""
+    stats = current.get()
+    if stats is not None and stats.render_started is None:
+        stats.render_started = time.perf_counter()
+    return {}
+
+
+class RingBuffer:
+    """Keeps the last N request records and slow queries in memory"""
+
+    def __init__(self, size, slow_size):
+        self._requests = deque(maxlen=size)
+        self._slow = deque(maxlen=slow_size)
+        self._lock = threading.Lock()
+
+    def add(self, record, slow_queries=()):
+        with self._lock:
+            self._requests.append(record)
+            self._slow.extend(slow_queries)
+
+    def records(self):
+        with self._lock:
+            return list(self._requests)
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow)
+
+    def clear(self):
+        with self._lock:
+            self._requests.clear()
+            self._slow.clear()
+
+    def summary(self):
+        """Return per-view percentiles over the buffered requests"""
+        by_view = {}
+        for record in self.records():
+            by_view.setdefault(record['view'], []).append(record)
+        views = {}
+        for view, records in sorted(by_view.items()):
+            durations = [r['duration_ms'] for r in records]
+            queries = [r['queries'] for r in records]
+            renders = [r['render_ms'] for r in records if r['render_ms'] is not None]
+            views[view] = {
+                'count': len(records),
+                'p50_ms': round(percentile(durations, 0.5), 3),
+                'p95_ms': round(percentile(durations, 0.95), 3),
+                'p99_ms': round(percentile(durations, 0.99), 3),
+                'max_ms': round(max(durations), 3),
+                'p50_queries': percentile(queries, 0.5),
+                'max_queries': max(queries),
+                'avg_db_ms': round(sum(r['db_ms'] for r in records) / len(records), 3),
+                'p95_render_ms': round(percentile(renders, 0.95), 3) if renders else None,
+            }
+        return views
+
+
+buffer = RingBuffer(_setting('PERF_RING_SIZE', 2000), _setting('PERF_SLOW_QUERY_RING_SIZE', 200))
+
+
+def finish(stats, request, status):
+    """Turn a request's stats into a buffered record and return it"""
+    ended = time.perf_counter()
+    match = getattr(request, 'resolver_match', None)
+    record = {
+        'view': match.view_name if match else '<unresolved>',
+        'method': request.method,
+        'path': request.path,
+        'status': status,
+        'duration_ms': round((ended - stats.started) * 1000, 3),
+        'queries': stats.queries,
+        'db_ms': round(stats.db_ms, 3),
+        'render_ms': round((ended - stats.render_started) * 1000, 3) if stats.render_started else None,
+        'timestamp': timezone.now().isoformat(),
+    }
+    slow = [
+        {'view': record['view'], 'sql': sql[:1000], 'ms': round(ms, 3), 'timestamp': record['timestamp']}
+        for sql, ms in stats.slow_queries
+    ]
+    buffer.add(record, slow)
+    return record
+
+
+def over_budget(record):
+    return (record['duration_ms'] > _setting('PERF_BUDGET_MS', 500)
+            or record['queries'] > _setting('PERF_QUERY_BUDGET', 50))
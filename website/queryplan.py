@@ -0,0 +1,37 @@
+import re
+from django.db import connection
+
+# Tables that grow with the population; a full scan on any of them is a bug.
+# Configuration tables (thresholds, the possession catalogue) stay small and are
+# cached whole, so reading them entirely is expected.
+HOT_TABLES = {
+    'website_user',
+    'website_citizenprofile',
+    'website_citizenpossession',
+    'website_reclamation',
+    'website_fine',
+    'website_application',
+    'website_auditlog',
+    'website_socialindicatorcalculation',
+    'website_calculationitem',
+}
+
+# "SCAN t" or "SCAN t AS alias", without a following "USING ... INDEX"
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+def explain(sql, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement (SQLite only)"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(sql, params=(), tables=HOT_TABLES):
+    """Return the hot tables a statement reads with a full table scan"""
+    scanned = []
+    for detail in explain(sql, params):
+        match = FULL_SCAN.match(detail.strip())
+        if match and match.group(1) in tables:
+            scanned.append(match.group(1))
+    return scanned
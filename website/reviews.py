@@ -0,0 +1,113 @@
+import time
+import uuid
+from contextlib import nullcontext
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from . import counters
+from .audit import build_entry, log_actions
+from .dashboard import invalidate_citizens
+from .models import Application, User
+
+ACTIONS = {'approve': 'approved', 'reject': 'rejected'}
+# Selections a supervisor can review in bulk without ticking each application
+RULES = {
+    'within_threshold': ('Indicateur inférieur ou égal au seuil',
+                         Q(social_indicator_at_submission__lte=F('threshold_at_submission'))),
+    'over_threshold': ('Indicateur supérieur au seuil',
+                       Q(social_indicator_at_submission__gt=F('threshold_at_submission'))),
+}
+
+
+def selection(ids=None, rule=None, program_type=None):
+    """Submitted applications picked by id, by rule, or both, oldest submission first"""
+    applications = Application.objects.filter(status='submitted')
+    if ids is not None:
+        applications = applications.filter(id__in=ids)
+    if rule:
+        applications = applications.filter(RULES[rule][1])
+    if program_type:
+        applications = applications.filter(program_type=program_type)
+    return applications.order_by('submitted_at', 'id')
+
+
+class BatchReview:
+    """Approves or rejects a selection of submitted applications in chunks.
+
+    Each chunk is one transaction: one UPDATE for the whole chunk, one
+    bulk insert of audit entries, and the counter and dashboard work the
+    model signals would have done. With ``atomic`` the whole batch is one
+    transaction instead. Applications reviewed by someone else in the
+    meantime are left out, not overwritten.
+    """
+
+    def __init__(self, reviewer, action, notes='', request=None, chunk_size=1000, atomic=False):
+        self.reviewer = reviewer
+        self.status = ACTIONS[action]
+        self.action = action
+        self.notes = notes
+        self.request = request
+        self.chunk_size = chunk_size
+        self.atomic = atomic
+        self.batch = uuid.uuid4().hex  # Ties the audit entries of one batch together
+        self.reviewed = 0
+        self.chunks = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.reviewed / self.elapsed if self.elapsed else 0.0
+
+    def run(self, applications, progress=None):
+        """Review every application of ``applications``; ``progress(review)`` is called after each chunk"""
+        started = time.perf_counter()
+        with transaction.atomic() if self.atomic else nullcontext():
+            while True:
+                # Reviewed rows leave the selection, so each chunk is the head of what is left
+                ids = list(applications.values_list('id', flat=True)[:self.chunk_size])
+                if not ids:
+                    break
+                self.review_chunk(ids)
+                self.elapsed = time.perf_counter() - started
+                if progress:
+                    progress(self)
+        self.elapsed = time.perf_counter() - started
+        return self
+
+    def review_chunk(self, ids, metadata=None):
+        """Review the still-submitted applications among ``ids``; returns the rows changed.
+
+        ``metadata`` maps an application id to extra audit metadata for it.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            Application.objects.filter(id__in=ids, status='submitted').update(
+                status=self.status, reviewed_by=self.reviewer, review_notes=self.notes,
+                reviewed_at=now, updated_at=now,
+            )
+            # Read back what this UPDATE changed; rows reviewed concurrently no longer match
+            rows = list(Application.objects.filter(
+                id__in=ids, status=self.status, reviewed_by=self.reviewer, reviewed_at=now,
+            ).values('id', 'citizen_id', 'program_type'))
+            if not rows:
+                return rows
+            old_keys, new_keys = [], []
+            for row in rows:
+                old_keys += counters.application_keys({**row, 'status': 'submitted', 'reviewed_by_id': None,
+                                                       'reviewed_at': None})
+                new_keys += counters.application_keys({**row, 'status': self.status,
+                                                       'reviewed_by_id': self.reviewer.pk, 'reviewed_at': now})
+            counters.apply_change(old_keys, new_keys)
+            log_actions([build_entry(
+                self.request, self.reviewer, 'application_reviewed',
+                f"Examen de la demande {row['id']} - {self.action}",
+                related_citizen=User(pk=row['citizen_id']),
+                metadata={'application_id': str(row['id']), 'batch': self.batch,
+                          **(metadata or {}).get(row['id'], {})},
+            ) for row in rows])
+            citizen_ids = {row['citizen_id'] for row in rows}
+            transaction.on_commit(lambda: invalidate_citizens(citizen_ids))
+        invalidate_citizens(citizen_ids)
+        self.chunks += 1
+        self.reviewed += len(rows)
+        return rows
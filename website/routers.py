@@ -0,0 +1,61 @@
+import time
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Set while a @reporting view runs; only then may reads go to the replica
+reporting_reads = ContextVar('reporting_reads', default=False)
+STICKY_SESSION_KEY = '_primary_until'
+# Sessions, auth and content types always come from the primary
+REPLICA_APPS = {'website'}
+
+
+def replica_alias():
+    return getattr(settings, 'READ_REPLICA', None)
+
+
+def stick_to_primary(request):
+    """Keep this session on the primary for a while, so it reads what it just wrote"""
+    request.session[STICKY_SESSION_KEY] = time.time() + getattr(settings, 'READ_REPLICA_STICKY_SECONDS', 15)
+
+
+def on_primary(request):
+    return request.session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+def reporting(view):
+    """Send the view's reads to the replica, unless the session wrote recently"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_alias() or on_primary(request):
+            return view(request, *args, **kwargs)
+        token = reporting_reads.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            reporting_reads.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Reads inside @reporting views go to READ_REPLICA; everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias and reporting_reads.get() and model._meta.app_label in REPLICA_APPS:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or saving a row read from the replica would write it back there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, replica_alias()} or None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,165 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import (
+    User, CitizenProfile, CitizenPossession, PossessionCategory, PossessionType, SocialIndicatorThreshold,
+    Reclamation, Application,
+)
+from . import catalogue, counters, dashboard, directory, indicators, thresholds
+
+
+# Social indicator maintenance
+@receiver(pre_save, sender=CitizenPossession)
+def remember_possession_contribution(sender, instance, raw=False, **kwargs):
+    """Snapshot what the stored row contributed before it is overwritten"""
+    instance._previous_contribution = None
+    if raw or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(
+        'citizen_id', 'status', 'possession_type__point_value'
+    ).first()
+    if previous:
+        instance._previous_contribution = indicators.possession_contribution(
+            previous['citizen_id'], previous['status'], previous['possession_type__point_value']
+        )
+
+@receiver(post_save, sender=CitizenPossession)
+def apply_possession_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = indicators.possession_contribution(
+        instance.citizen_id, instance.status, instance.possession_type.point_value
+    )
+    indicators.apply_possession_change(getattr(instance, '_previous_contribution', None), current)
+
+@receiver(pre_delete, sender=CitizenPossession)
+def remember_deleted_holding(sender, instance, origin=None, **kwargs):
+    """Tally scoring possessions per deletion: a type or user delete cascades to many rows at once"""
+    if instance.status != indicators.SCORING_STATUS:
+        return
+    # Kept on whatever started the delete (instance, queryset, type or user) so it is applied once
+    holder = origin if origin is not None else instance
+    if getattr(holder, '_deleted_holdings', None) is None:
+        holder._deleted_holdings = {}
+    key = (instance.citizen_id, instance.possession_type_id)
+    holder._deleted_holdings[key] = holder._deleted_holdings.get(key, 0) + 1
+
+@receiver(post_delete, sender=CitizenPossession)
+def apply_possession_delete(sender, instance, origin=None, **kwargs):
+    # Every pre_delete has run by now; the first post_delete applies the whole tally.
+    # Citizen cascades delete the profile too; its UPDATE then matches nothing
+    holder = origin if origin is not None else instance
+    holdings = getattr(holder, '_deleted_holdings', None)
+    if holdings:
+        holder._deleted_holdings = None
+        indicators.remove_holdings(holdings)
+
+@receiver(pre_save, sender=PossessionType)
+def remember_point_value(sender, instance, raw=False, **kwargs):
+    instance._previous_point_value = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_point_value = sender.objects.filter(pk=instance.pk).values_list(
+        'point_value', flat=True
+    ).first()
+
+@receiver(post_save, sender=PossessionType)
+def apply_point_value_save(sender, instance, created=False, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_point_value', None)
+    if raw or created or previous is None:
+        return
+    indicators.apply_point_value_change(instance.pk, previous, instance.point_value)
+
+
+# Threshold cache invalidation
+@receiver(post_save, sender=SocialIndicatorThreshold)
+@receiver(post_delete, sender=SocialIndicatorThreshold)
+def invalidate_thresholds(sender, **kwargs):
+    # Again on commit, so no reader caches the pre-commit rows under the new version
+    thresholds.invalidate()
+    transaction.on_commit(thresholds.invalidate)
+    dashboard.invalidate_all()
+    transaction.on_commit(dashboard.invalidate_all)
+
+
+# Citizen dashboard snapshots
+def invalidate_dashboard(citizen_id):
+    dashboard.invalidate_citizen(citizen_id)
+    transaction.on_commit(lambda: dashboard.invalidate_citizen(citizen_id))
+
+@receiver(post_save, sender=CitizenPossession)
+@receiver(post_delete, sender=CitizenPossession)
+@receiver(post_save, sender=Reclamation)
+@receiver(post_delete, sender=Reclamation)
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def invalidate_citizen_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.citizen_id)
+
+@receiver(post_save, sender=CitizenProfile)
+def invalidate_profile_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.user_id)
+
+@receiver(post_save, sender=PossessionType)
+@receiver(post_delete, sender=PossessionType)
+def invalidate_all_dashboards(sender, **kwargs):
+    # Point values move every holder's score and names appear in every snapshot
+    dashboard.invalidate_all()
+    transaction.on_commit(dashboard.invalidate_all)
+
+
+# Possession type catalogue
+@receiver(post_save, sender=PossessionCategory)
+@receiver(post_delete, sender=PossessionCategory)
+@receiver(post_save, sender=PossessionType)
+@receiver(post_delete, sender=PossessionType)
+def bump_catalogue_version(sender, **kwargs):
+    catalogue.bump_version()
+    transaction.on_commit(catalogue.bump_version)
+
+
+# Citizen directory search index; bulk writes bypass these and call directory.rebuild_index()
+@receiver(post_save, sender=User)
+def index_citizen(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login alone; nothing searchable changed
+    if update_fields and not set(update_fields) & directory.INDEXED_FIELDS:
+        return
+    directory.index_citizen(instance)
+
+@receiver(post_delete, sender=User)
+def unindex_citizen(sender, instance, **kwargs):
+    directory.unindex_citizen(instance.pk)
+
+
+# Dashboard counters; bulk writes bypass these and call counters.rebuild()
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Application)
+@receiver(pre_save, sender=Reclamation)
+def remember_counted_row(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_counter_keys = None
+    fields = counters.COUNTED_FIELDS[sender.__name__]
+    if raw or instance.pk is None:
+        return
+    # Logins save last_login alone; nothing counted changed
+    if update_fields and not (set(fields) | {field.removesuffix('_id') for field in fields}) & set(update_fields):
+        instance._previous_counter_keys = counters.keys_for(sender.__name__, counters.counted_row(instance))
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._previous_counter_keys = counters.keys_for(sender.__name__, previous)
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Application)
+@receiver(post_save, sender=Reclamation)
+def count_saved_row(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    counters.apply_change(
+        getattr(instance, '_previous_counter_keys', None) or [],
+        counters.keys_for(sender.__name__, counters.counted_row(instance)),
+    )
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Application)
+@receiver(post_delete, sender=Reclamation)
+def uncount_deleted_row(sender, instance, **kwargs):
+    counters.apply_change(counters.keys_for(sender.__name__, counters.counted_row(instance)), [])
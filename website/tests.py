@@ -1,3 +1,1717 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from functools import wraps
+from io import StringIO
+from itertools import count
+from unittest import mock, skipUnless
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, connections, transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .models import *
+from . import (
+    adjudication, archive, benchmarks, calculations, catalogue, counters, directory, indicators, jobs, performance, reviews,
+    routers, thresholds, views, workqueue,
+)
+from .audit import BatchingAuditSink, build_entry
+from .database import DEFAULT_SQLITE_PRAGMAS, current_pragmas
+from .indicators import calculate_social_indicator
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .queryplan import full_scans
 
-# Create your tests here.
+
+# Tests assert on audit rows as soon as a request returns, which only the sync sink guarantees
+if settings.AUDIT_SINK != 'sync':
+    raise ImproperlyConfigured("Run the tests with --settings=project.test_settings")
+
+def seed_population(citizens=1500):
+    """Bulk-create a small province: staff, citizens, catalogue and their activity"""
+    staff = {}
+    for index, user_type in enumerate(['data_entry_staff', 'investigator', 'supervisor', 'admin']):
+        staff[user_type] = ProvinceTestMixin.make_staff(user_type, user_type, index)
+    colleagues = User.objects.bulk_create([
+        User(username=f'{user_type}{i}', user_type=user_type, national_id=f'S{user_type[:3]}{i}',
+             phone_number=f'+2124{n:02d}{i:06d}', is_verified=True)
+        for n, user_type in enumerate(['investigator', 'supervisor']) for i in range(20)
+    ])
+    User.objects.bulk_create([
+        User(username=f'citizen{i}', first_name='Citoyen', last_name=f'Nom{i % 97}',
+             national_id=f'C{i:07d}', phone_number=f'+2126{i:08d}', address=f'{i} Rue Midelt',
+             is_verified=True)
+        for i in range(citizens)
+    ], batch_size=500)
+    citizen_ids = list(User.objects.filter(user_type='citizen').values_list('id', flat=True))
+    CitizenProfile.objects.bulk_create([CitizenProfile(user_id=pk) for pk in citizen_ids], batch_size=500)
+
+    category = PossessionCategory.objects.create(name='Véhicules', description='')
+    types = [
+        PossessionType.objects.create(category=category, name=f'Type {i}', description='', point_value=Decimal('0.1') * (i + 1))
+        for i in range(4)
+    ]
+    CitizenPossession.objects.bulk_create([
+        CitizenPossession(citizen_id=pk, possession_type=types[(pk + n) % 4], description='',
+                          acquisition_date=date(2020, 1, 1), estimated_value=1000,
+                          added_by=staff['data_entry_staff'])
+        for pk in citizen_ids for n in range(3)
+    ], batch_size=500)
+    possessions = CitizenPossession.objects.filter(citizen_id__in=citizen_ids[::10]).values_list('id', 'citizen_id')
+    # Like production, most work items are already resolved
+    Reclamation.objects.bulk_create([
+        Reclamation(citizen_id=citizen_id, possession_id=possession_id, reason='Erreur',
+                    status=['pending', 'under_investigation', 'approved', 'rejected', 'closed', 'closed'][possession_id % 6],
+                    assigned_investigator=None if possession_id % 6 == 0 else colleagues[possession_id % 20])
+        for possession_id, citizen_id in possessions
+    ], batch_size=500)
+    Application.objects.bulk_create([
+        Application(citizen_id=pk, program_type=['amo', 'social_aid'][pk % 2],
+                    status=['submitted', 'approved', 'rejected', 'approved', 'draft'][pk % 5],
+                    social_indicator_at_submission=Decimal('0.5'), threshold_at_submission=Decimal('1'),
+                    submitted_at=timezone.now() - timedelta(days=pk % 90),
+                    reviewed_by=colleagues[20 + pk % 20] if pk % 5 in (1, 2, 3) else None,
+                    reviewed_at=timezone.now() - timedelta(days=pk % 60) if pk % 5 in (1, 2, 3) else None)
+        for pk in citizen_ids[::2]
+    ], batch_size=500)
+    AuditLog.objects.bulk_create([
+        AuditLog(user=staff['admin'], action_type='user_login', description='Connexion',
+                 ip_address='127.0.0.1', user_agent='', related_citizen_id=citizen_ids[i % len(citizen_ids)],
+                 timestamp=timezone.now() - timedelta(minutes=i))
+        for i in range(3000)
+    ], batch_size=500)
+    SocialIndicatorThreshold.objects.create(program_type='amo', max_score=Decimal('1'),
+                                            effective_date=date(2020, 1, 1), created_by=staff['admin'])
+    return staff, citizen_ids
+
+
+class ProvinceTestMixin:
+    """Account factories, caches cleared before each test, and the dashboard counter check"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # The process-local threshold schedule outlives the rollback of earlier tests
+        thresholds.invalidate()
+
+    @staticmethod
+    def make_staff(username='agent', user_type='data_entry_staff', number=1, **fields):
+        """A verified staff account; ``number`` keeps its national id and phone number unique"""
+        fields.setdefault('is_verified', True)
+        return User.objects.create(username=username, user_type=user_type, national_id=f'S{number}',
+                                   phone_number=f'+2125{number:08d}', **fields)
+
+    @staticmethod
+    def make_citizen(number, **fields):
+        fields.setdefault('username', f'citizen{number}')
+        return User.objects.create(national_id=f'MA{number:06d}', phone_number=f'+2126{number:08d}', **fields)
+
+    def assert_counters_match_recount(self):
+        stored = dict(StatCounter.objects.exclude(value=0).values_list('key', 'value'))
+        self.assertEqual(stored, {key: value for key, value in counters.compute().items() if value})
+
+
+class IndicatorMaintenanceTests(ProvinceTestMixin, TestCase):
+    """The stored indicator follows every possession and point value write without a recount"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = cls.make_staff()
+        cls.citizens = []
+        for i in range(4):
+            citizen = cls.make_citizen(i)
+            CitizenProfile.objects.create(user=citizen)
+            cls.citizens.append(citizen)
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        cls.car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                                point_value=Decimal('0.5'))
+        cls.truck = PossessionType.objects.create(category=category, name='Camion', description='',
+                                                  point_value=Decimal('0.8'))
+
+    def add(self, citizen, possession_type, added_by=None):
+        return CitizenPossession.objects.create(
+            citizen=citizen, possession_type=possession_type, description='', acquisition_date=date(2020, 1, 1),
+            estimated_value=1000, added_by=added_by or self.staff,
+        )
+
+    def assert_indicators_match(self):
+        for profile in CitizenProfile.objects.select_related('user'):
+            self.assertEqual(profile.current_social_indicator, calculate_social_indicator(profile.user),
+                             profile.user.username)
+
+    def test_possession_writes(self):
+        citizen = self.citizens[0]
+        car = self.add(citizen, self.car)
+        self.add(citizen, self.car)
+        self.assert_indicators_match()
+        car.status = 'removed'
+        car.save()
+        self.assert_indicators_match()
+        car.status = 'active'
+        car.possession_type = self.truck
+        car.save()
+        self.assert_indicators_match()
+        car.citizen = self.citizens[1]
+        car.save()
+        self.assert_indicators_match()
+        self.truck.point_value = Decimal('1.2')
+        self.truck.save()
+        self.assert_indicators_match()
+        car.delete()
+        self.assert_indicators_match()
+        self.assertEqual(CitizenProfile.objects.get(user=citizen).current_social_indicator, Decimal('0.5'))
+
+    def test_rejected_applicant_must_still_recalculate(self):
+        citizen = self.citizens[2]
+        Application.objects.create(
+            citizen=citizen, program_type='amo', status='rejected', social_indicator_at_submission=0,
+            threshold_at_submission=1, submitted_at=timezone.now() - timedelta(days=1),
+        )
+        # Staff writes move the indicator but are not the citizen's recalculation
+        self.add(citizen, self.car)
+        self.truck.point_value = Decimal('0.9')
+        self.truck.save()
+        self.assertIsNone(CitizenProfile.objects.get(user=citizen).last_calculated)
+        self.client.force_login(citizen)
+        response = self.client.get(reverse('create_application', args=['amo']))
+        self.assertRedirects(response, reverse('eligibility_calculator'), fetch_redirect_response=False)
+        self.client.get(reverse('eligibility_calculator'))
+        response = self.client.get(reverse('create_application', args=['amo']))
+        self.assertRedirects(response, reverse('citizen_dashboard'), fetch_redirect_response=False)
+        SocialIndicatorThreshold.objects.create(program_type='amo', max_score=Decimal('1'),
+                                                effective_date=date(2020, 1, 1), created_by=self.staff)
+        response = self.client.get(reverse('create_application', args=['amo']))
+        self.assertEqual(response.status_code, 200)
+
+    def test_cascading_deletes_are_batched(self):
+        def delete_type(holders):
+            possession_type = PossessionType.objects.create(category=self.car.category, name='Tracteur',
+                                                            description='', point_value=Decimal('0.3'))
+            for citizen in holders:
+                self.add(citizen, possession_type)
+                self.add(citizen, possession_type)
+            with CaptureQueriesContext(connection) as queries:
+                possession_type.delete()
+            self.assert_indicators_match()
+            return len(queries.captured_queries)
+
+        self.add(self.citizens[0], self.car)
+        self.assertEqual(delete_type(self.citizens[:1]), delete_type(self.citizens))
+
+        # Deleting a staff account cascades to the possessions it entered for other citizens
+        clerk = self.make_staff('clerk', 'data_entry_staff', 2, is_verified=False)
+        for citizen in self.citizens:
+            self.add(citizen, self.truck, added_by=clerk)
+        self.add(self.citizens[1], self.car, added_by=clerk).delete()
+        clerk.delete()
+        self.assert_indicators_match()
+        self.citizens[0].delete()
+        self.assert_indicators_match()
+
+    def test_reconcile_repairs_drift(self):
+        self.add(self.citizens[0], self.car)
+        self.add(self.citizens[1], self.truck)
+        CitizenProfile.objects.filter(user__in=self.citizens[:2]).update(current_social_indicator=Decimal('7'))
+        output = StringIO()
+        call_command('reconcile_indicators', '--chunk-size', '1', stdout=output)
+        self.assertIn('2 drifted', output.getvalue())
+        self.assertEqual(CitizenProfile.objects.filter(current_social_indicator=Decimal('7')).count(), 2)
+        call_command('reconcile_indicators', '--fix', stdout=StringIO())
+        self.assert_indicators_match()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Row locks; SQLite serializes writers instead')
+class IndicatorResyncLockTests(ProvinceTestMixin, TransactionTestCase):
+    """A resync that writes absolute scores keeps the deltas of possession writes running alongside it"""
+
+    def test_concurrent_delta_survives_reconcile(self):
+        staff = self.make_staff()
+        citizen = self.make_citizen(1)
+        CitizenProfile.objects.create(user=citizen, current_social_indicator=Decimal('7'))
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                            point_value=Decimal('0.5'))
+        recount = indicators.recount
+        writers = []
+
+        def add_possession():
+            try:
+                CitizenPossession.objects.create(
+                    citizen=citizen, possession_type=car, description='', acquisition_date=date(2020, 1, 1),
+                    estimated_value=1000, added_by=staff,
+                )
+            finally:
+                connection.close()
+
+        def recount_during_write(citizen_ids):
+            writer = threading.Thread(target=add_possession)
+            writer.start()
+            writers.append(writer)
+            # The writer's delta waits for the locked profile
+            writer.join(0.5)
+            self.assertTrue(writer.is_alive())
+            return recount(citizen_ids)
+
+        with mock.patch('website.management.commands.reconcile_indicators.recount', recount_during_write):
+            call_command('reconcile_indicators', '--fix', stdout=StringIO())
+        writers[0].join()
+        self.assertEqual(CitizenProfile.objects.get(user=citizen).current_social_indicator, Decimal('0.5'))
+
+
+class RescoreEligibilityTests(ProvinceTestMixin, TestCase):
+    """rescore_eligibility recomputes scores and reports who flips between the last two thresholds"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_staff('admin', 'admin', 11)
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                            point_value=Decimal('0.5'))
+        cls.citizens = []
+        for i, cars in enumerate([1, 2, 0]):
+            citizen = cls.make_citizen(i)
+            CitizenProfile.objects.create(user=citizen)
+            for _ in range(cars):
+                CitizenPossession.objects.create(citizen=citizen, possession_type=car, description='',
+                                                 acquisition_date=date(2020, 1, 1), estimated_value=1000,
+                                                 added_by=cls.admin)
+            cls.citizens.append(citizen)
+        for effective, max_score in ((date(2024, 1, 1), '1'), (date(2025, 1, 1), '0.6')):
+            SocialIndicatorThreshold.objects.create(program_type='amo', max_score=Decimal(max_score),
+                                                    effective_date=effective, created_by=cls.admin)
+
+    def setUp(self):
+        super().setUp()
+        # Stored scores that drifted from the possessions
+        CitizenProfile.objects.update(current_social_indicator=Decimal('9'))
+
+    def rescore(self, *args):
+        output = StringIO()
+        call_command('rescore_eligibility', '--program', 'amo', *args, stdout=output)
+        return output.getvalue()
+
+    def scores(self):
+        return [CitizenProfile.objects.get(user=citizen).current_social_indicator for citizen in self.citizens]
+
+    def test_threshold_change_flips_eligibility(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'flips.csv')
+            output = self.rescore('--output', path)
+            with open(path) as flips:
+                rows = [line.split(',') for line in flips.read().splitlines()]
+        self.assertIn('amo: old threshold 1.0000, new threshold 0.6000', output)
+        self.assertIn('amo: 0 gained eligibility, 1 lost eligibility', output)
+        self.assertEqual([(row[0], row[1], Decimal(row[2]), row[3]) for row in rows[1:]],
+                         [(str(self.citizens[1].pk), 'amo', Decimal('1'), 'lost')])
+        self.assertEqual(self.scores(), [Decimal('0.5'), Decimal('1'), Decimal('0')])
+        # Overrides compare any pair of thresholds
+        self.assertIn('amo: 2 gained eligibility, 0 lost eligibility',
+                      self.rescore('--old-threshold', '0.2', '--new-threshold', '1'))
+
+    def test_dry_run_writes_nothing(self):
+        output = self.rescore('--dry-run')
+        self.assertIn('1 lost eligibility', output)
+        self.assertIn('(dry run)', output)
+        self.assertEqual(self.scores(), [Decimal('9')] * 3)
+
+    def test_resume_after_a_chunk(self):
+        output = self.rescore('--chunk-size', '1', '--start-after', str(self.citizens[0].pk))
+        self.assertIn(f'chunk 1: 1 citizens up to id {self.citizens[1].pk}, 1 rewritten', output)
+        self.assertIn('Rescored 2 citizens (2 rewritten)', output)
+        self.assertEqual(self.scores(), [Decimal('9'), Decimal('1'), Decimal('0')])
+
+
+class AuditLogViewerTests(ProvinceTestMixin, TestCase):
+    """The audit log viewer pages by (timestamp, id) and combines its filters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_staff('admin', 'admin', 11)
+        cls.agent = cls.make_staff()
+        cls.citizen = cls.make_citizen(1, username='citizen')
+        moment = datetime(2025, 3, 10, 9, tzinfo=dt_timezone.utc)
+        rows = []
+        for i in range(12):
+            rows.append(AuditLog(
+                user=cls.agent if i % 2 else cls.admin,
+                action_type='possession_added' if i % 3 else 'user_login',
+                description=f'Entrée {i}', ip_address='127.0.0.1', user_agent='',
+                related_citizen=cls.citizen if i % 4 == 0 else None,
+                # Groups of four share a timestamp
+                timestamp=moment + timedelta(days=i // 4),
+            ))
+        AuditLog.objects.bulk_create(rows)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def pages(self, **query):
+        ids, params = [], query
+        with mock.patch.object(views, 'AUDIT_LOG_PAGE_SIZE', 5):
+            while True:
+                context = self.client.get(reverse('audit_logs'), params).context
+                ids += [log.pk for log in context['logs']]
+                if not context['next_query']:
+                    return ids
+                params = QueryDict(context['next_query'])
+
+    def expected(self, **filters):
+        return list(AuditLog.objects.filter(**filters).order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def test_equal_timestamps_page_once_each(self):
+        self.assertEqual(self.pages(), self.expected())
+        page, cursor = keyset_page(AuditLog.objects.all(), None, 2)
+        # The cursor falls inside a group of equal timestamps; the next page resumes by id
+        self.assertEqual(page[0].timestamp, page[1].timestamp)
+        following, _ = keyset_page(AuditLog.objects.all(), cursor, 2)
+        self.assertEqual([log.pk for log in page + following], self.expected()[:4])
+
+    def test_filters_combine(self):
+        self.assertEqual(self.pages(action_type='user_login'), self.expected(action_type='user_login'))
+        self.assertEqual(self.pages(action_type='possession_added', user='agent'),
+                         self.expected(action_type='possession_added', user=self.agent))
+        self.assertEqual(self.pages(related_citizen='MA000001', date_from='2025-03-11', date_to='2025-03-12'),
+                         self.expected(related_citizen=self.citizen, timestamp__date__range=('2025-03-11', '2025-03-12')))
+        self.assertEqual(self.pages(user='nobody'), [])
+        self.assertEqual(self.pages(related_citizen='unknown'), [])
+        # Unknown action types and unparsable dates are ignored rather than matching nothing
+        self.assertEqual(self.pages(action_type='drop table', date_from='yesterday'), self.expected())
+
+    def test_malformed_cursor_is_rejected(self):
+        moment = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(moment, 7)), (moment, 7))
+        for token in ('not-base64!', encode_cursor(moment, 7)[:-3], 'MjAyNXxhYmM', ''):
+            self.assertIsNone(decode_cursor(token), token)
+        # The viewer treats a rejected cursor as no cursor: the first page
+        response = self.client.get(reverse('audit_logs'), {'cursor': 'bm9wZQ'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([log.pk for log in response.context['logs']], self.expected()[:50])
+
+
+def wait_for(condition, timeout=5):
+    """Poll ``condition`` until it holds, for work done by a background thread"""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class BatchingAuditSinkTests(ProvinceTestMixin, TransactionTestCase):
+    """The batched sink writes in bulk by size or time, keeps failed batches spooled and replays dead spools"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_staff('admin', 'admin', 11)
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        self.spool_dir = spool_dir.name
+
+    def sink(self, batch_size=100, flush_interval=60):
+        sink = BatchingAuditSink(batch_size, flush_interval, self.spool_dir)
+        self.addCleanup(sink.stop)
+        return sink
+
+    def entry(self, n=0):
+        return build_entry(None, self.user, 'user_login', f'Connexion {n}')
+
+    def spools(self):
+        return sorted(os.listdir(self.spool_dir))
+
+    def write_spool(self, name, entries):
+        with open(os.path.join(self.spool_dir, name), 'w', encoding='utf-8') as spool:
+            for entry in entries:
+                spool.write(json.dumps(entry, default=str) + '\n')
+
+    def test_flush_on_batch_size(self):
+        sink = self.sink(batch_size=3)
+        sink.record(self.entry(1))
+        sink.record(self.entry(2))
+        self.assertEqual(sink.metrics()['queue_depth'], 2)
+        self.assertEqual(self.spools(), [f'audit-{os.getpid()}.jsonl'])
+        self.assertFalse(AuditLog.objects.exists())
+        sink.record_many([self.entry(3)])
+        self.assertTrue(wait_for(lambda: sink.metrics()['written'] == 3))
+        metrics = sink.metrics()
+        self.assertEqual({key: metrics[key] for key in ('sink', 'flushes', 'last_batch_size', 'queue_depth')},
+                         {'sink': 'batched', 'flushes': 1, 'last_batch_size': 3, 'queue_depth': 0})
+        self.assertGreater(metrics['avg_flush_ms'], 0)
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual(self.spools(), [])
+
+    def test_flush_on_interval(self):
+        sink = self.sink(batch_size=100, flush_interval=0.05)
+        sink.record(self.entry())
+        self.assertTrue(wait_for(lambda: sink.metrics()['written'] == 1))
+        self.assertEqual(AuditLog.objects.get().description, 'Connexion 0')
+
+    def test_entries_wait_for_commit(self):
+        sink = self.sink()
+        with transaction.atomic():
+            sink.record(self.entry(1))
+            self.assertEqual(sink.metrics()['queue_depth'], 0)
+            transaction.set_rollback(True)
+        with transaction.atomic():
+            sink.record_many([self.entry(2), self.entry(3)])
+            self.assertEqual(self.spools(), [])
+        self.assertEqual(sink.metrics()['queue_depth'], 2)
+        sink.flush()
+        self.assertEqual(sorted(AuditLog.objects.values_list('description', flat=True)),
+                         ['Connexion 2', 'Connexion 3'])
+
+    def test_failed_flush_keeps_sealed_spool_and_retries(self):
+        sink = self.sink()
+        sink.record_many([self.entry(1), self.entry(2)])
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=DatabaseError('database is locked')), \
+                self.assertLogs('website.audit', 'ERROR'):
+            sink.flush()
+        metrics = sink.metrics()
+        self.assertEqual((metrics['failed_flushes'], metrics['written'], metrics['queue_depth']), (1, 0, 2))
+        self.assertEqual(self.spools(), [f'audit-{os.getpid()}.jsonl.1.flushing'])
+        sink.record(self.entry(3))
+        sink.flush()
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual(sink.metrics()['written'], 3)
+        self.assertEqual(self.spools(), [])
+
+    def test_dead_spools_replayed_once(self):
+        finished = subprocess.Popen(['true'])
+        finished.wait()
+        dead, alive = finished.pid, os.getppid()
+        self.write_spool(f'audit-{dead}.jsonl', [self.entry(1)])
+        self.write_spool(f'audit-{dead}.jsonl.2.flushing', [self.entry(2), self.entry(3)])
+        self.write_spool(f'audit-{alive}.jsonl', [self.entry(4)])
+        with self.assertLogs('website.audit', 'WARNING'):
+            self.sink()
+        self.assertEqual(sorted(AuditLog.objects.values_list('description', flat=True)),
+                         ['Connexion 1', 'Connexion 2', 'Connexion 3'])
+        self.assertEqual(self.spools(), [f'audit-{alive}.jsonl'])
+
+        # A process that loses the claim to another one leaves the file to it
+        self.write_spool(f'audit-{dead}.jsonl', [self.entry(5)])
+        with mock.patch('os.rename', side_effect=FileNotFoundError):
+            self.sink()
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_failed_replay_does_not_raise(self):
+        dead = subprocess.Popen(['true'])
+        dead.wait()
+        self.write_spool(f'audit-{dead.pid}.jsonl', [self.entry()])
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=DatabaseError('database is locked')), \
+                self.assertLogs('website.audit', 'ERROR'):
+            self.sink()
+        self.assertEqual(self.spools(), [f'audit-{os.getpid()}.jsonl.replay.audit-{dead.pid}.jsonl'])
+
+
+class AuditArchiveTests(ProvinceTestMixin, TestCase):
+    """Archived months read back in order, merged with rows still in the hot table"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_staff('admin', 'admin', 11)
+
+    def setUp(self):
+        super().setUp()
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        settings_override = override_settings(AUDIT_ARCHIVE_DIR=archive_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for patcher in (mock.patch.object(archive, 'BLOCK_ROWS', 3), mock.patch.object(views, 'AUDIT_LOG_PAGE_SIZE', 4)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client.force_login(self.admin)
+        for month in (1, 2):
+            for day in (3, 3, 9, 12, 12, 20, 27):  # Equal timestamps must still page in id order
+                self.log(datetime(2024, month, day, 8, tzinfo=dt_timezone.utc))
+        for day in (1, 2, 2):
+            self.log(datetime(2025, 6, day, 8, tzinfo=dt_timezone.utc))
+
+    def log(self, when, action_type='user_login'):
+        return AuditLog.objects.create(user=self.admin, action_type=action_type, description=f'{when:%Y-%m-%d}',
+                                       ip_address='127.0.0.1', user_agent='', timestamp=when)
+
+    def expected(self, **filters):
+        return list(AuditLog.objects.filter(**filters).order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def pages(self, **query):
+        ids, params = [], query
+        while True:
+            context = self.client.get(reverse('audit_logs'), params).context
+            ids += [log.pk for log in context['logs']]
+            if not context['next_query']:
+                return ids
+            params = QueryDict(context['next_query'])
+
+    def test_archive_month(self):
+        entry = archive.archive_month(date(2024, 1, 1))
+        self.assertEqual((entry.row_count, len(entry.blocks)), (7, 3))
+        self.assertFalse(AuditLog.objects.filter(timestamp__year=2024, timestamp__month=1).exists())
+        self.assertEqual(AuditLog.objects.count(), 10)
+        self.assertIsNone(archive.archive_month(date(2024, 1, 1)))
+        self.assertEqual(archive.archive_month(date(2024, 2, 1)).path, 'auditlog-2024-02-1.jsonl.gz')
+
+    def test_read_seeks_to_the_block(self):
+        ids = self.expected(timestamp__year=2024, timestamp__month=1)
+        position = AuditLog.objects.values_list('timestamp', 'id').get(pk=ids[4])
+        entry = archive.archive_month(date(2024, 1, 1))
+        rows = [row['id'] for row in archive._read(entry, before=position)]
+        # Starts at the block holding the row after the cursor, not at the top of the file
+        self.assertEqual(rows, ids[3:])
+        self.assertEqual([log.pk for log in archive.archived_page({}, position, 10)], ids[5:])
+
+    def test_pages_cross_hot_and_archive(self):
+        timestamps = dict(AuditLog.objects.values_list('id', 'timestamp'))
+
+        def newest_first(ids):
+            return sorted(ids, key=lambda pk: (timestamps[pk], pk), reverse=True)
+
+        archive.archive_month(date(2024, 1, 1))
+        archive.archive_month(date(2024, 2, 1))
+        self.assertEqual(self.pages(), newest_first(timestamps))
+
+        # Recorded into January after it was archived: it stays hot but pages between archived rows
+        late = self.log(datetime(2024, 1, 15, 8, tzinfo=dt_timezone.utc))
+        timestamps[late.pk] = late.timestamp
+        self.assertEqual(self.pages(), newest_first(timestamps))
+        january = newest_first(pk for pk, when in timestamps.items() if when.year == 2024 and when.month == 1)
+        self.assertEqual(self.pages(date_from='2024-01-01', date_to='2024-01-31'), january)
+
+        # The next run archives it as a second part of the month
+        self.assertEqual(archive.archive_month(date(2024, 1, 1)).path, 'auditlog-2024-01-2.jsonl.gz')
+        self.assertFalse(AuditLog.objects.filter(timestamp__year=2024).exists())
+        self.assertEqual(self.pages(date_from='2024-01-01', date_to='2024-01-31'), january)
+        self.assertEqual(self.pages(), newest_first(timestamps))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class HotQueryPlanTests(ProvinceTestMixin, TestCase):
+    """Every query behind the main pages must use an index on tables that grow"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, cls.citizen_ids = seed_population()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assert_no_full_scans(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 400, url)
+        offenders = [
+            (query['sql'], tables) for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and (tables := full_scans(query['sql']))
+        ]
+        self.assertEqual(offenders, [], f'Full table scan while rendering {url}')
+
+    def test_citizen_pages(self):
+        citizen = User.objects.get(id=self.citizen_ids[0])
+        possession = CitizenPossession.objects.filter(citizen=citizen).first()
+        for url in [
+            reverse('citizen_dashboard'),
+            reverse('eligibility_calculator'),
+            reverse('my_reclamations'),
+            reverse('my_applications'),
+            reverse('create_application', args=['social_aid']),
+            reverse('create_reclamation', args=[possession.id]),
+        ]:
+            with self.subTest(url=url):
+                self.assert_no_full_scans(citizen, url)
+
+    def test_staff_pages(self):
+        citizen_id = self.citizen_ids[0]
+        possession = CitizenPossession.objects.filter(citizen_id=citizen_id).first()
+        investigation = Reclamation.objects.filter(status='under_investigation').first()
+        investigation.assigned_investigator = self.staff['investigator']
+        investigation.save()
+        application = Application.objects.filter(status='submitted').first()
+        cases = [
+            ('data_entry_staff', reverse('staff_dashboard')),
+            ('data_entry_staff', reverse('manage_citizens')),
+            ('data_entry_staff', reverse('citizen_detail', args=[citizen_id])),
+            ('data_entry_staff', reverse('add_possession', args=[citizen_id])),
+            ('data_entry_staff', reverse('edit_possession', args=[possession.id])),
+            ('investigator', reverse('staff_dashboard')),
+            ('investigator', reverse('investigate_reclamation', args=[investigation.id])),
+            ('supervisor', reverse('staff_dashboard')),
+            ('supervisor', reverse('review_applications')),
+            ('supervisor', reverse('review_application', args=[application.id])),
+            ('admin', reverse('staff_dashboard')),
+            ('admin', reverse('audit_logs')),
+            ('admin', reverse('audit_logs') + '?action_type=user_login'),
+            ('admin', reverse('audit_logs') + '?related_citizen=C0000001'),
+        ]
+        for user_type, url in cases:
+            with self.subTest(user_type=user_type, url=url):
+                self.assert_no_full_scans(self.staff[user_type], url)
+
+
+def constant_queries(grow, budget=None):
+    """Pin a view's query count: the decorated test makes one request and returns the response.
+
+    The request runs once to warm caches, then is counted before and after
+    ``grow(self)`` adds rows; both counts must match and stay within ``budget``.
+    """
+    def decorator(test):
+        @wraps(test)
+        def wrapper(self):
+            test(self)
+            counts = []
+            for _ in range(2):
+                with CaptureQueriesContext(connection) as queries:
+                    response = test(self)
+                self.assertLess(response.status_code, 400)
+                counts.append(len(queries.captured_queries))
+                grow(self)
+            self.assertEqual(counts[0], counts[1], f'Query count grows with row count: {counts}')
+            if budget is not None:
+                self.assertLessEqual(counts[1], budget)
+        return wrapper
+    return decorator
+
+
+class RequestMetricsTests(ProvinceTestMixin, TestCase):
+    """Every request is measured; requests over budget are logged and the endpoint summarises them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_staff('admin', 'admin', 11)
+
+    def setUp(self):
+        super().setUp()
+        performance.buffer.clear()
+        self.client.force_login(self.admin)
+
+    @override_settings(PERF_QUERY_BUDGET=0, PERF_SLOW_QUERY_MS=0)
+    def test_over_budget_request_is_logged(self):
+        with self.assertLogs('website.performance', 'WARNING') as logs:
+            self.client.get(reverse('audit_logs'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['view'], record['status']), ('audit_logs', 200))
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(len(record['slow_queries']), record['queries'])
+        self.assertIsNotNone(record['render_ms'])
+
+    @override_settings(PERF_QUERY_BUDGET=1000, PERF_BUDGET_MS=60000)
+    def test_request_within_budget_is_not_logged(self):
+        with self.assertNoLogs('website.performance', 'WARNING'):
+            self.client.get(reverse('audit_logs'))
+        self.assertEqual(len(performance.buffer.records()), 1)
+
+    @override_settings(PERF_SLOW_QUERY_MS=0)
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('audit_logs'))
+        self.client.get(reverse('audit_logs'), {'action_type': 'user_login'})
+        data = self.client.get(reverse('performance_metrics'), {'recent': 1}).json()
+        summary = data['views']['audit_logs']
+        self.assertEqual(summary['count'], 2)
+        self.assertGreater(summary['p50_queries'], 0)
+        self.assertLessEqual(summary['p50_ms'], summary['max_ms'])
+        self.assertEqual([record['path'] for record in data['recent']], [reverse('audit_logs')] * 2)
+        self.assertTrue(data['slow_queries'])
+        self.assertEqual(data['audit_sink']['sink'], 'sync')
+
+
+class ListViewQueryBudgetTests(ProvinceTestMixin, TestCase):
+    """List pages must run a fixed number of queries however many rows they show"""
+
+    serial = count()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = {
+            user_type: cls.make_staff(user_type, user_type, index)
+            for index, user_type in enumerate(['data_entry_staff', 'investigator', 'supervisor', 'admin'])
+        }
+        cls.citizen = cls.new_citizen()
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        cls.types = [
+            PossessionType.objects.create(category=category, name=f'Type {i}', description='', point_value=Decimal('0.1'))
+            for i in range(3)
+        ]
+        SocialIndicatorThreshold.objects.create(program_type='amo', max_score=Decimal('1'),
+                                                effective_date=date(2020, 1, 1), created_by=cls.staff['admin'])
+
+    @classmethod
+    def new_citizen(cls):
+        n = next(cls.serial)
+        citizen = cls.make_citizen(n, is_verified=True)
+        CitizenProfile.objects.create(user=citizen)
+        return citizen
+
+    def grow(self):
+        """Add a few rows of every kind the list pages show, spread over new citizens"""
+        for _ in range(3):
+            citizen = self.new_citizen()
+            for owner in (citizen, self.citizen):
+                possession = CitizenPossession.objects.create(
+                    citizen=owner, possession_type=self.types[0], description='', acquisition_date=date(2020, 1, 1),
+                    estimated_value=1000, added_by=self.staff['data_entry_staff'])
+                Reclamation.objects.create(citizen=owner, possession=possession, reason='Erreur')
+                Reclamation.objects.create(citizen=owner, possession=possession, reason='Erreur',
+                                           status='under_investigation',
+                                           assigned_investigator=self.staff['investigator'])
+                Application.objects.create(citizen=owner, program_type='amo', status='submitted',
+                                           social_indicator_at_submission=Decimal('0.1'),
+                                           threshold_at_submission=Decimal('1'), submitted_at=timezone.now())
+            AuditLog.objects.create(user=citizen, action_type='user_login', description='Connexion',
+                                    ip_address='127.0.0.1', user_agent='')
+
+    def get(self, user, url):
+        # Log in during the warm-up request only, so the counts cover the view alone
+        if getattr(self, 'logged_in_as', None) != user.pk:
+            self.client.force_login(user)
+            self.logged_in_as = user.pk
+        return self.client.get(url)
+
+    @constant_queries(grow, budget=8)
+    def test_citizen_dashboard(self):
+        # Measure the snapshot build, not a cache hit
+        cache.clear()
+        return self.get(self.citizen, reverse('citizen_dashboard'))
+
+    @constant_queries(grow, budget=5)
+    def test_my_reclamations(self):
+        return self.get(self.citizen, reverse('my_reclamations'))
+
+    @constant_queries(grow, budget=5)
+    def test_my_applications(self):
+        return self.get(self.citizen, reverse('my_applications'))
+
+    @constant_queries(grow, budget=10)
+    def test_citizen_detail(self):
+        return self.get(self.staff['data_entry_staff'], reverse('citizen_detail', args=[self.citizen.id]))
+
+    @constant_queries(grow, budget=5)
+    def test_manage_citizens(self):
+        return self.get(self.staff['data_entry_staff'], reverse('manage_citizens'))
+
+    @constant_queries(grow, budget=5)
+    def test_data_entry_dashboard(self):
+        return self.get(self.staff['data_entry_staff'], reverse('staff_dashboard'))
+
+    @constant_queries(grow, budget=6)
+    def test_investigator_dashboard(self):
+        return self.get(self.staff['investigator'], reverse('staff_dashboard'))
+
+    @constant_queries(grow, budget=5)
+    def test_supervisor_dashboard(self):
+        return self.get(self.staff['supervisor'], reverse('staff_dashboard'))
+
+    @constant_queries(grow, budget=5)
+    def test_review_applications(self):
+        return self.get(self.staff['supervisor'], reverse('review_applications'))
+
+    @constant_queries(grow, budget=7)
+    def test_admin_dashboard(self):
+        return self.get(self.staff['admin'], reverse('staff_dashboard'))
+
+    @constant_queries(grow, budget=6)
+    def test_audit_logs(self):
+        return self.get(self.staff['admin'], reverse('audit_logs'))
+
+    @constant_queries(grow, budget=5)
+    def test_manage_possession_types(self):
+        return self.get(self.staff['admin'], reverse('manage_possession_types'))
+
+
+class CitizenDirectoryTests(ProvinceTestMixin, TestCase):
+    """The directory search index follows user writes and each search mode finds its citizens"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = cls.make_staff()
+        people = [
+            ('Bennani', 'MA123456', '+212612345678', '12 Rue Mohammed V, Midelt'),
+            ('El Idrissi', 'MA654321', '+212698765432', '3 Avenue Hassan II, Rabat'),
+            ('Alaoui', 'BK100200', '+212611112222', '8 Rue de Fès, Azrou'),
+        ]
+        cls.citizens = {
+            last_name: User.objects.create(username=last_name.lower().replace(' ', '_'), last_name=last_name,
+                                           national_id=national_id, phone_number=phone, address=address)
+            for last_name, national_id, phone, address in people
+        }
+
+    def search(self, query, field='all'):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('manage_citizens'), {'q': query, 'field': field})
+        return sorted(citizen.last_name for citizen in response.context['citizens'])
+
+    def test_search_modes(self):
+        self.assertEqual(self.search('MA'), ['Bennani', 'El Idrissi'])
+        self.assertEqual(self.search('ma6', 'national_id'), ['El Idrissi'])
+        self.assertEqual(self.search('0611'), ['Alaoui'])
+        self.assertEqual(self.search('+2126123'), ['Bennani'])
+        self.assertEqual(self.search('benn'), ['Bennani'])
+        self.assertEqual(self.search('el idr', 'last_name'), ['El Idrissi'])
+        self.assertEqual(self.search('idrissi', 'last_name'), [])
+        self.assertEqual(self.search('fes', 'address'), ['Alaoui'])
+        self.assertEqual(self.search('hassan rabat', 'address'), ['El Idrissi'])
+
+    def test_fold_matches_postgres_index_keys(self):
+        self.assertEqual(directory.fold('Rue de Fès'), 'RUE DE FES')
+        self.assertEqual(directory.fold('Hélène Aït'), 'HELENE AIT')
+
+    def test_index_follows_writes(self):
+        citizen = self.citizens['Alaoui']
+        citizen.last_name = 'Tazi'
+        citizen.save()
+        self.assertEqual(self.search('alaoui'), [])
+        self.assertEqual(self.search('tazi'), ['Tazi'])
+        citizen.delete()
+        self.assertEqual(self.search('tazi'), [])
+
+    def test_login_does_not_reindex(self):
+        citizen = self.citizens['Bennani']
+        User.objects.filter(pk=citizen.pk).update(is_verified=True)
+        with mock.patch.object(directory, 'index_citizen') as index_citizen:
+            self.client.post(reverse('citizen_login'), {'national_id': 'MA123456', 'phone_number': '+212612345678'})
+            response = self.client.post(reverse('verify_code'), {'verification_code': '123456'})
+        self.assertRedirects(response, reverse('citizen_dashboard'), fetch_redirect_response=False)
+        index_citizen.assert_not_called()
+
+    def test_directory_pages(self):
+        User.objects.bulk_create([
+            User(username=f'extra{i}', last_name='Zahra', national_id=f'ZZ{i:04d}', phone_number=f'+2127{i:08d}')
+            for i in range(120)
+        ])
+        self.client.force_login(self.staff)
+        seen, query = [], {}
+        while True:
+            response = self.client.get(reverse('manage_citizens'), query)
+            seen += [citizen.pk for citizen in response.context['citizens']]
+            if not response.context['next_query']:
+                break
+            query = QueryDict(response.context['next_query'])
+        self.assertEqual(len(seen), 123)
+        self.assertEqual(len(set(seen)), 123)
+
+
+class DashboardSnapshotTests(ProvinceTestMixin, TestCase):
+    """A warm citizen dashboard is served from its snapshot and follows writes to its inputs"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = cls.make_staff()
+        cls.citizen = cls.make_citizen(1, username='citizen')
+        CitizenProfile.objects.create(user=cls.citizen)
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        cls.car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                                point_value=Decimal('0.5'))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.citizen)
+
+    def dashboard(self):
+        return self.client.get(reverse('citizen_dashboard')).context
+
+    def add_possession(self):
+        return CitizenPossession.objects.create(citizen=self.citizen, possession_type=self.car, description='',
+                                                acquisition_date=date(2020, 1, 1), estimated_value=1000,
+                                                added_by=self.staff)
+
+    def test_warm_dashboard_queries(self):
+        self.dashboard()
+        # Session and user lookups belong to the auth middleware; the view itself adds at most one
+        with self.assertNumQueries(2):
+            self.dashboard()
+
+    def test_snapshot_follows_writes(self):
+        self.assertEqual(self.dashboard()['current_score'], 0)
+        possession = self.add_possession()
+        context = self.dashboard()
+        self.assertEqual(context['current_score'], Decimal('0.5'))
+        self.assertEqual([p['type_name'] for p in context['recent_possessions']], ['Voiture'])
+
+        Reclamation.objects.create(citizen=self.citizen, possession=possession, reason='Erreur')
+        self.assertEqual(self.dashboard()['pending_reclamations'], 1)
+        Application.objects.create(citizen=self.citizen, program_type='amo', status='submitted',
+                                   social_indicator_at_submission=Decimal('0.5'), threshold_at_submission=Decimal('1'))
+        self.assertEqual(self.dashboard()['active_applications'], 1)
+
+        self.assertTrue(self.dashboard()['amo_eligible'])
+        SocialIndicatorThreshold.objects.create(program_type='amo', max_score=Decimal('0.4'),
+                                                effective_date=date(2020, 1, 1), created_by=self.staff)
+        self.assertFalse(self.dashboard()['amo_eligible'])
+        self.car.point_value = Decimal('0.1')
+        self.car.save()
+        context = self.dashboard()
+        self.assertEqual(context['current_score'], Decimal('0.1'))
+        self.assertTrue(context['amo_eligible'])
+
+
+class ThresholdScheduleTests(ProvinceTestMixin, TestCase):
+    """The cached threshold schedule also expires, for changes whose invalidation this process never sees"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_staff('admin', 'admin', 11)
+        cls.threshold = SocialIndicatorThreshold.objects.create(program_type='amo', max_score=Decimal('1'),
+                                                                effective_date=date(2020, 1, 1), created_by=cls.admin)
+
+    @override_settings(THRESHOLD_CACHE_LOCAL_TTL=0, THRESHOLD_CACHE_TTL=60)
+    def test_unsignalled_change_expires(self):
+        self.assertEqual(thresholds.current_threshold('amo'), Decimal('1'))
+        # A write from another process: its version bump went to that process's own cache
+        SocialIndicatorThreshold.objects.filter(pk=self.threshold.pk).update(max_score=Decimal('2'))
+        with self.assertNumQueries(0):
+            self.assertEqual(thresholds.current_threshold('amo'), Decimal('1'))
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertEqual(thresholds.current_threshold('amo'), Decimal('2'))
+
+
+class PossessionImportTests(ProvinceTestMixin, TestCase):
+    """Registry extracts are imported in chunks, with indicators, audit and rejects kept consistent"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = cls.make_staff()
+        cls.citizens = [cls.make_citizen(i) for i in range(3)]
+        for citizen in cls.citizens:
+            CitizenProfile.objects.create(user=citizen)
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        cls.car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                                point_value=Decimal('0.14'))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff)
+
+    def upload(self, name, content):
+        return self.client.post(reverse('import_possessions'), {'file': SimpleUploadedFile(name, content.encode())})
+
+    def test_csv_import(self):
+        rows = ['national_id,possession_type,description,acquisition_date,estimated_value']
+        rows += [f'MA{i % 3:06d},{self.car.id if i % 2 else "voiture"},Immatriculation {i},2020-01-01,50000'
+                 for i in range(2500)]
+        rows += ['MA999999,Voiture,,2020-01-01,1000', 'MA000001,Bateau,,2020-01-01,1000',
+                 'MA000001,Voiture,,01/02/2020,1000', 'MA000001,Voiture,,2020-01-01,beaucoup']
+        response = self.upload('extrait.csv', '\n'.join(rows))
+        importer = response.context['importer']
+        self.assertEqual(importer.imported, 2500)
+        self.assertEqual([line for line, _ in importer.rejects], [2502, 2503, 2504, 2505])
+        self.assertEqual(CitizenPossession.objects.count(), 2500)
+        for citizen in self.citizens:
+            expected = CitizenPossession.objects.filter(citizen=citizen).count() * Decimal('0.14')
+            self.assertEqual(CitizenProfile.objects.get(user=citizen).current_social_indicator, expected)
+        batches = AuditLog.objects.filter(action_type='possessions_imported')
+        self.assertEqual(batches.count(), 3)
+        self.assertEqual(sum(entry.metadata['rows'] for entry in batches), 2500)
+
+    def test_jsonl_import_refreshes_dashboard(self):
+        citizen = self.citizens[0]
+        self.client.force_login(citizen)
+        self.assertEqual(self.client.get(reverse('citizen_dashboard')).context['current_score'], 0)
+        self.client.force_login(self.staff)
+        self.upload('extrait.jsonl', '\n'.join([
+            '{"national_id": "ma000000", "possession_type": "Voiture", "acquisition_date": "2021-06-01", "estimated_value": 90000}',
+            'pas du json',
+        ]))
+        self.client.force_login(citizen)
+        self.assertEqual(self.client.get(reverse('citizen_dashboard')).context['current_score'], Decimal('0.14'))
+
+
+class DataExportTests(ProvinceTestMixin, TestCase):
+    """Exports stream every matching row and respect each dataset's roles"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = cls.make_staff('chef', 'supervisor', 2)
+        cls.staff = cls.make_staff()
+        citizen = cls.make_citizen(1, username='citizen')
+        Application.objects.bulk_create([
+            Application(citizen=citizen, program_type='amo', status='approved' if i % 2 else 'submitted',
+                        social_indicator_at_submission=Decimal('1.5'), threshold_at_submission=Decimal('9'))
+            for i in range(1200)
+        ])
+
+    def test_csv_streams_filtered_rows(self):
+        self.client.force_login(self.supervisor)
+        response = self.client.get(reverse('export_data', args=['applications']), {'status': 'approved'})
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="applications-', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['id', 'citizen_national_id', 'program_type', 'status'])
+        self.assertEqual(len(lines), 601)
+        self.assertTrue(all(',MA000001,amo,approved,' in line for line in lines[1:]))
+        self.assertEqual(AuditLog.objects.filter(action_type='data_exported').count(), 1)
+
+    def test_jsonl_and_roles(self):
+        self.client.force_login(self.supervisor)
+        response = self.client.get(reverse('export_data', args=['applications']), {'format': 'jsonl'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1200)
+        self.assertEqual(rows[0]['threshold_at_submission'], '9.0000')
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('export_data', args=['applications'])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('export_data', args=['nothing'])).status_code, 404)
+
+    @override_settings(PERF_SLOW_QUERY_MS=0)
+    def test_streamed_queries_are_measured(self):
+        self.client.force_login(self.supervisor)
+        performance.buffer.clear()
+        response = self.client.get(reverse('export_data', args=['applications']))
+        self.assertEqual(performance.buffer.records(), [])
+        b''.join(response.streaming_content)
+        [record] = performance.buffer.records()
+        self.assertEqual((record['view'], record['status']), ('export_data', 200))
+        self.assertTrue(any('FROM "website_application"' in query['sql'] for query in performance.buffer.slow_queries()))
+
+
+class AsyncApiTests(ProvinceTestMixin, TestCase):
+    """The JSON endpoints are native coroutines and still pass through auth and query metrics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = cls.make_staff()
+        cls.citizen = cls.make_citizen(1, username='citizen')
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        cls.category = category
+        cls.car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                                point_value=Decimal('0.5'))
+        PossessionType.objects.create(category=category, name='Charrette', description='',
+                                      point_value=Decimal('0.1'), is_active=False)
+        CitizenPossession.objects.create(citizen=cls.citizen, possession_type=cls.car, description='',
+                                         acquisition_date=date(2020, 1, 1), estimated_value=1000, added_by=cls.staff)
+
+    def test_views_are_async(self):
+        for name in ['get_possession_types_by_category', 'get_possession_types', 'calculate_score_ajax']:
+            self.assertTrue(iscoroutinefunction(getattr(views, name)), name)
+
+    async def test_possession_types(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('get_possession_types_by_category', args=[self.category.pk]))
+        self.assertEqual([row['name'] for row in response.json()], ['Voiture'])
+        response = await self.async_client.get(reverse('get_possession_types', args=[self.category.pk]))
+        self.assertEqual(len(response.json()), 2)
+        record = performance.buffer.records()[-1]
+        self.assertEqual(record['view'], 'get_possession_types')
+        self.assertGreaterEqual(record['queries'], 1)
+
+    async def test_calculate_score(self):
+        await self.async_client.aforce_login(self.citizen)
+        response = await self.async_client.post(reverse('calculate_score_ajax'))
+        self.assertEqual(response.json(), {'score': 0.5})
+        response = await self.async_client.get(reverse('calculate_score_ajax'))
+        self.assertEqual(response.status_code, 400)
+
+
+class PossessionCatalogueTests(ProvinceTestMixin, TestCase):
+    """The catalogue is served from memory with a strong ETag and follows category and type writes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = cls.make_staff()
+        cls.category = PossessionCategory.objects.create(name='Véhicules', description='')
+        cls.car = PossessionType.objects.create(category=cls.category, name='Voiture', description='',
+                                                point_value=Decimal('0.5'))
+        PossessionType.objects.create(category=cls.category, name='Charrette', description='',
+                                      point_value=Decimal('0.1'), is_active=False)
+
+    def setUp(self):
+        super().setUp()
+        catalogue.clear()
+        self.client.force_login(self.staff)
+
+    def get(self, **headers):
+        return self.client.get(reverse('possession_catalogue'), headers=headers)
+
+    def test_etag_and_warm_queries(self):
+        response = self.get()
+        self.assertEqual(response.json()['categories'],
+                         [{'id': self.category.pk, 'name': 'Véhicules',
+                           'types': [{'id': self.car.pk, 'name': 'Voiture', 'point_value': '0.5000'}]}])
+        self.assertEqual(response['Cache-Control'], 'private, max-age=60')
+        etag = response['ETag']
+        # Only the session and user lookups of the auth middleware remain
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get().content, response.content)
+        with self.assertNumQueries(2):
+            not_modified = self.get(if_none_match=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+
+    def test_writes_change_the_etag(self):
+        etag = self.get()['ETag']
+        self.car.point_value = Decimal('0.6')
+        self.car.save()
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['categories'][0]['types'][0]['point_value'], '0.6000')
+        etag = response['ETag']
+        PossessionCategory.objects.create(name='Immobilier', description='')
+        self.assertEqual(len(self.get(if_none_match=etag).json()['categories']), 2)
+
+    def test_tag_depends_on_content_only(self):
+        etag = self.get()['ETag']
+        # As another process would see it: its own build under its own version number
+        catalogue.clear()
+        cache.clear()
+        self.assertEqual(self.get()['ETag'], etag)
+        # A write whose version bump this process never sees is picked up after max_age
+        PossessionType.objects.filter(pk=self.car.pk).update(point_value=Decimal('0.6'))
+        self.assertEqual(self.get()['ETag'], etag)
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 61):
+            self.assertNotEqual(self.get()['ETag'], etag)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite connection tuning')
+class SQLiteTuningTests(TestCase):
+    """Every SQLite connection gets the configured pragmas"""
+
+    def test_pragmas_applied(self):
+        pragmas = current_pragmas(connection)
+        self.assertEqual(pragmas['synchronous'], 1)
+        self.assertEqual(pragmas['busy_timeout'], DEFAULT_SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(pragmas['cache_size'], DEFAULT_SQLITE_PRAGMAS['cache_size'])
+        self.assertEqual(pragmas['temp_store'], 2)
+
+
+def sync_replica():
+    """Stand-in for replication: copy the primary test database over the replica's file"""
+    for alias in ('default', 'replica'):
+        connections[alias].ensure_connection()
+    connections['default'].connection.backup(connections['replica'].connection)
+
+
+@skipUnless(connection.vendor == 'sqlite' and 'replica' in settings.DATABASES, 'SQLite replica test database')
+@override_settings(READ_REPLICA='replica')
+class ReplicaRoutingTests(ProvinceTestMixin, TransactionTestCase):
+    """Reporting views read from the replica until the session writes, then from the primary"""
+
+    # The replica alias only exists under project.test_settings on SQLite
+    databases = {'default', 'replica'} & set(settings.DATABASES)
+
+    def setUp(self):
+        super().setUp()
+        self.staff = self.make_staff()
+        self.citizen = self.make_citizen(1, username='bennani', last_name='Bennani')
+        CitizenProfile.objects.create(user=self.citizen)
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        self.car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                                 point_value=Decimal('0.5'))
+        sync_replica()
+        self.client.force_login(self.staff)
+
+    def directory(self, **query):
+        return [citizen.username for citizen in self.client.get(reverse('manage_citizens'), query).context['citizens']]
+
+    def test_reports_read_the_replica(self):
+        self.make_citizen(2, username='alaoui', last_name='Alaoui')
+        self.assertEqual(self.directory(), ['bennani'])
+        self.assertEqual(self.directory(q='alaoui'), [])
+        sync_replica()
+        self.assertEqual(self.directory(), ['alaoui', 'bennani'])
+        self.assertEqual(self.directory(q='alaoui'), ['alaoui'])
+
+    def test_sticky_after_write(self):
+        response = self.client.post(reverse('add_possession', args=[self.citizen.pk]), {
+            'possession_type': self.car.pk, 'description': 'Dacia', 'acquisition_date': '2020-01-01',
+            'estimated_value': '90000',
+        })
+        self.assertEqual(CitizenPossession.objects.using('replica').count(), 0)
+        response = self.client.get(response['Location'])
+        self.assertEqual([p.description for p in response.context['possessions']], ['Dacia'])
+        self.assertEqual(response.context['profile'].current_social_indicator, Decimal('0.5'))
+
+        session = self.client.session
+        session[routers.STICKY_SESSION_KEY] = 0
+        session.save()
+        response = self.client.get(reverse('citizen_detail', args=[self.citizen.pk]))
+        self.assertEqual(list(response.context['possessions']), [])
+
+    def test_writes_go_to_the_primary(self):
+        token = routers.reporting_reads.set(True)
+        try:
+            citizen = User.objects.get(pk=self.citizen.pk)
+            self.assertEqual(citizen._state.db, 'replica')
+            citizen.address = 'Midelt'
+            citizen.save()
+        finally:
+            routers.reporting_reads.reset(token)
+        self.assertEqual(User.objects.get(pk=self.citizen.pk).address, 'Midelt')
+        self.assertEqual(User.objects.using('replica').get(pk=self.citizen.pk).address, '')
+
+
+class StatCounterTests(ProvinceTestMixin, TestCase):
+    """Dashboard counters follow every write and agree with a full recount"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.investigator = cls.make_staff('enqueteur', 'investigator', 1)
+        cls.supervisor = cls.make_staff('chef', 'supervisor', 2)
+        cls.admin = cls.make_staff('admin', 'admin', 3)
+        cls.citizens = [cls.make_citizen(i) for i in range(3)]
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                            point_value=Decimal('0.5'))
+        cls.possession = CitizenPossession.objects.create(
+            citizen=cls.citizens[0], possession_type=car, description='', acquisition_date=date(2020, 1, 1),
+            estimated_value=1000, added_by=cls.admin,
+        )
+
+    def test_counters_follow_writes(self):
+        applications = [
+            Application.objects.create(citizen=citizen, program_type='amo', status='submitted',
+                                       social_indicator_at_submission=Decimal('0.5'),
+                                       threshold_at_submission=Decimal('1'))
+            for citizen in self.citizens
+        ]
+        reclamation = Reclamation.objects.create(citizen=self.citizens[0], possession=self.possession,
+                                                 reason='Erreur')
+        self.assert_counters_match_recount()
+
+        application = applications[0]
+        application.status = 'approved'
+        application.reviewed_by = self.supervisor
+        application.reviewed_at = timezone.now()
+        application.save()
+        reclamation.assigned_investigator = self.investigator
+        reclamation.status = 'closed'
+        reclamation.resolution_date = timezone.now()
+        reclamation.save()
+        applications[1].delete()
+        self.citizens[2].last_login = timezone.now()
+        self.citizens[2].save(update_fields=['last_login'])
+        self.assert_counters_match_recount()
+
+        today = timezone.localdate()
+        self.assertEqual(counters.read(counters.approved_key(self.supervisor.pk, today),
+                                       'applications:status:submitted', 'users:citizen', 'reclamations:status:pending'),
+                         {counters.approved_key(self.supervisor.pk, today): 1, 'applications:status:submitted': 1,
+                          'users:citizen': 3, 'reclamations:status:pending': 0})
+        self.citizens[2].delete()
+        self.assert_counters_match_recount()
+
+        self.client.force_login(self.admin)
+        context = self.client.get(reverse('staff_dashboard')).context
+        self.assertEqual((context['total_users'], context['total_applications'], context['pending_reclamations']),
+                         (5, 1, 0))
+        self.client.force_login(self.investigator)
+        self.assertEqual(self.client.get(reverse('staff_dashboard')).context['completed_today'], 1)
+
+    def test_rebuild_after_bulk_load(self):
+        User.objects.bulk_create([
+            User(username=f'bulk{i}', national_id=f'BK{i:06d}', phone_number=f'+2127{i:08d}') for i in range(10)
+        ])
+        self.assertEqual(counters.read('users:citizen')['users:citizen'], 3)
+        counters.rebuild()
+        self.assertEqual(counters.read('users:citizen')['users:citizen'], 13)
+        self.assert_counters_match_recount()
+
+
+class ReclamationWorkQueueTests(ProvinceTestMixin, TestCase):
+    """Reclamations are claimed oldest first, by exactly one investigator, and come back when a lease expires"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = cls.make_staff('alice', 'investigator', 11)
+        cls.bob = cls.make_staff('bob', 'investigator', 12)
+        citizen = cls.make_citizen(1, username='citizen')
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                            point_value=Decimal('0.5'))
+        possession = CitizenPossession.objects.create(
+            citizen=citizen, possession_type=car, description='', acquisition_date=date(2020, 1, 1),
+            estimated_value=1000, added_by=cls.alice,
+        )
+        cls.reclamations = []
+        for i in range(workqueue.QUEUE_PREVIEW + 5):
+            reclamation = Reclamation.objects.create(citizen=citizen, possession=possession, reason=f'Erreur {i}')
+            Reclamation.objects.filter(pk=reclamation.pk).update(created_at=timezone.now() - timedelta(days=100 - i))
+            cls.reclamations.append(reclamation.pk)
+
+    def test_benchmark_needs_scratch_database(self):
+        configured = str(connection.settings_dict['NAME'])
+        # Not named, another database, then the right one but never seeded
+        for arguments in ([], ['--database', 'db.sqlite3'], ['--database', configured]):
+            with self.subTest(arguments=arguments), self.assertRaises(CommandError):
+                call_command('benchmark_work_queue', *arguments, stdout=StringIO())
+        User.objects.create(username='synthetic', national_id='SYN000000001', phone_number='+212700000001')
+        benchmarks.check_scratch_database(configured)
+
+    def test_claims_oldest_first_without_double_claims(self):
+        for skip_locked in (False, True):
+            with self.subTest(skip_locked=skip_locked), transaction.atomic():
+                with mock.patch.object(workqueue, 'skip_locked', return_value=skip_locked):
+                    first = workqueue.claim(self.alice, 3)
+                    second = workqueue.claim(self.bob, 5)
+                self.assertEqual(first + second, self.reclamations[:8])
+                self.assertEqual(Reclamation.objects.filter(id__in=first, assigned_investigator=self.alice,
+                                                            status='under_investigation').count(), 3)
+                self.assertEqual(
+                    AuditLog.objects.filter(action_type='reclamation_assigned', user=self.bob).count(), 5
+                )
+                self.assert_counters_match_recount()
+                transaction.set_rollback(True)
+
+    def test_assign_loses_race_gracefully(self):
+        self.assertTrue(workqueue.claim_one(self.alice, self.reclamations[0]))
+        self.client.force_login(self.bob)
+        response = self.client.post(reverse('assign_reclamation', args=[self.reclamations[0]]), follow=True)
+        self.assertContains(response, 'déjà été prise en charge')
+        self.assertEqual(Reclamation.objects.get(pk=self.reclamations[0]).assigned_investigator, self.alice)
+
+        self.client.post(reverse('claim_reclamations'), {'count': 2})
+        self.assertEqual(
+            set(Reclamation.objects.filter(assigned_investigator=self.bob).values_list('id', flat=True)),
+            set(self.reclamations[1:3]),
+        )
+        self.assert_counters_match_recount()
+
+    def test_expired_lease_returns_to_queue(self):
+        claimed = workqueue.claim(self.alice, 2)
+        Reclamation.objects.filter(id__in=claimed).update(lease_expires_at=timezone.now() - timedelta(minutes=1))
+        # Opening an investigation renews its lease
+        self.client.force_login(self.alice)
+        self.client.get(reverse('investigate_reclamation', args=[claimed[0]]))
+        self.assertEqual(workqueue.release_expired(), 1)
+        self.assertEqual(Reclamation.objects.get(pk=claimed[0]).assigned_investigator, self.alice)
+        released = Reclamation.objects.get(pk=claimed[1])
+        self.assertEqual((released.status, released.assigned_investigator, released.lease_expires_at),
+                         ('pending', None, None))
+        self.assertTrue(AuditLog.objects.filter(action_type='reclamation_released', user=self.alice).exists())
+        self.assert_counters_match_recount()
+        self.assertEqual(workqueue.claim(self.bob, 1), [claimed[1]])
+
+    def test_dashboard_lists_head_of_queue(self):
+        self.client.force_login(self.bob)
+        context = self.client.get(reverse('staff_dashboard')).context
+        self.assertEqual([r.pk for r in context['pending_reclamations']],
+                         self.reclamations[:workqueue.QUEUE_PREVIEW])
+        self.assertEqual(context['pending_count'], len(self.reclamations))
+
+
+class BatchReviewTests(ProvinceTestMixin, TestCase):
+    """Batch review changes many applications with a fixed number of queries and keeps counters exact"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = cls.make_staff('chef', 'supervisor', 21)
+        cls.citizens = [cls.make_citizen(i) for i in range(60)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.supervisor)
+
+    def submit(self, citizens, score):
+        started = timezone.now() - timedelta(days=1)
+        return [Application.objects.create(
+            citizen=citizen, program_type='amo', status='submitted', social_indicator_at_submission=Decimal(score),
+            threshold_at_submission=Decimal('1'), submitted_at=started + timedelta(seconds=i),
+        ).pk for i, citizen in enumerate(citizens)]
+
+    def test_rule_batch_uses_set_based_writes(self):
+        over = self.submit(self.citizens[:3], '2')
+        self.submit(self.citizens[3:4], '0.5')
+        # The first run creates the counters it moves; later runs only update them
+        reviews.BatchReview(self.supervisor, 'approve').run(reviews.selection(rule='within_threshold'))
+        self.submit(self.citizens[4:8], '0.5')
+        with CaptureQueriesContext(connection) as small:
+            reviews.BatchReview(self.supervisor, 'approve').run(reviews.selection(rule='within_threshold'))
+        self.submit(self.citizens[8:], '0.5')
+        with CaptureQueriesContext(connection) as large:
+            review = reviews.BatchReview(self.supervisor, 'approve').run(reviews.selection(rule='within_threshold'))
+        self.assertEqual(review.reviewed, 52)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(Application.objects.filter(status='approved').count(), 57)
+        self.assertEqual(set(Application.objects.filter(status='submitted').values_list('id', flat=True)), set(over))
+        self.assertEqual(AuditLog.objects.filter(action_type='application_reviewed',
+                                                 metadata__batch=review.batch).count(), 52)
+        self.assert_counters_match_recount()
+        self.assertEqual(self.client.get(reverse('staff_dashboard')).context['approved_today'], 57)
+
+    def test_selected_batch_skips_already_reviewed(self):
+        ids = self.submit(self.citizens[:3], '0.5')
+        other = self.make_staff('autre', 'supervisor', 22, is_verified=False)
+        Application.objects.filter(pk=ids[0]).update(status='approved', reviewed_by=other)
+        response = self.client.post(reverse('review_applications_batch'), {
+            'application': [str(pk) for pk in ids], 'action': 'reject', 'notes': 'Dossier incomplet',
+        }, follow=True)
+        self.assertContains(response, '2 demande(s) examinée(s)')
+        self.assertEqual(Application.objects.get(pk=ids[0]).reviewed_by, other)
+        self.assertEqual(Application.objects.filter(status='rejected', review_notes='Dossier incomplet').count(), 2)
+
+    def test_review_list_is_paged(self):
+        ids = self.submit(self.citizens, '0.5')
+        response = self.client.get(reverse('review_applications'))
+        self.assertEqual([a.pk for a in response.context['applications']], ids[:views.APPLICATION_PAGE_SIZE])
+        response = self.client.get(reverse('review_applications'), {'cursor': response.context['next_cursor']})
+        self.assertEqual([a.pk for a in response.context['applications']], ids[views.APPLICATION_PAGE_SIZE:])
+        self.assertIsNone(response.context['next_cursor'])
+
+
+class AdjudicationTests(ProvinceTestMixin, TestCase):
+    """The rules decide clear-cut applications and hold the rest for supervisors"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = cls.make_staff('chef', 'supervisor', 31)
+        cls.citizens = []
+        for i in range(6):
+            citizen = cls.make_citizen(i)
+            CitizenProfile.objects.create(user=citizen, has_other_insurance=i == 3)
+            cls.citizens.append(citizen)
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                            point_value=Decimal('0.5'))
+        possession = CitizenPossession.objects.create(
+            citizen=cls.citizens[4], possession_type=car, description='', acquisition_date=date(2020, 1, 1),
+            estimated_value=1000, added_by=cls.supervisor,
+        )
+        Reclamation.objects.create(citizen=cls.citizens[4], possession=possession, reason='Erreur')
+
+    def submit(self, citizen, score, program_type='amo'):
+        return Application.objects.create(
+            citizen=citizen, program_type=program_type, status='submitted', submitted_at=timezone.now(),
+            social_indicator_at_submission=Decimal(score), threshold_at_submission=Decimal('1'),
+        ).pk
+
+    def test_clear_cases_decided_borderline_held(self):
+        approved = self.submit(self.citizens[0], '0.5')
+        rejected = self.submit(self.citizens[1], '2')
+        borderline = self.submit(self.citizens[2], '0.95')
+        insured = self.submit(self.citizens[3], '0.5')
+        insured_social_aid = self.submit(self.citizens[3], '0.5', 'social_aid')
+        disputed = self.submit(self.citizens[4], '0.5')
+
+        with CaptureQueriesContext(connection) as queries:
+            adjudicator = adjudication.Adjudicator(self.supervisor, chunk_size=4).run()
+        self.assertLess(len(queries.captured_queries), 60)
+        self.assertEqual(adjudicator.counts, {'approve': 2, 'reject': 2, 'review': 2})
+        statuses = dict(Application.objects.values_list('id', 'status'))
+        self.assertEqual(
+            [statuses[pk] for pk in (approved, rejected, borderline, insured, insured_social_aid, disputed)],
+            ['approved', 'rejected', 'submitted', 'rejected', 'approved', 'submitted'],
+        )
+        self.assertEqual(Application.objects.get(pk=disputed).triage_flags,
+                         ['Indicateur nettement sous le seuil', 'Réclamation en cours'])
+        self.assertFalse(Application.objects.filter(triaged_at__isnull=True).exists())
+        self.assertEqual(AuditLog.objects.filter(action_type='application_triaged').count(), 2)
+        self.assertTrue(AuditLog.objects.filter(action_type='application_reviewed', metadata__auto=True,
+                                                metadata__application_id=str(insured)).exists())
+        self.assert_counters_match_recount()
+
+        # Each application is evaluated once
+        self.assertEqual(adjudication.Adjudicator(self.supervisor).run().evaluated, 0)
+
+    def test_dry_run_writes_nothing(self):
+        for citizen in self.citizens[:3]:
+            self.submit(citizen, '0.5')
+        adjudicator = adjudication.Adjudicator(self.supervisor, chunk_size=2, dry_run=True).run()
+        self.assertEqual(adjudicator.counts['approve'], 3)
+        self.assertEqual(Application.objects.filter(status='submitted', triaged_at__isnull=True).count(), 3)
+        self.assertFalse(AuditLog.objects.exists())
+
+
+class JobQueueTests(ProvinceTestMixin, TestCase):
+    """Jobs are claimed once, retried with backoff and shown on the admin page"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_staff('admin', 'admin', 41)
+
+    def test_command_job_runs_once(self):
+        job = jobs.enqueue_command('rebuild_stat_counters', user=self.admin)
+        self.assertEqual(jobs.claim('first').pk, job.pk)
+        self.assertIsNone(jobs.claim('other'))
+        Job.objects.filter(pk=job.pk).update(status='queued', worker='')  # Hand it back to run it whole
+        self.assertTrue(jobs.run_next('worker'))
+        self.assertFalse(jobs.run_next('worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.worker), ('succeeded', 2, ''))
+        self.assertIn('Rebuilt', job.result['output'])
+        self.assertIsNotNone(job.duration)
+        with self.assertRaises(ValueError):
+            jobs.enqueue_command('flush')
+
+    def test_failures_back_off_then_fail(self):
+        jobs.HANDLERS['test_failure'] = lambda job: 1 / 0
+        self.addCleanup(jobs.HANDLERS.pop, 'test_failure')
+        job = jobs.enqueue('test_failure', max_attempts=2)
+        self.assertTrue(jobs.run_next('worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('ZeroDivisionError', job.error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertFalse(jobs.run_next('worker'))  # Not due yet
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.run_next('worker')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    @override_settings(JOB_HEARTBEAT_SECONDS=0.01)
+    def test_heartbeat_survives_a_failed_beat(self):
+        job = jobs.enqueue('command', {'command': 'rebuild_stat_counters'})
+        results = iter([DatabaseError('database is locked')])
+
+        def beat(job, worker):
+            error = next(results, None)
+            if error:
+                raise error
+            return 1
+
+        with mock.patch.object(jobs, 'beat', side_effect=beat) as patched, self.assertLogs('website.jobs', 'ERROR'):
+            heartbeat = jobs.Heartbeat(job, 'worker')
+            heartbeat.start()
+            self.assertTrue(wait_for(lambda: patched.call_count >= 3))
+            self.assertTrue(heartbeat.is_alive())
+            heartbeat.stop()
+        self.assertFalse(heartbeat.is_alive())
+
+    def test_stale_job_is_requeued(self):
+        job = jobs.enqueue('command', {'command': 'rebuild_stat_counters'})
+        jobs.claim('lost-worker')
+        self.assertEqual(jobs.requeue_stale(), 0)
+        self.assertEqual(jobs.requeue_stale(now=timezone.now() + jobs.stale_after() * 2), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), ('queued', ''))
+        # The lost worker's late report no longer applies
+        self.assertEqual(jobs.finish(job, 'lost-worker', 0.0, result={}), 0)
+
+    def test_admin_page(self):
+        self.client.force_login(self.admin)
+        self.client.post(reverse('job_queue'), {'command': 'release_expired_claims', 'batch_size': '10'})
+        job = Job.objects.get()
+        self.assertEqual(job.payload, {'command': 'release_expired_claims', 'args': ['--batch-size', '10']})
+        self.assertTrue(AuditLog.objects.filter(action_type='job_enqueued').exists())
+        response = self.client.get(reverse('job_queue'))
+        self.assertEqual(response.context['stats']['depth']['queued'], 1)
+        self.assertContains(response, 'release_expired_claims')
+
+    def test_admin_page_takes_no_paths(self):
+        self.client.force_login(self.admin)
+        refused = [
+            {'command': 'release_expired_claims', 'args': '--batch-size 10'},
+            {'command': 'export_data', 'dataset': 'applications', 'output': '/etc/cron.d/x'},
+            {'command': 'import_possessions', 'path': '/etc/passwd'},
+            {'command': 'batch_review_applications', 'action': 'approve', 'rule': 'within_threshold',
+             'ids': '/etc/passwd'},
+            {'command': 'export_data', 'dataset': '../applications'},
+            {'command': 'export_data', 'dataset': 'applications', 'date_from': '--output=/tmp/x'},
+        ]
+        for data in refused:
+            with self.subTest(data=data):
+                response = self.client.post(reverse('job_queue'), data, follow=True)
+                self.assertContains(response, 'Tâche refusée')
+        self.assertFalse(Job.objects.exists())
+
+        with tempfile.TemporaryDirectory() as output_dir, self.settings(JOB_OUTPUT_DIR=output_dir):
+            self.client.post(reverse('job_queue'), {'command': 'export_data', 'dataset': 'applications',
+                                                    'format': 'jsonl', 'date_from': '2025-01-01'})
+            args = Job.objects.get().payload['args']
+            self.assertEqual(args[:5], ['applications', '--format', 'jsonl', '--date-from', '2025-01-01'])
+            self.assertEqual(args[5], '--output')
+            self.assertEqual(os.path.dirname(args[6]), output_dir)
+            self.assertTrue(args[6].endswith('.jsonl'))
+            self.assertTrue(jobs.run_next('worker'))
+            self.assertEqual(Job.objects.get().status, 'succeeded')
+            self.assertEqual(os.listdir(output_dir), [os.path.basename(args[6])])
+
+
+class CalculationHistoryTests(ProvinceTestMixin, TestCase):
+    """Calculations keep a snapshot of what they scored, written only when the possession set changed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = cls.make_staff('chef', 'supervisor', 51)
+        cls.citizens = []
+        for i in range(3):
+            citizen = cls.make_citizen(i, is_verified=True)
+            CitizenProfile.objects.create(user=citizen)
+            cls.citizens.append(citizen)
+        category = PossessionCategory.objects.create(name='Véhicules', description='')
+        cls.car = PossessionType.objects.create(category=category, name='Voiture', description='',
+                                                point_value=Decimal('0.5'))
+
+    def add_car(self, citizen):
+        return CitizenPossession.objects.create(
+            citizen=citizen, possession_type=self.car, description='', acquisition_date=date(2020, 1, 1),
+            estimated_value=1000, added_by=self.supervisor,
+        )
+
+    def test_calculator_records_changes_only(self):
+        citizen = self.citizens[0]
+        car = self.add_car(citizen)
+        self.client.force_login(citizen)
+        self.client.get(reverse('eligibility_calculator'))
+        self.client.get(reverse('eligibility_calculator'))
+        calculation = SocialIndicatorCalculation.objects.get()
+        self.assertEqual((calculation.total_score, calculation.calculated_by), (Decimal('0.5'), citizen))
+        self.assertEqual(list(calculation.items.values_list('possession', 'possession_name', 'point_value')),
+                         [(car.pk, 'Voiture', Decimal('0.5'))])
+        self.assertEqual(AuditLog.objects.filter(action_type='calculation_performed').count(), 1)
+
+        self.add_car(citizen)
+        self.client.get(reverse('eligibility_calculator'))
+        latest = SocialIndicatorCalculation.objects.latest('calculation_date', 'id')
+        self.assertEqual((latest.total_score, latest.items.count()), (Decimal('1'), 2))
+        # The earlier snapshot is untouched by later point value changes
+        self.car.point_value = Decimal('0.7')
+        self.car.save()
+        self.assertEqual(calculation.items.get().point_value, Decimal('0.5'))
+
+    def test_population_snapshot(self):
+        self.add_car(self.citizens[1])
+        with CaptureQueriesContext(connection) as queries:
+            written = sum(len(calculations) for _, calculations in
+                          calculations.snapshot_population(self.supervisor, chunk_size=2))
+        self.assertEqual(written, 3)
+        self.assertLess(len(queries.captured_queries), 20)
+        self.assertEqual(CalculationItem.objects.count(), 1)
+
+        # Unchanged sets are skipped; a point value change reaches holders only
+        self.assertEqual(sum(len(c) for _, c in calculations.snapshot_population(self.supervisor)), 0)
+        self.car.point_value = Decimal('0.7')
+        self.car.save()
+        changed = [c for _, chunk in calculations.snapshot_population(self.supervisor) for c in chunk]
+        self.assertEqual([(c.citizen_id, c.total_score) for c in changed], [(self.citizens[1].pk, Decimal('0.7'))])
+        forced = sum(len(c) for _, c in calculations.snapshot_population(self.supervisor, 'Nouveau seuil', force=True))
+        self.assertEqual(forced, 3)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Row locks; SQLite serializes writers instead')
+class CalculationHistoryLockTests(ProvinceTestMixin, TransactionTestCase):
+    """Concurrent calculations of one possession set write it once"""
+
+    def test_concurrent_calculations_write_once(self):
+        supervisor = self.make_staff('chef', 'supervisor', 51)
+        citizen = self.make_citizen(1)
+        latest_hashes = calculations.latest_hashes
+        others = []
+
+        def calculate_again():
+            try:
+                calculations.record_calculations([citizen.pk], supervisor)
+            finally:
+                connection.close()
+
+        def latest_during_second_calculation(citizen_ids, lock=False):
+            digests = latest_hashes(citizen_ids, lock)
+            if not others:
+                other = threading.Thread(target=calculate_again)
+                other.start()
+                others.append(other)
+                # The second check waits for this calculation to commit
+                other.join(0.5)
+                self.assertTrue(other.is_alive())
+            return digests
+
+        with mock.patch.object(calculations, 'latest_hashes', latest_during_second_calculation):
+            calculations.record_calculations([citizen.pk], supervisor)
+        others[0].join()
+        self.assertEqual(SocialIndicatorCalculation.objects.filter(citizen=citizen).count(), 1)
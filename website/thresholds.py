@@ -0,0 +1,78 @@
+import threading
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .cache_versions import bump_version, get_version
+from .models import SocialIndicatorThreshold
+
+VERSION_KEY = 'thresholds:version'
+SCHEDULE_KEY = 'thresholds:schedule:{version}'
+
+# Stand-in for a program with no threshold defined: nobody is excluded by score
+NO_THRESHOLD = Decimal('999999')
+
+# Process-local copy of the shared schedule, refetched every THRESHOLD_CACHE_LOCAL_TTL seconds.
+# The shared entry expires after THRESHOLD_CACHE_TTL, which bounds how long a process whose
+# cache does not see invalidate()'s version bump (the default per-process locmem cache) keeps
+# an old threshold: THRESHOLD_CACHE_TTL + THRESHOLD_CACHE_LOCAL_TTL seconds.
+_local = {'schedules': None, 'checked_at': 0.0}
+_lock = threading.Lock()
+
+
+def _local_ttl():
+    return getattr(settings, 'THRESHOLD_CACHE_LOCAL_TTL', 5)
+
+
+def _shared_ttl():
+    return getattr(settings, 'THRESHOLD_CACHE_TTL', 60)
+
+
+def _load_schedules():
+    """Return {program_type: [(effective_date, max_score), ...]} newest first"""
+    schedules = {code: [] for code, _ in SocialIndicatorThreshold.PROGRAM_TYPES}
+    rows = SocialIndicatorThreshold.objects.filter(is_active=True).order_by(
+        'program_type', '-effective_date'
+    ).values_list('program_type', 'effective_date', 'max_score')
+    for program_type, effective_date, max_score in rows:
+        schedules.setdefault(program_type, []).append((effective_date, max_score))
+    return schedules
+
+
+def _schedules():
+    now = time.monotonic()
+    # Read once: invalidate() may reset the entries between two reads outside the lock
+    schedules, checked_at = _local['schedules'], _local['checked_at']
+    if schedules is not None and now - checked_at < _local_ttl():
+        return schedules
+    with _lock:
+        key = SCHEDULE_KEY.format(version=get_version(VERSION_KEY))
+        schedules = cache.get(key)
+        if schedules is None:
+            schedules = _load_schedules()
+            cache.set(key, schedules, _shared_ttl())
+        _local['schedules'] = schedules
+        _local['checked_at'] = now
+        return schedules
+
+
+def current_threshold(program_type, on_date=None):
+    """Return the max_score in effect for a program on a date, or None if none applies.
+
+    The whole (small) schedule is cached rather than the resolved value, so a
+    threshold with a future effective_date takes over on its date without
+    waiting for an invalidation.
+    """
+    on_date = on_date or timezone.now().date()
+    for effective_date, max_score in _schedules().get(program_type, []):
+        if effective_date <= on_date:
+            return max_score
+    return None
+
+
+def invalidate():
+    """Drop cached schedules in this process and in every process sharing its cache backend"""
+    with _lock:
+        bump_version(VERSION_KEY)
+        _local['schedules'] = None
@@ -20,21 +20,29 @@ urlpatterns = [
     path('staff/citizens/', views.manage_citizens, name='manage_citizens'),
     path('staff/citizen/<int:citizen_id>/', views.citizen_detail, name='citizen_detail'),
     path('staff/possessions/add/<int:citizen_id>/', views.add_possession, name='add_possession'),
+    path('staff/possessions/import/', views.import_possessions, name='import_possessions'),
     path('staff/reclamation/assign/<uuid:reclamation_id>/', views.assign_reclamation, name='assign_reclamation'),
+    path('staff/reclamation/claim/', views.claim_reclamations, name='claim_reclamations'),
     path('staff/investigation/<uuid:reclamation_id>/', views.investigate_reclamation, name='investigate_reclamation'),
     path('staff/possessions/edit/<int:possession_id>/', views.edit_possession, name='edit_possession'),
     path('staff/possessions/delete/<int:possession_id>/', views.delete_possession, name='delete_possession'),
     path('staff/applications/review/', views.review_applications, name='review_applications'),
+    path('staff/applications/review/batch/', views.review_applications_batch, name='review_applications_batch'),
     path('staff/application/<uuid:application_id>/review/', views.review_application, name='review_application'),
+    path('staff/export/<str:dataset>/', views.export_data, name='export_data'),
     
     # Admin routes
     path('admin-panel/', views.admin_panel, name='admin_panel'),
     path('admin-panel/possession-types/', views.manage_possession_types, name='manage_possession_types'),
     path('admin-panel/audit-logs/', views.audit_logs, name='audit_logs'),
+    path('admin-panel/audit-metrics/', views.audit_metrics, name='audit_metrics'),
+    path('admin-panel/performance/', views.performance_metrics, name='performance_metrics'),
+    path('admin-panel/jobs/', views.job_queue, name='job_queue'),
     
     # AJAX API routes
     path('api/possession-types-by-category/<int:category_id>/', views.get_possession_types_by_category, name='get_possession_types_by_category'),
     path('api/possession-types/<int:category_id>/', views.get_possession_types, name='get_possession_types'),
     path('api/calculate-score/', views.calculate_score_ajax, name='calculate_score_ajax'),
+    path('api/possession-catalogue/', views.possession_catalogue, name='possession_catalogue'),
     path("__reload__/", include("django_browser_reload.urls")),
 ]
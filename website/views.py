@@ -1,14 +1,42 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
-from django.http import JsonResponse, Http404
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, Http404, StreamingHttpResponse
+from django.core.exceptions import PermissionDenied
 from django.db.models import Sum, Q
 from django.utils import timezone
+from django.utils.http import parse_etags
 from decimal import Decimal
+from pathlib import Path
 from .models import *
+from .indicators import acalculate_social_indicator, get_citizen_profile
+from .thresholds import current_threshold, NO_THRESHOLD
+from .dashboard import get_snapshot, invalidate_citizen
+from .pagination import ascending_page
+from .exports import parse_day
+from .directory import SEARCH_FIELDS, search_ids
+from .archive import audit_page
+from .audit import get_sink, log_action
+from .routers import reporting
+from .imports import IMPORT_FIELDS, PossessionImporter, detect_format, iter_rows
+from . import calculations, catalogue, counters, exports, jobs, reviews, workqueue
+from . import performance
 import random
 import string
+import uuid
+
+AUDIT_LOG_PAGE_SIZE = 50
+CITIZEN_PAGE_SIZE = 50
+APPLICATION_PAGE_SIZE = 50
+
+# Columns the staff list templates read; keeps wide user rows out of list queries
+RECLAMATION_ROW_FIELDS = ('id', 'created_at', 'citizen__username', 'possession__possession_type__name')
+APPLICATION_ROW_FIELDS = (
+    'id', 'program_type', 'social_indicator_at_submission', 'threshold_at_submission',
+    'submitted_at', 'citizen__username',
+)
 
 def is_citizen(user):
     return user.user_type == 'citizen'
@@ -34,7 +62,7 @@ def citizen_login(request):
             if user.is_verified:
                 # In a real app, send a verification code here
                 user.verification_code = '123456'  # Mock code for testing
-                user.save()
+                user.save(update_fields=['verification_code'])
                 request.session['login_user_id'] = user.id
                 return redirect('verify_code')
             else:
@@ -55,14 +83,13 @@ def verify_code(request):
                 user = User.objects.get(id=user_id, verification_code=code)
                 login(request, user)
                 user.verification_code = ''
-                user.save()
+                user.save(update_fields=['verification_code'])
                 
-                AuditLog.objects.create(
+                log_action(
+                    request,
                     user=user,
                     action_type='user_login',
                     description=f'Connexion via vérification SMS pour {user.username}',
-                    ip_address=get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
                     related_citizen=user if user.user_type == 'citizen' else None
                 )
                 
@@ -88,34 +115,8 @@ def logout_view(request):
 @login_required
 @user_passes_test(is_citizen)
 def citizen_dashboard(request):
-    citizen = request.user
-    profile, created = CitizenProfile.objects.get_or_create(user=citizen)
-    
-    # Calculate current social indicator
-    current_score = calculate_social_indicator(citizen)
-    profile.current_social_indicator = current_score
-    profile.last_calculated = timezone.now()
-    profile.save()
-    
-    # Get thresholds
-    amo_threshold = get_current_threshold('amo')
-    social_aid_threshold = get_current_threshold('social_aid')
-    
-    # Check eligibility
-    amo_eligible = current_score <= amo_threshold and not profile.has_other_insurance
-    social_aid_eligible = current_score <= social_aid_threshold
-    
-    context = {
-        'profile': profile,
-        'current_score': current_score,
-        'amo_threshold': amo_threshold,
-        'social_aid_threshold': social_aid_threshold,
-        'amo_eligible': amo_eligible,
-        'social_aid_eligible': social_aid_eligible,
-        'recent_possessions': CitizenPossession.objects.filter(citizen=citizen).order_by('-created_at')[:5],
-        'pending_reclamations': Reclamation.objects.filter(citizen=citizen, status='pending').count(),
-        'active_applications': Application.objects.filter(citizen=citizen, status__in=['submitted', 'under_review']).count(),
-    }
+    # Served from a cached snapshot, invalidated by signals when its inputs change
+    context = get_snapshot(request.user)
     
     return render(request, 'citizen/dashboard.html', context)
 
@@ -129,6 +130,7 @@ def eligibility_calculator(request):
     ).select_related('possession_type', 'possession_type__category')
     
     calculation_items = []
+    snapshot = []
     total_score = Decimal('0')
     
     for possession in possessions:
@@ -137,8 +139,29 @@ def eligibility_calculator(request):
             'points': possession.possession_type.point_value,
             'category': possession.possession_type.category.name
         })
+        snapshot.append((possession.pk, possession.possession_type.name, possession.possession_type.point_value))
         total_score += possession.possession_type.point_value
     
+    # Kept in the history only when the possession set changed since the last calculation
+    calculation = calculations.record_calculation(citizen, citizen, items=snapshot)
+    if calculation:
+        log_action(
+            request,
+            user=citizen,
+            action_type='calculation_performed',
+            description=f'Indicateur social calculé: {total_score}',
+            related_citizen=citizen,
+            metadata={'calculation_id': calculation.pk, 'items': len(snapshot)}
+        )
+    
+    # An explicit recalculation also resyncs the stored indicator
+    get_citizen_profile(citizen)
+    CitizenProfile.objects.filter(user=citizen).update(
+        current_social_indicator=total_score,
+        last_calculated=timezone.now()
+    )
+    invalidate_citizen(citizen.pk)
+    
     # Get thresholds
     amo_threshold = get_current_threshold('amo')
     social_aid_threshold = get_current_threshold('social_aid')
@@ -175,12 +198,11 @@ def create_reclamation(request, possession_id):
         possession.save()
         
         # Log the action
-        AuditLog.objects.create(
+        log_action(
+            request,
             user=request.user,
             action_type='reclamation_created',
             description=f'Création d\'une réclamation pour {possession.possession_type.name}',
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
             metadata={'reclamation_id': str(reclamation.id)}
         )
         
@@ -192,7 +214,9 @@ def create_reclamation(request, possession_id):
 @login_required
 @user_passes_test(is_citizen)
 def my_reclamations(request):
-    reclamations = Reclamation.objects.filter(citizen=request.user).order_by('-created_at')
+    reclamations = Reclamation.objects.filter(citizen=request.user).select_related(
+        'possession__possession_type'
+    ).order_by('-created_at')
     return render(request, 'citizen/my_reclamations.html', {'reclamations': reclamations})
 
 @login_required
@@ -247,158 +271,194 @@ def create_application(request, program_type):
             messages.error(request, f'Votre dernière demande {program_type.upper()} a été rejetée. Veuillez recalculer votre indicateur social avant de soumettre une nouvelle demande.')
             return redirect('eligibility_calculator')
     
+    # Get the threshold currently in effect
+    threshold = current_threshold(program_type)
+    if threshold is None:
+        messages.error(request, f'Aucun seuil actif défini pour le programme {program_type.upper()}.')
+        return redirect('citizen_dashboard')
+    
     if request.method == 'POST':
         action = request.POST.get('action')
-        try:
-            # Get the latest active threshold
-            threshold = SocialIndicatorThreshold.objects.filter(
-                program_type=program_type,
-                is_active=True
-            ).order_by('-effective_date').first()
-            
-            if not threshold:
-                messages.error(request, f'Aucun seuil actif défini pour le programme {program_type.upper()}.')
-                return redirect('citizen_dashboard')
-            
-            # Check if social indicator exists
-            if profile.current_social_indicator is None:
-                messages.error(request, 'Vous devez avoir un indicateur social calculé pour soumettre une demande.')
-                return redirect('eligibility_calculator')
-            
-            if action == 'save_draft':
-                application = Application(
-                    citizen=citizen,
-                    program_type=program_type,
-                    status='draft',
-                    social_indicator_at_submission=profile.current_social_indicator,
-                    threshold_at_submission=threshold.max_score
-                )
-                application.save()
-                messages.success(request, f'Brouillon de demande {program_type.upper()} enregistré.')
-                return redirect('my_applications')
-            
+        
+        # Check if social indicator exists
+        if profile.current_social_indicator is None:
+            messages.error(request, 'Vous devez avoir un indicateur social calculé pour soumettre une demande.')
+            return redirect('eligibility_calculator')
+        
+        if action == 'save_draft':
             application = Application(
                 citizen=citizen,
                 program_type=program_type,
-                status='submitted',
+                status='draft',
                 social_indicator_at_submission=profile.current_social_indicator,
-                threshold_at_submission=threshold.max_score,
-                submitted_at=timezone.now()
+                threshold_at_submission=threshold
             )
             application.save()
-            
-            AuditLog.objects.create(
-                user=citizen,
-                action_type='application_submitted',
-                description=f'Demande {program_type.upper()} soumise par {citizen.username}',
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                related_citizen=citizen,
-                metadata={'application_id': str(application.id)}
-            )
-            
-            messages.success(request, f'Demande {program_type.upper()} soumise avec succès.')
+            messages.success(request, f'Brouillon de demande {program_type.upper()} enregistré.')
             return redirect('my_applications')
         
-        except SocialIndicatorThreshold.DoesNotExist:
-            messages.error(request, f'Aucun seuil actif défini pour le programme {program_type.upper()}.')
-            return redirect('citizen_dashboard')
-    
-    try:
-        threshold = SocialIndicatorThreshold.objects.filter(
+        application = Application(
+            citizen=citizen,
             program_type=program_type,
-            is_active=True
-        ).order_by('-effective_date').first()
-        threshold_value = threshold.max_score if threshold else None
-    except SocialIndicatorThreshold.DoesNotExist:
-        threshold_value = None
+            status='submitted',
+            social_indicator_at_submission=profile.current_social_indicator,
+            threshold_at_submission=threshold,
+            submitted_at=timezone.now()
+        )
+        application.save()
+        
+        log_action(
+            request,
+            user=citizen,
+            action_type='application_submitted',
+            description=f'Demande {program_type.upper()} soumise par {citizen.username}',
+            related_citizen=citizen,
+            metadata={'application_id': str(application.id)}
+        )
+        
+        messages.success(request, f'Demande {program_type.upper()} soumise avec succès.')
+        return redirect('my_applications')
     
     return render(request, 'citizen/create_application.html', {
         'program_type': program_type,
         'social_indicator': profile.current_social_indicator,
-        'threshold': threshold_value
+        'threshold': threshold
     })
 
 @login_required
 @user_passes_test(is_staff_member)
+@reporting
 def staff_dashboard(request):
     user = request.user
     if user.user_type == 'data_entry_staff':
         return render(request, 'staff/data_entry_dashboard.html', {
-            'recent_additions': CitizenPossession.objects.filter(added_by=user).order_by('-created_at')[:10],
-            'citizens_count': User.objects.filter(user_type='citizen').count(),
+            'recent_additions': CitizenPossession.objects.filter(added_by=user).select_related(
+                'possession_type', 'citizen'
+            ).only(
+                'id', 'acquisition_date', 'estimated_value', 'created_at',
+                'possession_type__name', 'citizen__username',
+            ).order_by('-created_at')[:10],
+            'citizens_count': counters.read('users:citizen')['users:citizen'],
         })
     elif user.user_type == 'investigator':
+        completed_key = counters.resolved_key(user.pk, timezone.localdate())
         pending_investigations = Reclamation.objects.filter(
             assigned_investigator=user,
             status='under_investigation'
+        ).select_related('citizen', 'possession__possession_type').only(
+            *RECLAMATION_ROW_FIELDS, 'lease_expires_at'
         ).order_by('created_at')
-        pending_reclamations = Reclamation.objects.filter(
-            status='pending',
-            assigned_investigator__isnull=True
-        ).order_by('created_at')
+        # Only the head of the queue is listed; the rest is reached with "claim next"
+        pending_reclamations = workqueue.queue().select_related('citizen', 'possession__possession_type').only(
+            *RECLAMATION_ROW_FIELDS
+        )[:workqueue.QUEUE_PREVIEW]
+        counts = counters.read(completed_key, 'reclamations:status:pending')
         return render(request, 'staff/investigator_dashboard.html', {
             'pending_investigations': pending_investigations,
             'pending_reclamations': pending_reclamations,
-            'completed_today': Reclamation.objects.filter(
-                assigned_investigator=user,
-                resolution_date__date=timezone.now().date()
-            ).count(),
+            'pending_count': counts['reclamations:status:pending'],
+            'claim_sizes': [1, 5, 10, workqueue.MAX_CLAIM],
+            'completed_today': counts[completed_key],
         })
     elif user.user_type == 'supervisor':
+        approved_key = counters.approved_key(user.pk, timezone.localdate())
         pending_applications = Application.objects.filter(
             status='submitted'
-        ).order_by('submitted_at')
+        ).select_related('citizen').only(*APPLICATION_ROW_FIELDS).order_by('submitted_at')[:APPLICATION_PAGE_SIZE]
+        counts = counters.read(approved_key, 'applications:status:submitted')
         return render(request, 'staff/supervisor_dashboard.html', {
             'pending_applications': pending_applications,
-            'approved_today': Application.objects.filter(
-                reviewed_by=user,
-                status='approved',
-                reviewed_at__date=timezone.now().date()
-            ).count(),
+            'pending_count': counts['applications:status:submitted'],
+            'approved_today': counts[approved_key],
         })
     elif user.user_type == 'admin':
+        counts = counters.read('users', 'applications', 'reclamations:status:pending')
         return render(request, 'staff/admin_dashboard.html', {
-            'total_users': User.objects.count(),
-            'total_applications': Application.objects.count(),
-            'pending_reclamations': Reclamation.objects.filter(status='pending').count(),
-            'recent_activities': AuditLog.objects.order_by('-timestamp')[:20],
+            'total_users': counts['users'],
+            'total_applications': counts['applications'],
+            'pending_reclamations': counts['reclamations:status:pending'],
+            'recent_activities': AuditLog.objects.select_related('user').only(
+                'id', 'description', 'timestamp', 'user__username'
+            ).order_by('-timestamp', '-id')[:20],
         })
 
 @login_required
 @user_passes_test(is_investigator)
 def assign_reclamation(request, reclamation_id):
-    reclamation = get_object_or_404(Reclamation, id=reclamation_id, status='pending', assigned_investigator__isnull=True)
     if request.method == 'POST':
-        reclamation.assigned_investigator = request.user
-        reclamation.status = 'under_investigation'
-        reclamation.save()
-        AuditLog.objects.create(
-            user=request.user,
-            action_type='reclamation_assigned',
-            description=f'Réclamation {reclamation_id} assignée à {request.user.username}',
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            related_citizen=reclamation.citizen,
-            metadata={'reclamation_id': str(reclamation_id)}
-        )
-        messages.success(request, 'Réclamation assignée avec succès')
-        return redirect('staff_dashboard')
+        # Two investigators can pick the same line of the list; only one claim succeeds
+        if workqueue.claim_one(request.user, reclamation_id, request):
+            messages.success(request, 'Réclamation assignée avec succès')
+        else:
+            messages.error(request, 'Cette réclamation a déjà été prise en charge')
+    return redirect('staff_dashboard')
+
+@login_required
+@user_passes_test(is_investigator)
+def claim_reclamations(request):
+    if request.method == 'POST':
+        try:
+            count = int(request.POST.get('count', 1))
+        except ValueError:
+            count = 1
+        claimed = workqueue.claim(request.user, count, request)
+        if claimed:
+            messages.success(request, f'{len(claimed)} réclamation(s) assignée(s)')
+        else:
+            messages.info(request, 'Aucune réclamation en attente')
     return redirect('staff_dashboard')
 
 @login_required
 @user_passes_test(is_staff_member)
+@reporting
 def manage_citizens(request):
-    citizens = User.objects.filter(user_type='citizen').order_by('last_name')
-    return render(request, 'staff/manage_citizens.html', {'citizens': citizens})
+    query = request.GET.get('q', '').strip()
+    field = request.GET.get('field', 'all')
+    if field not in SEARCH_FIELDS:
+        field = 'all'
+    citizens = User.objects.filter(user_type='citizen').only(
+        'id', 'first_name', 'last_name', 'national_id', 'phone_number'
+    )
+    
+    if query:
+        # Search results come in registration (id) order; see directory.search_ids
+        cursor = request.GET.get('cursor', '')
+        after = int(cursor) if cursor.isdigit() else 0
+        ids = search_ids(query, field, after, CITIZEN_PAGE_SIZE + 1)
+        page = list(citizens.filter(id__in=ids[:CITIZEN_PAGE_SIZE]).order_by('id'))
+        next_cursor = str(ids[CITIZEN_PAGE_SIZE - 1]) if len(ids) > CITIZEN_PAGE_SIZE else None
+    else:
+        page, next_cursor = ascending_page(citizens, request.GET.get('cursor'), CITIZEN_PAGE_SIZE, 'last_name')
+    
+    next_query = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_query = params.urlencode()
+    first_query = request.GET.copy()
+    first_query.pop('cursor', None)
+    
+    return render(request, 'staff/manage_citizens.html', {
+        'citizens': page,
+        'query': query,
+        'field': field,
+        'next_query': next_query,
+        'first_query': first_query.urlencode(),
+        'is_first_page': not request.GET.get('cursor'),
+    })
 
 @login_required
 @user_passes_test(is_staff_member)
+@reporting
 def citizen_detail(request, citizen_id):
     citizen = get_object_or_404(User, id=citizen_id, user_type='citizen')
     profile = get_object_or_404(CitizenProfile, user=citizen)
-    possessions = CitizenPossession.objects.filter(citizen=citizen).order_by('-created_at')
-    reclamations = Reclamation.objects.filter(citizen=citizen).order_by('-created_at')
+    possessions = CitizenPossession.objects.filter(citizen=citizen).select_related(
+        'possession_type'
+    ).order_by('-created_at')
+    reclamations = Reclamation.objects.filter(citizen=citizen).select_related(
+        'possession__possession_type'
+    ).order_by('-created_at')
     applications = Application.objects.filter(citizen=citizen).order_by('-created_at')
     
     context = {
@@ -432,12 +492,11 @@ def add_possession(request, citizen_id):
             added_by=request.user
         )
         
-        AuditLog.objects.create(
+        log_action(
+            request,
             user=request.user,
             action_type='possession_added',
             description=f'Ajout de {possession_type.name} à {citizen.username}',
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
             related_citizen=citizen,
             metadata={'possession_id': possession.id}
         )
@@ -448,6 +507,26 @@ def add_possession(request, citizen_id):
     categories = PossessionCategory.objects.filter(is_active=True)
     return render(request, 'staff/add_possession.html', {'citizen': citizen, 'categories': categories})
 
+@login_required
+@user_passes_test(lambda u: u.user_type == 'data_entry_staff' or u.user_type == 'admin')
+def import_possessions(request):
+    context = {'fields': IMPORT_FIELDS}
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Veuillez choisir un fichier CSV ou JSON-lines.')
+            return redirect('import_possessions')
+        # The upload is read in chunks; nothing holds the whole file in memory
+        importer = PossessionImporter(request.user, request=request, source=upload.name)
+        importer.run(iter_rows(upload.file, detect_format(upload.name)))
+        context['importer'] = importer
+        context['rejects'] = importer.rejects[:200]
+        if importer.imported:
+            messages.success(request, f'{importer.imported} possessions importées')
+        if importer.rejected:
+            messages.warning(request, f'{importer.rejected} lignes rejetées')
+    return render(request, 'staff/import_possessions.html', context)
+
 
 @login_required
 @user_passes_test(is_investigator)
@@ -477,12 +556,11 @@ def investigate_reclamation(request, reclamation_id):
         
         reclamation.save()
         
-        AuditLog.objects.create(
+        log_action(
+            request,
             user=request.user,
             action_type='reclamation_investigated',
             description=f'Investigation de la réclamation {reclamation_id} - {action}',
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
             related_citizen=reclamation.citizen,
             metadata={'reclamation_id': str(reclamation_id)}
         )
@@ -490,13 +568,51 @@ def investigate_reclamation(request, reclamation_id):
         messages.success(request, 'Investigation terminée')
         return redirect('staff_dashboard')
     
+    # Opening the investigation shows it is being worked on
+    workqueue.renew(reclamation)
     return render(request, 'staff/investigate_reclamation.html', {'reclamation': reclamation})
 
 @login_required
 @user_passes_test(is_supervisor)
 def review_applications(request):
-    applications = Application.objects.filter(status='submitted').order_by('submitted_at')
-    return render(request, 'staff/review_applications.html', {'applications': applications})
+    applications = Application.objects.filter(status='submitted').select_related('citizen').only(
+        *APPLICATION_ROW_FIELDS, 'triaged_at', 'triage_flags'
+    )
+    page, next_cursor = ascending_page(
+        applications, request.GET.get('cursor'), APPLICATION_PAGE_SIZE, 'submitted_at', pk_type=uuid.UUID
+    )
+    return render(request, 'staff/review_applications.html', {
+        'applications': page,
+        'next_cursor': next_cursor,
+        'submitted_count': counters.read('applications:status:submitted')['applications:status:submitted'],
+        'rules': {name: label for name, (label, _) in reviews.RULES.items()},
+        'program_types': Application.PROGRAM_TYPES,
+    })
+
+@login_required
+@user_passes_test(is_supervisor)
+def review_applications_batch(request):
+    if request.method != 'POST':
+        return redirect('review_applications')
+    action = request.POST.get('action')
+    rule = request.POST.get('rule') or None
+    ids = request.POST.getlist('application')
+    if action not in reviews.ACTIONS or (rule and rule not in reviews.RULES) or not (ids or rule):
+        messages.error(request, 'Sélectionnez des demandes ou une règle, puis une action')
+        return redirect('review_applications')
+    try:
+        applications = reviews.selection(
+            ids=[uuid.UUID(pk) for pk in ids] if ids else None, rule=rule,
+            program_type=request.POST.get('program_type') or None,
+        )
+    except ValueError:
+        raise Http404('Demande introuvable')
+    # One transaction: the batch is reviewed entirely or not at all
+    review = reviews.BatchReview(request.user, action, request.POST.get('notes', ''), request, atomic=True).run(
+        applications
+    )
+    messages.success(request, f'{review.reviewed} demande(s) examinée(s) en {review.elapsed:.1f}s')
+    return redirect('review_applications')
 
 @login_required
 @user_passes_test(is_supervisor)
@@ -513,12 +629,11 @@ def review_application(request, application_id):
         application.reviewed_at = timezone.now()
         application.save()
         
-        AuditLog.objects.create(
+        log_action(
+            request,
             user=request.user,
             action_type='application_reviewed',
             description=f'Examen de la demande {application_id} - {action}',
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
             related_citizen=application.citizen,
             metadata={'application_id': str(application_id)}
         )
@@ -538,7 +653,7 @@ def admin_panel(request):
 @user_passes_test(is_admin)
 def manage_possession_types(request):
     categories = PossessionCategory.objects.all()
-    types = PossessionType.objects.all()
+    types = PossessionType.objects.all()  # The template groups them by category_id
     
     if request.method == 'POST':
         if 'create_category' in request.POST:
@@ -565,71 +680,267 @@ def manage_possession_types(request):
 
 @login_required
 @user_passes_test(is_admin)
+@reporting
 def audit_logs(request):
-    logs = AuditLog.objects.order_by('-timestamp')
-    return render(request, 'admin/audit_logs.html', {'logs': logs})
+    logs = AuditLog.objects.select_related('user').only(
+        'id', 'action_type', 'description', 'timestamp', 'user__username'
+    )
+    filters = {
+        'action_type': request.GET.get('action_type', ''),
+        'user': request.GET.get('user', '').strip(),
+        'related_citizen': request.GET.get('related_citizen', '').strip(),
+        'date_from': request.GET.get('date_from', ''),
+        'date_to': request.GET.get('date_to', ''),
+    }
+    
+    # Same criteria, in the form the archive reader understands
+    archive_filters = {}
+    no_match = False
+    
+    if filters['action_type'] in dict(AuditLog.ACTION_TYPES):
+        logs = logs.filter(action_type=filters['action_type'])
+        archive_filters['action_type'] = filters['action_type']
+    # Resolve people to ids first so the filter hits the (user, timestamp, id) indexes
+    if filters['user']:
+        user_id = User.objects.filter(username=filters['user']).values_list('id', flat=True).first()
+        logs = logs.filter(user_id=user_id)
+        archive_filters['user_id'] = user_id
+        no_match = no_match or not user_id
+    if filters['related_citizen']:
+        citizen_id = User.objects.filter(national_id=filters['related_citizen']).values_list('id', flat=True).first()
+        logs = logs.filter(related_citizen_id=citizen_id)
+        archive_filters['related_citizen_id'] = citizen_id
+        no_match = no_match or not citizen_id
+    start, end = exports.period(parse_day(filters['date_from']), parse_day(filters['date_to']))
+    if start:
+        archive_filters['start'] = start
+        logs = logs.filter(timestamp__gte=start)
+    if end:
+        archive_filters['end'] = end
+        logs = logs.filter(timestamp__lt=end)
+    
+    # Hot rows and archived months, merged in (timestamp, id) order
+    if no_match:
+        page, next_cursor = [], None
+    else:
+        page, next_cursor = audit_page(logs, archive_filters, request.GET.get('cursor'), AUDIT_LOG_PAGE_SIZE)
+    
+    next_query = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_query = params.urlencode()
+    
+    return render(request, 'admin/audit_logs.html', {
+        'logs': page,
+        'filters': filters,
+        'action_types': AuditLog.ACTION_TYPES,
+        'next_query': next_query,
+        'is_first_page': not request.GET.get('cursor'),
+    })
+
+@login_required
+@user_passes_test(is_staff_member)
+def export_data(request, dataset):
+    export = exports.DATASETS.get(dataset)
+    if export is None:
+        raise Http404
+    if request.user.user_type not in export.roles:
+        raise PermissionDenied
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        fmt = 'csv'
+    date_from = parse_day(request.GET.get('date_from', ''))
+    date_to = parse_day(request.GET.get('date_to', ''))
+    filters = {name: request.GET.get(name, '') for name in export.filters}
+    
+    log_action(
+        request,
+        user=request.user,
+        action_type='data_exported',
+        description=f'Export {dataset} ({fmt})',
+        metadata={'dataset': dataset, 'format': fmt, 'date_from': request.GET.get('date_from', ''),
+                  'date_to': request.GET.get('date_to', ''), 'filters': filters}
+    )
+    start, end = exports.period(date_from, date_to)
+    rows = export.rows(start=start, end=end, **filters)
+    # Rows are fetched in chunks while the response is being sent
+    response = StreamingHttpResponse(exports.stream(export, fmt, rows), content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(dataset, fmt)}"'
+    return response
+
+@login_required
+@user_passes_test(is_admin)
+def audit_metrics(request):
+    return JsonResponse(get_sink().metrics())
+
+# What the jobs page may queue: per command, the POST fields it accepts, each mapped to an
+# option and a kind ('flag', 'int', 'date' or a list of allowed values); a None option is
+# positional. No field names a server path: the acting admin fills the account options and
+# files are only written under JOB_OUTPUT_DIR, with names chosen here.
+PROGRAMS = [code for code, _ in SocialIndicatorThreshold.PROGRAM_TYPES]
+WEB_JOB_OPTIONS = {
+    'adjudicate_applications': {'dry_run': ('--dry-run', 'flag'), 'chunk_size': ('--chunk-size', 'int')},
+    'archive_audit_logs': {'months': ('--months', 'int'), 'dry_run': ('--dry-run', 'flag')},
+    'batch_review_applications': {
+        'action': (None, sorted(reviews.ACTIONS)), 'rule': ('--rule', sorted(reviews.RULES)),
+        'program': ('--program', PROGRAMS), 'atomic': ('--atomic', 'flag'), 'dry_run': ('--dry-run', 'flag'),
+    },
+    'export_data': {
+        'dataset': (None, sorted(exports.DATASETS)), 'format': ('--format', sorted(exports.FORMATS)),
+        'date_from': ('--date-from', 'date'), 'date_to': ('--date-to', 'date'),
+    },
+    'rebuild_citizen_index': {},
+    'rebuild_stat_counters': {},
+    'reconcile_indicators': {'fix': ('--fix', 'flag')},
+    'release_expired_claims': {'batch_size': ('--batch-size', 'int')},
+    'rescore_eligibility': {'program': ('--program', PROGRAMS), 'dry_run': ('--dry-run', 'flag')},
+    'snapshot_indicators': {'force': ('--force', 'flag')},
+}
+WEB_JOB_ACCOUNT_OPTION = {
+    'adjudicate_applications': '--reviewer', 'batch_review_applications': '--reviewer',
+    'snapshot_indicators': '--calculated-by',
+}
+WEB_JOB_REQUIRED = {'batch_review_applications': ['action', 'rule'], 'export_data': ['dataset']}
+
+def web_job_output(command, options):
+    """Server-chosen --output file for commands that write one, or None"""
+    if command == 'export_data':
+        extension = options.get('format') or 'csv'
+    elif command == 'rescore_eligibility':
+        extension = 'csv'
+    else:
+        return None
+    output_dir = Path(settings.JOB_OUTPUT_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return str(output_dir / f'{command}-{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.{extension}')
+
+def web_job_arguments(command, data, user):
+    """Argument list for ``command`` from the jobs form, validated against WEB_JOB_OPTIONS"""
+    if command not in WEB_JOB_OPTIONS:
+        raise ValueError(f"La commande {command} ne peut pas être lancée depuis cette page")
+    schema = WEB_JOB_OPTIONS[command]
+    unknown = set(data) - set(schema) - {'command', 'csrfmiddlewaretoken'}
+    if unknown:
+        raise ValueError(f"Champs non autorisés: {', '.join(sorted(unknown))}")
+    options = {field: data.get(field, '').strip() for field in schema}
+    for field in WEB_JOB_REQUIRED.get(command, []):
+        if not options[field]:
+            raise ValueError(f"Le champ {field} est requis")
+    positional, args = [], []
+    for field, (option, kind) in schema.items():
+        value = options[field]
+        if not value:
+            continue
+        if kind == 'flag':
+            args.append(option)
+            continue
+        if isinstance(kind, list):
+            if value not in kind:
+                raise ValueError(f"Valeur invalide pour {field}")
+        elif kind == 'int':
+            if not value.isdigit() or int(value) == 0:
+                raise ValueError(f"{field} doit être un entier positif")
+        elif kind == 'date' and parse_day(value) is None:
+            raise ValueError(f"{field} doit être une date AAAA-MM-JJ")
+        if option is None:
+            positional.append(value)
+        else:
+            args += [option, value]
+    if command in WEB_JOB_ACCOUNT_OPTION:
+        args += [WEB_JOB_ACCOUNT_OPTION[command], user.username]
+    output = web_job_output(command, options)
+    if output:
+        args += ['--output', output]
+    return positional + args
+
+@login_required
+@user_passes_test(is_admin)
+def job_queue(request):
+    if request.method == 'POST':
+        command = request.POST.get('command', '')
+        try:
+            job = jobs.enqueue_command(command, web_job_arguments(command, request.POST, request.user), request.user)
+        except ValueError as exc:
+            messages.error(request, f'Tâche refusée: {exc}')
+        else:
+            log_action(
+                request,
+                user=request.user,
+                action_type='job_enqueued',
+                description=f'Tâche {job.pk} mise en file: {job.payload["command"]}',
+                metadata={'job_id': job.pk, **job.payload}
+            )
+            messages.success(request, f'Tâche {job.pk} mise en file')
+        return redirect('job_queue')
+    return render(request, 'admin/jobs.html', {
+        'stats': jobs.stats(),
+        'recent_jobs': Job.objects.select_related('created_by').defer('result', 'payload').order_by('-id')[:50],
+        # (command, [(field, kind, choices)]) for one form per command
+        'commands': [
+            (command, [(field, 'choice', kind) if isinstance(kind, list) else (field, kind, [])
+                       for field, (_, kind) in schema.items()])
+            for command, schema in WEB_JOB_OPTIONS.items()
+        ],
+    })
+
+@login_required
+@user_passes_test(is_admin)
+def performance_metrics(request):
+    data = {
+        'views': performance.buffer.summary(),
+        'slow_queries': performance.buffer.slow_queries(),
+        'audit_sink': get_sink().metrics(),
+    }
+    if request.GET.get('recent'):
+        data['recent'] = performance.buffer.records()[-100:]
+    return JsonResponse(data)
 
 # AJAX API Views
+# Async so that under ASGI the form dropdowns and the calculator do not each hold a worker thread;
+# the auth decorators await request.auser() for async views.
 @login_required
 @user_passes_test(is_staff_member)
-def get_possession_types_by_category(request, category_id):
+async def get_possession_types_by_category(request, category_id):
     types = PossessionType.objects.filter(category_id=category_id, is_active=True).values('id', 'name', 'point_value')
-    return JsonResponse(list(types), safe=False)
+    return JsonResponse([possession_type async for possession_type in types], safe=False)
 
 @login_required
-def get_possession_types(request, category_id):
+async def get_possession_types(request, category_id):
     types = PossessionType.objects.filter(category_id=category_id).values('id', 'name', 'point_value')
-    return JsonResponse(list(types), safe=False)
+    return JsonResponse([possession_type async for possession_type in types], safe=False)
+
+@login_required
+async def possession_catalogue(request):
+    """Active categories and their types, served from a pre-serialized body with a strong ETag"""
+    etag, body = await catalogue.acurrent()
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'private, max-age={catalogue.max_age()}'
+    return response
 
 @login_required
 @user_passes_test(is_citizen)
-def calculate_score_ajax(request):
+async def calculate_score_ajax(request):
     if request.method == 'POST':
-        score = calculate_social_indicator(request.user)
+        score = await acalculate_social_indicator(await request.auser())
         return JsonResponse({'score': float(score)})
     return JsonResponse({'error': 'Requête invalide'}, status=400)
 
 # Utility Functions
-def calculate_social_indicator(citizen):
-    """Calculate the current social indicator for a citizen"""
-    possessions = CitizenPossession.objects.filter(
-        citizen=citizen,
-        status='active'
-    ).select_related('possession_type')
-    
-    total_score = possessions.aggregate(
-        total=Sum('possession_type__point_value')
-    )['total'] or Decimal('0')
-    
-    return total_score
-
 def get_current_threshold(program_type):
     """Get the current threshold for AMO or Social Aid"""
-    try:
-        threshold = SocialIndicatorThreshold.objects.filter(
-            program_type=program_type,
-            is_active=True,
-            effective_date__lte=timezone.now().date()
-        ).order_by('-effective_date').first()
-        
-        return threshold.max_score if threshold else Decimal('999999')
-    except:
-        return Decimal('999999')
-
-def get_client_ip(request):
-    """Get client IP address from request"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+    threshold = current_threshold(program_type)
+    return threshold if threshold is not None else NO_THRESHOLD
 
 # Add to views.py
 @login_required
 @user_passes_test(lambda u: u.user_type == 'data_entry_staff' or u.user_type == 'admin')
 def edit_possession(request, possession_id):
-    possession = get_object_or_404(CitizenPossession, id=possession_id)
+    possession = get_object_or_404(CitizenPossession.objects.select_related('citizen'), id=possession_id)
     if request.method == 'POST':
         possession_type_id = request.POST.get('possession_type')
         description = request.POST.get('description')
@@ -643,12 +954,11 @@ def edit_possession(request, possession_id):
         possession.estimated_value = Decimal(estimated_value) if estimated_value else None
         possession.save()
         
-        AuditLog.objects.create(
+        log_action(
+            request,
             user=request.user,
             action_type='possession_edited',
             description=f'Modification de la possession {possession_type.name} pour {possession.citizen.username}',
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
             related_citizen=possession.citizen,
             metadata={'possession_id': possession.id}
         )
@@ -656,7 +966,7 @@ def edit_possession(request, possession_id):
         messages.success(request, 'Possession modifiée avec succès')
         return redirect('citizen_detail', citizen_id=possession.citizen.id)
     
-    categories = PossessionCategory.objects.filter(is_active=True)
+    categories = PossessionCategory.objects.filter(is_active=True).prefetch_related('possessiontype_set')
     return render(request, 'staff/edit_possession.html', {
         'possession': possession,
         'categories': categories,
@@ -671,12 +981,11 @@ def delete_possession(request, possession_id):
         possession_type_name = possession.possession_type.name
         possession.delete()
         
-        AuditLog.objects.create(
+        log_action(
+            request,
             user=request.user,
             action_type='possession_deleted',
             description=f'Suppression de la possession {possession_type_name} pour {possession.citizen.username}',
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
             related_citizen=possession.citizen,
             metadata={'possession_id': possession_id}
         )
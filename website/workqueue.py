@@ -0,0 +1,145 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+from . import counters
+from .audit import build_entry, log_actions
+from .dashboard import invalidate_citizens
+from .models import Reclamation, User
+
+# Reclamation work queue. Unassigned pending reclamations are handed out oldest
+# first; a claim sets the investigator and a lease, which opening the
+# investigation renews. Leases left to expire are put back by release_expired().
+# Claims are UPDATEs, which skip the model signals, so the counter, dashboard
+# and audit work the signals would do is done here.
+
+PENDING = 'pending'
+CLAIMED = 'under_investigation'
+MAX_CLAIM = 20
+QUEUE_PREVIEW = 20  # Oldest unclaimed reclamations listed on the investigator dashboard
+
+
+def lease():
+    return timedelta(hours=getattr(settings, 'RECLAMATION_LEASE_HOURS', 48))
+
+
+def queue():
+    """Unclaimed reclamations in the order they are handed out"""
+    return Reclamation.objects.filter(status=PENDING, assigned_investigator__isnull=True).order_by('created_at', 'id')
+
+
+def skip_locked(model=Reclamation):
+    return connections[router.db_for_write(model)].features.has_select_for_update_skip_locked
+
+
+def take(candidates, limit, changes, *fields):
+    """Apply ``changes`` to up to ``limit`` rows of ``candidates``, never to a row another worker took.
+
+    Returns ``(id, *fields)`` of the rows taken, read before the update.
+    Must run inside a transaction. Works for any model's queue (see website.jobs).
+    """
+    if skip_locked(candidates.model):
+        # Rows locked by a concurrent claim are passed over instead of waited on
+        rows = list(candidates.select_for_update(skip_locked=True).values_list('id', *fields)[:limit])
+        candidates.model.objects.filter(id__in=[row[0] for row in rows]).update(**changes)
+        return rows
+    # Compare-and-set: each UPDATE repeats the candidate filter, so a row taken
+    # since it was read matches nothing and is skipped
+    taken = []
+    while len(taken) < limit:
+        rows = list(candidates.values_list('id', *fields)[:limit - len(taken)])
+        if not rows:
+            break
+        taken.extend(row for row in rows if candidates.filter(id=row[0]).update(**changes))
+    return taken
+
+
+def move(rows, old_status, new_status):
+    """Counter and dashboard bookkeeping for ``(id, citizen_id, ...)`` rows changing status"""
+    if not rows:
+        return
+    old = counters.keys_for('Reclamation', {'status': old_status, 'assigned_investigator_id': None, 'resolution_date': None})
+    new = counters.keys_for('Reclamation', {'status': new_status, 'assigned_investigator_id': None, 'resolution_date': None})
+    counters.apply_change(old * len(rows), new * len(rows))
+    citizen_ids = {row[1] for row in rows}
+    invalidate_citizens(citizen_ids)
+    transaction.on_commit(lambda: invalidate_citizens(citizen_ids))
+
+
+def claim_changes(investigator, now):
+    return {
+        'status': CLAIMED, 'assigned_investigator': investigator,
+        'claimed_at': now, 'lease_expires_at': now + lease(), 'updated_at': now,
+    }
+
+
+def record_claims(rows, investigator, request):
+    if not rows:
+        return
+    move(rows, PENDING, CLAIMED)
+    log_actions([build_entry(
+        request, investigator, 'reclamation_assigned',
+        f'Réclamation {reclamation_id} assignée à {investigator.username}',
+        related_citizen=User(pk=citizen_id),
+        metadata={'reclamation_id': str(reclamation_id)},
+    ) for reclamation_id, citizen_id in rows])
+
+
+def claim(investigator, count=1, request=None, candidates=None):
+    """Assign the ``count`` oldest unclaimed reclamations to ``investigator``; returns their ids.
+
+    ``candidates`` narrows the queue. Fewer ids come back when the queue runs
+    dry; concurrent callers never receive the same reclamation.
+    """
+    count = max(0, min(count, MAX_CLAIM))
+    if not count:
+        return []
+    candidates = queue() if candidates is None else candidates & queue()
+    with transaction.atomic():
+        rows = take(candidates, count, claim_changes(investigator, timezone.now()), 'citizen_id')
+        record_claims(rows, investigator, request)
+    return [reclamation_id for reclamation_id, _ in rows]
+
+
+def claim_one(investigator, reclamation_id, request=None):
+    """Claim one given reclamation; False if it was no longer in the queue"""
+    with transaction.atomic():
+        rows = take(queue().filter(id=reclamation_id), 1, claim_changes(investigator, timezone.now()), 'citizen_id')
+        record_claims(rows, investigator, request)
+    return bool(rows)
+
+
+def renew(reclamation):
+    """Push back the lease of an investigation its investigator is working on"""
+    reclamation.lease_expires_at = timezone.now() + lease()
+    Reclamation.objects.filter(
+        pk=reclamation.pk, status=CLAIMED, assigned_investigator_id=reclamation.assigned_investigator_id
+    ).update(lease_expires_at=reclamation.lease_expires_at)
+
+
+def release_expired(now=None, batch_size=500):
+    """Put investigations whose lease ran out back in the queue; returns how many were released"""
+    now = now or timezone.now()
+    expired = Reclamation.objects.filter(
+        status=CLAIMED, assigned_investigator__isnull=False, lease_expires_at__lt=now
+    ).order_by('lease_expires_at')
+    changes = {
+        'status': PENDING, 'assigned_investigator': None,
+        'claimed_at': None, 'lease_expires_at': None, 'updated_at': now,
+    }
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = take(expired, batch_size, changes, 'citizen_id', 'assigned_investigator_id')
+            if not rows:
+                return released
+            move(rows, CLAIMED, PENDING)
+            log_actions([build_entry(
+                None, User(pk=investigator_id), 'reclamation_released',
+                f'Réclamation {reclamation_id} remise en file (délai d\'investigation expiré)',
+                related_citizen=User(pk=citizen_id),
+                metadata={'reclamation_id': str(reclamation_id)},
+            ) for reclamation_id, citizen_id, investigator_id in rows])
+        released += len(rows)
+        if len(rows) < batch_size:
+            return released